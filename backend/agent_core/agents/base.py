@@ -1,52 +1,190 @@
-from typing import List, Dict, Any, Optional
-from claude_agent_sdk import ClaudeAgentOptions, ClaudeSDKClient, AssistantMessage, TextBlock
+from typing import List, Dict, Any, Optional, Callable
+from claude_agent_sdk import (
+    ClaudeAgentOptions, ClaudeSDKClient, AssistantMessage, ResultMessage, TextBlock,
+    ToolResultBlock, ToolUseBlock, UserMessage
+)
 from agent_core.core.state import AgentState
-from agent_core.core.llm import ModelRouter
+from agent_core.core.llm import ModelRouter, TaskType
+from agent_core.core.session import SessionPool, SessionContext, bind_session_context
+from agent_core.core.context import ContextManager, context_manager
+from agent_core.core.metrics import cli_spawn_seconds, first_token_seconds, span, tokens_total
+from agent_core.core.response_cache import REPLAYED_TOOLS, TurnRecorder, bare_tool_name, response_cache
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from functools import lru_cache
+import asyncio
 import shutil
+import os
+import time
+
+USE_SESSION_POOL = os.environ.get("AGENT_SESSION_POOL", "1") != "0"
+
+@lru_cache(maxsize=1)
+def _get_cli_path() -> str:
+    cli_path = shutil.which("claude") or shutil.which("claude-code")
+    if cli_path:
+        return cli_path
+    return "/usr/local/bin/claude"
 
 class BaseAgent:
-    def __init__(self, name: str, mcp_servers: Dict[str, Any], allowed_tools: List[str], system_prompt: str):
+    def __init__(
+        self,
+        name: str,
+        mcp_servers: Dict[str, Any],
+        allowed_tools: List[str],
+        system_prompt: str,
+        task_type: TaskType = "coding"
+    ):
         self.name = name
         self.mcp_servers = mcp_servers
         self.allowed_tools = allowed_tools
         self.system_prompt = system_prompt
+        self.task_type = task_type
         self.model_router = ModelRouter()
+        self.context_manager: ContextManager = context_manager
+        self.options = self._build_options()
+        self.session_pool: Optional[SessionPool] = SessionPool(self.options) if USE_SESSION_POOL else None
 
     def _get_cli_path(self) -> str:
-        cli_path = shutil.which("claude") or shutil.which("claude-code")
-        if cli_path:
-            return cli_path
-        return "/usr/local/bin/claude"
-
-    async def run(self, state: AgentState) -> str:
-        messages = state.get("messages", [])
-        if not messages:
-            return "No messages to process."
-        
-        last_message = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
+        return _get_cli_path()
 
-        cli_path = self._get_cli_path()
-        
-        options = ClaudeAgentOptions(
+    def _build_options(self) -> ClaudeAgentOptions:
+        return ClaudeAgentOptions(
             system_prompt=self.system_prompt,
             mcp_servers=self.mcp_servers,
             allowed_tools=self.allowed_tools,
             max_turns=10,
-            cli_path=cli_path
+            model=self.model_router.get_model_name(self.task_type),
+            cli_path=self._get_cli_path()
+        )
+
+    def _cache_key(self, state: AgentState, model: Optional[str]) -> Optional[str]:
+        """Response cache key of this turn, or None when it can't be cached."""
+        if not response_cache.enabled:
+            return None
+        # The workspace tree the run checkpointed last; None outside git or in parallel tasks.
+        fingerprint = (state.get("workspace_versions") or [None])[-1]
+        if fingerprint is None:
+            return None
+        # Always the full prompt: a pooled session may have been sent only the newest messages.
+        prompt, _ = self.context_manager.build_prompt(state)
+        return response_cache.key(
+            self.name, self.system_prompt, model or self.options.model, self.allowed_tools, prompt, fingerprint
         )
 
+    async def _replay(
+        self,
+        entry: Dict[str, Any],
+        thread_id: str,
+        on_text: Optional[Callable[[str], None]],
+        on_usage: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> str:
+        """Streams a cached turn again and re-applies its file writes, plan and status report."""
+        from agent_core.tools.server import find_tool
         response_text = ""
-        
-        try:
+        with bind_session_context(SessionContext(thread_id)):
+            for step in entry["steps"]:
+                if "text" in step:
+                    response_text += step["text"]
+                    if on_text is not None:
+                        on_text(step["text"])
+                elif bare_tool_name(step["tool"]) in REPLAYED_TOOLS:
+                    await find_tool(step["tool"]).handler(step["input"])
+        if on_usage is not None:
+            # A replayed turn costs nothing.
+            on_usage({**entry.get("usage", {}), "total_cost_usd": 0.0, "cached": True})
+        return response_text
+
+    @asynccontextmanager
+    async def _session(self, thread_id: str, model: Optional[str] = None):
+        """Yields a connected client for thread_id, running model, and its SessionContext."""
+        if self.session_pool is not None:
+            async with self.session_pool.lease(thread_id) as client:
+                context = self.session_pool.context(thread_id)
+                # Pooled sessions switch model in place instead of reconnecting.
+                if model and context is not None and model != (context.model or self.options.model):
+                    await client.set_model(model)
+                    context.model = model
+                yield client, context
+            return
+        options = replace(self.options, model=model) if model else self.options
+        with bind_session_context(SessionContext(thread_id)) as context:
+            started = time.perf_counter()
             async with ClaudeSDKClient(options=options) as client:
-                await client.query(last_message)
-
-                async for msg in client.receive_response():
-                    if isinstance(msg, AssistantMessage):
-                        for block in msg.content:
-                            if isinstance(block, TextBlock):
-                                response_text += block.text
-        except Exception as e:
-            return f"Error running agent {self.name}: {str(e)}"
+                cli_spawn_seconds.observe(time.perf_counter() - started, "direct")
+                yield client, context
+
+    async def run(
+        self,
+        state: AgentState,
+        thread_id: str = "default",
+        on_text: Optional[Callable[[str], None]] = None,
+        on_usage: Optional[Callable[[Dict[str, Any]], None]] = None,
+        model: Optional[str] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> str:
+        messages = state.get("messages", [])
+        if not messages:
+            return "No messages to process."
+
+        response_text = ""
+
+        with span("agent", self.name, thread_id=thread_id, model=model or self.options.model) as trace:
+            try:
+                cache_key = self._cache_key(state, model)
+                if cache_key is not None:
+                    entry = await asyncio.to_thread(response_cache.get, cache_key)
+                    if entry is not None:
+                        trace.set("cached", True)
+                        return await self._replay(entry, thread_id, on_text, on_usage)
+                recorder = TurnRecorder() if cache_key is not None else None
+
+                async with self._session(thread_id, model) as (client, context):
+                    # A reused CLI session already holds earlier turns: send only what it hasn't seen.
+                    since_id = context.last_message_id if context is not None else None
+                    prompt, last_id = self.context_manager.build_prompt(state, since_id=since_id)
+                    if context is not None:
+                        context.emit = on_event
+                    sent = time.perf_counter()
+                    await client.query(prompt)
+
+                    async for msg in client.receive_response():
+                        if isinstance(msg, AssistantMessage):
+                            for block in msg.content:
+                                if isinstance(block, TextBlock):
+                                    if not response_text:
+                                        first_token_seconds.observe(time.perf_counter() - sent, self.name)
+                                    response_text += block.text
+                                    if on_text is not None:
+                                        on_text(block.text)
+                                    if recorder is not None:
+                                        recorder.text(block.text)
+                                elif isinstance(block, ToolUseBlock) and recorder is not None:
+                                    recorder.tool_use(block.id, block.name, block.input)
+                        elif isinstance(msg, UserMessage) and recorder is not None and isinstance(msg.content, list):
+                            for block in msg.content:
+                                if isinstance(block, ToolResultBlock):
+                                    recorder.tool_result(block.tool_use_id, block.content, block.is_error)
+                        elif isinstance(msg, ResultMessage):
+                            if msg.is_error and recorder is not None:
+                                recorder.cacheable = False
+                            usage = msg.usage or {}
+                            if recorder is not None:
+                                recorder.usage = {k: usage.get(k) for k in ("input_tokens", "output_tokens") if usage.get(k)}
+                            tokens_total.inc(usage.get("input_tokens") or 0, self.name, "in")
+                            tokens_total.inc(usage.get("output_tokens") or 0, self.name, "out")
+                            if on_usage is not None:
+                                on_usage({**usage, "total_cost_usd": msg.total_cost_usd})
+                    if context is not None:
+                        context.last_message_id = last_id
+                        context.emit = None
+                if recorder is not None:
+                    if recorder.cacheable:
+                        await asyncio.to_thread(response_cache.put, cache_key, self.name, recorder.entry())
+                    else:
+                        response_cache.metrics["uncacheable"] += 1
+            except Exception as e:
+                trace.fail(str(e))
+                return f"Error running agent {self.name}: {str(e)}"
 
         return response_text
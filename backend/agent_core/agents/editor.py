@@ -1,14 +1,17 @@
 from agent_core.agents.base import BaseAgent
-from agent_core.tools.server import get_filesystem_server
+from agent_core.tools.server import get_filesystem_server, get_testing_server
 
 EDITOR_PROMPT = """You are the Editor Agent, responsible for writing code and managing files.
 You are the "Hands" of the system.
 
 Your capabilities:
-- Read and write files.
+- Read and write files. Batch work: read several files (or line ranges) with one read_files call,
+  and apply multi-file changes with one write_files call.
 - Execute shell commands (install dependencies, run scripts).
-- Navigate the file system.
-- Manage version control (git commit, git reset).
+- Navigate the file system. Use search_code and find_symbol to locate code instead of grep or reading files one by one.
+- Checkpoint the workspace with git_commit and roll back to a checkpoint with git_reset.
+- Test your changes with run_affected_tests: it runs only the tests that depend on what changed since the
+  last checkpoint, in parallel. Don't run whole test suites through run_shell_command; they time out.
 
 Follow the plan provided by the Manager. Ensure code quality and adhere to the project structure.
 When a significant task is completed, create a checkpoint using git_commit.
@@ -19,14 +22,20 @@ class EditorAgent(BaseAgent):
         fs_server = get_filesystem_server()
         super().__init__(
             name="Editor",
-            mcp_servers={"filesystem": fs_server},
+            mcp_servers={"filesystem": fs_server, "testing": get_testing_server()},
             allowed_tools=[
-                "mcp__filesystem__read_file", 
-                "mcp__filesystem__write_file", 
+                "mcp__filesystem__read_file",
+                "mcp__filesystem__read_files",
+                "mcp__filesystem__write_file",
+                "mcp__filesystem__write_files",
                 "mcp__filesystem__run_shell_command", 
                 "mcp__filesystem__list_directory",
+                "mcp__filesystem__search_code",
+                "mcp__filesystem__find_symbol",
                 "mcp__filesystem__git_commit",
-                "mcp__filesystem__git_reset"
+                "mcp__filesystem__git_reset",
+                "mcp__testing__run_affected_tests"
             ],
+            task_type="coding",
             system_prompt=EDITOR_PROMPT
         )
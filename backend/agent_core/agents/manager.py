@@ -5,7 +5,9 @@ MANAGER_PROMPT = """You are the Manager Agent, responsible for the overall coord
 Your goal is to understand the user's request, break it down into actionable steps, and delegate them to the Editor and Verifier agents.
 
 You have access to the following tools:
-- create_plan: To structure the workflow.
+- create_plan: To structure the workflow. Split the work into tasks with ids, the files each task writes,
+  and the ids of tasks it depends on. Independent tasks are run in parallel by separate Editors,
+  so keep tasks that touch the same files dependent or merged.
 - delegate_task: To assign work to Editor or Verifier.
 - search_web: To find information if needed.
 - report_status: To report final completion.
@@ -26,5 +28,6 @@ class ManagerAgent(BaseAgent):
                 "mcp__planning__search_web",
                 "mcp__planning__report_status"
             ],
+            task_type="reasoning",
             system_prompt=MANAGER_PROMPT
         )
@@ -1,19 +1,27 @@
 from agent_core.agents.base import BaseAgent
-from agent_core.tools.server import get_browser_server, get_planning_server
+from agent_core.tools.server import get_browser_server, get_planning_server, get_testing_server
 
 VERIFIER_PROMPT = """You are the Verifier Agent, responsible for quality assurance and testing.
 You are the "Eyes" of the system.
 
 Your capabilities:
 - Perform REAL browser automation using Playwright (open URLs, click, fill forms, get content).
-- Take screenshots to verify UI.
+- Take screenshots to verify UI, and check for visual regressions with `compare_screenshot`
+  (diffs the page against a named baseline and reports the changed regions).
+- Run the tests affected by the Editor's changes with `run_affected_tests` (only the test modules
+  that depend on the changed files, in parallel).
 - Report task status using `report_status`.
 
 Verify the work done by the Editor. 
 1. If the verification passes, call `report_status(status="success", details="Verification passed...")`.
 2. If the verification fails, call `report_status(status="failure", details="Verification failed because...")`.
 
-Use `get_page_content` to verify text on the page.
+Prefer `run_browser_script` for browser checks: it runs a whole flow (goto, fill, click,
+wait_for, expect_text, screenshot) in one call with auto-waits and reports each step,
+e.g. steps=[{"action": "goto", "url": "http://localhost:3000/login"},
+{"action": "fill", "selector": "#email", "value": "a@b.c"}, {"action": "click", "selector": "text=Sign in"},
+{"action": "expect_text", "text": "Welcome"}].
+Use `get_page_content` when you need to read what is on the page.
 """
 
 class VerifierAgent(BaseAgent):
@@ -22,7 +30,7 @@ class VerifierAgent(BaseAgent):
         planning_server = get_planning_server() # For report_status
         
         # Merge servers
-        servers = {"browser": browser_server, "planning": planning_server}
+        servers = {"browser": browser_server, "planning": planning_server, "testing": get_testing_server()}
         
         super().__init__(
             name="Verifier",
@@ -32,8 +40,12 @@ class VerifierAgent(BaseAgent):
                 "mcp__browser__click_element", 
                 "mcp__browser__fill_form", 
                 "mcp__browser__take_screenshot", 
+                "mcp__browser__compare_screenshot",
                 "mcp__browser__get_page_content",
-                "mcp__planning__report_status"
+                "mcp__browser__run_browser_script",
+                "mcp__planning__report_status",
+                "mcp__testing__run_affected_tests"
             ],
+            task_type="coding",
             system_prompt=VERIFIER_PROMPT
         )
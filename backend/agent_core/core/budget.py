@@ -0,0 +1,35 @@
+import os
+import time
+from typing import Any, Dict, Optional
+
+MAX_ITERATIONS = int(os.environ.get("AGENT_MAX_ITERATIONS", "3"))
+RUN_TIMEOUT_SECONDS = float(os.environ.get("AGENT_RUN_TIMEOUT_SECONDS", "1800"))
+RUN_TOKEN_BUDGET = int(os.environ.get("AGENT_RUN_TOKEN_BUDGET", "500000"))
+
+
+class RunBudget:
+    """Limits on one run's Verifier -> Editor retry loop."""
+
+    def __init__(
+        self,
+        max_iterations: int = MAX_ITERATIONS,
+        timeout_seconds: float = RUN_TIMEOUT_SECONDS,
+        token_budget: int = RUN_TOKEN_BUDGET
+    ):
+        self.max_iterations = max_iterations
+        self.timeout_seconds = timeout_seconds
+        self.token_budget = token_budget
+
+    def exhausted(self, state: Dict[str, Any]) -> Optional[str]:
+        """Returns why another iteration is not allowed, or None if it is."""
+        if state.get("iteration_count", 0) >= self.max_iterations:
+            return f"iteration budget exhausted ({self.max_iterations})"
+        started_at = state.get("started_at")
+        if started_at is not None and time.time() - started_at >= self.timeout_seconds:
+            return f"time budget exhausted ({self.timeout_seconds:.0f}s)"
+        if (state.get("tokens_used") or 0) >= self.token_budget:
+            return f"token budget exhausted ({self.token_budget})"
+        return None
+
+
+run_budget = RunBudget()
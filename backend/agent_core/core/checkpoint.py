@@ -0,0 +1,574 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+CHECKPOINT_BACKEND = os.environ.get("AGENT_CHECKPOINTER", "sqlite")
+CHECKPOINT_DB = os.environ.get("AGENT_CHECKPOINT_DB", os.path.join(".agent", "checkpoints.sqlite"))
+CACHE_SIZE = int(os.environ.get("AGENT_CHECKPOINT_CACHE_SIZE", "256"))
+CACHE_TTL = float(os.environ.get("AGENT_CHECKPOINT_CACHE_TTL", "900"))
+COMPACT_INTERVAL = float(os.environ.get("AGENT_CHECKPOINT_COMPACT_INTERVAL", "3600"))
+COMPACT_KEEP_LAST = int(os.environ.get("AGENT_CHECKPOINT_KEEP_LAST", "20"))
+COMPACT_MAX_AGE = float(os.environ.get("AGENT_CHECKPOINT_MAX_AGE", str(30 * 24 * 3600)))
+# API workers share one database; writers wait this long for each other's locks.
+BUSY_TIMEOUT = float(os.environ.get("AGENT_CHECKPOINT_BUSY_TIMEOUT", "30"))
+
+# Bounds how many append-deltas must be replayed to rebuild a channel value.
+MAX_DELTA_CHAIN = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    base_version TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    type TEXT,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+_MISSING = object()
+
+
+def _shallow_copy(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies containers so graph channels never mutate cached values in place."""
+    copied = {}
+    for k, v in values.items():
+        if isinstance(v, list):
+            v = list(v)
+        elif isinstance(v, dict):
+            v = dict(v)
+        copied[k] = v
+    return copied
+
+
+def _is_prefix(prefix: list, value: list) -> bool:
+    if len(prefix) == 0 or len(prefix) > len(value):
+        return False
+    for a, b in zip(prefix, value):
+        if a is not b and a != b:
+            return False
+    return True
+
+
+class _HotEntry:
+    def __init__(self, checkpoint_id: str, values: Dict[str, Any], versions: Dict[str, Any], depths: Dict[str, int]):
+        self.checkpoint_id = checkpoint_id
+        self.values = values
+        self.versions = versions
+        self.depths = depths
+        self.touched = time.monotonic()
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer persisted in SQLite (WAL mode).
+
+    Channel values are stored per (channel, version) and only for channels that
+    changed in a step. Append-only list channels such as ``messages`` are stored
+    as deltas against their previous version, so a step costs O(new messages)
+    instead of O(history). The latest state of recently used threads is kept in
+    an LRU hot cache bounded by size and TTL.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB,
+        cache_size: int = CACHE_SIZE,
+        cache_ttl: float = CACHE_TTL,
+        *,
+        serde: Any = None,
+    ):
+        super().__init__(serde=serde)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[Tuple[str, str], _HotEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    # --- hot cache ---
+
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[_HotEntry]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.touched > self.cache_ttl:
+            del self._cache[key]
+            return None
+        entry.touched = time.monotonic()
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: Tuple[str, str], entry: _HotEntry):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def evict_expired(self) -> int:
+        """Drops hot cache entries older than the TTL. Returns how many were dropped."""
+        with self._lock:
+            now = time.monotonic()
+            expired = [k for k, e in self._cache.items() if now - e.touched > self.cache_ttl]
+            for k in expired:
+                del self._cache[k]
+            return len(expired)
+
+    # --- blobs ---
+
+    def _load_channel(self, thread_id: str, ns: str, channel: str, version: str) -> Any:
+        chain = []
+        current = version
+        while current is not None:
+            row = self.conn.execute(
+                "SELECT kind, base_version, type, blob FROM blobs "
+                "WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+                (thread_id, ns, channel, current),
+            ).fetchone()
+            if row is None:
+                return _MISSING
+            kind, base_version, type_, blob = row
+            if kind == "empty":
+                return _MISSING
+            chain.append((type_, blob))
+            current = base_version if kind == "append" else None
+
+        type_, blob = chain.pop()
+        value = self.serde.loads_typed((type_, blob))
+        if chain:
+            value = list(value)
+            for type_, blob in reversed(chain):
+                value.extend(self.serde.loads_typed((type_, blob)))
+        return value
+
+    def _materialize(self, thread_id: str, ns: str, channel: str, version: str):
+        """Rewrites an append-delta blob as a full snapshot."""
+        row = self.conn.execute(
+            "SELECT kind FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+            (thread_id, ns, channel, version),
+        ).fetchone()
+        if row is None or row[0] != "append":
+            return
+        value = self._load_channel(thread_id, ns, channel, version)
+        if value is _MISSING:
+            return
+        type_, blob = self.serde.dumps_typed(value)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE blobs SET kind='full', base_version=NULL, depth=0, type=?, blob=? "
+                "WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+                (type_, blob, thread_id, ns, channel, version),
+            )
+
+    def _load_values(self, thread_id: str, ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            value = self._load_channel(thread_id, ns, channel, str(version))
+            if value is not _MISSING:
+                values[channel] = value
+        return values
+
+    # --- BaseCheckpointSaver ---
+
+    def get_next_version(self, current: Optional[str], channel: Any = None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._row_to_tuple(thread_id, ns, row)
+
+    def _row_to_tuple(self, thread_id: str, ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob = row
+        checkpoint = self.serde.loads_typed((type_, blob))
+
+        entry = self._cache_get((thread_id, ns))
+        if entry is not None and entry.checkpoint_id == checkpoint_id:
+            values = _shallow_copy(entry.values)
+        else:
+            values = self._load_values(thread_id, ns, checkpoint["channel_versions"])
+
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, blob FROM writes "
+            "WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=? ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, b))) for task_id, channel, t, b in writes],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id=?")
+            params.append(config["configurable"]["thread_id"])
+            ns = config["configurable"].get("checkpoint_ns")
+            if ns is not None:
+                clauses.append("checkpoint_ns=?")
+                params.append(ns)
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                clauses.append("checkpoint_id=?")
+                params.append(checkpoint_id)
+        if before is not None and get_checkpoint_id(before):
+            clauses.append("checkpoint_id<?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        remaining = limit
+        for thread_id, ns, *row in rows:
+            if remaining is not None and remaining <= 0:
+                break
+            with self._lock:
+                if filter:
+                    metadata = self.serde.loads_typed((row[4], row[5]))
+                    if not all(metadata.get(k) == v for k, v in filter.items()):
+                        continue
+                tup = self._row_to_tuple(thread_id, ns, tuple(row))
+            if remaining is not None:
+                remaining -= 1
+            yield tup
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        ns = configurable.get("checkpoint_ns", "")
+        parent_id = configurable.get("checkpoint_id")
+
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+
+        with self._lock:
+            prev = self._cache_get((thread_id, ns))
+            if prev is not None and prev.checkpoint_id != parent_id:
+                prev = None
+            depths = dict(prev.depths) if prev is not None else {}
+
+            blob_rows = []
+            for channel, version in new_versions.items():
+                version = str(version)
+                if channel not in values:
+                    blob_rows.append((thread_id, ns, channel, version, "empty", None, 0, None, None))
+                    depths.pop(channel, None)
+                    continue
+                value = values[channel]
+                base = prev.values.get(channel, _MISSING) if prev is not None else _MISSING
+                depth = depths.get(channel, 0)
+                if (
+                    isinstance(value, list)
+                    and isinstance(base, list)
+                    and depth < MAX_DELTA_CHAIN
+                    and channel in prev.versions
+                    and _is_prefix(base, value)
+                ):
+                    type_, blob = self.serde.dumps_typed(value[len(base):])
+                    blob_rows.append(
+                        (thread_id, ns, channel, version, "append", str(prev.versions[channel]), depth + 1, type_, blob)
+                    )
+                    depths[channel] = depth + 1
+                else:
+                    type_, blob = self.serde.dumps_typed(value)
+                    blob_rows.append((thread_id, ns, channel, version, "full", None, 0, type_, blob))
+                    depths[channel] = 0
+
+            type_, blob = self.serde.dumps_typed(c)
+            metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", blob_rows)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint["id"], parent_id, type_, blob, metadata_type, metadata_blob, time.time()),
+                )
+
+            self._cache_put(
+                (thread_id, ns),
+                _HotEntry(checkpoint["id"], _shallow_copy(values), dict(checkpoint["channel_versions"]), depths),
+            )
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+
+        replace_rows, ignore_rows = [], []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, blob = self.serde.dumps_typed(value)
+            row = (thread_id, ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path)
+            # Special writes (negative idx) overwrite; regular ones are first-write-wins.
+            (replace_rows if write_idx < 0 else ignore_rows).append(row)
+
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", replace_rows)
+            self.conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", ignore_rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self.conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id=?", (thread_id,))
+            for key in [k for k in self._cache if k[0] == thread_id]:
+                del self._cache[key]
+
+    # --- async variants ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # --- maintenance ---
+
+    def compact(self, keep_last: int = 20, max_age: Optional[float] = None) -> Dict[str, int]:
+        """
+        Deletes old checkpoints and the blobs and writes only they referenced.
+
+        Keeps the newest ``keep_last`` checkpoints of every thread; threads whose
+        newest checkpoint is older than ``max_age`` seconds are dropped entirely.
+        Delta bases still needed by a kept checkpoint are preserved.
+        """
+        stats = {"threads_dropped": 0, "checkpoints": 0, "blobs": 0}
+        with self._lock:
+            if max_age is not None:
+                cutoff = time.time() - max_age
+                stale = self.conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,)
+                ).fetchall()
+                for (thread_id,) in stale:
+                    self.delete_thread(thread_id)
+                stats["threads_dropped"] = len(stale)
+
+            threads = self.conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+            for thread_id, ns in threads:
+                rows = self.conn.execute(
+                    "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+                    "WHERE thread_id=? AND checkpoint_ns=? ORDER BY checkpoint_id DESC",
+                    (thread_id, ns),
+                ).fetchall()
+                if len(rows) <= keep_last:
+                    continue
+                kept, dropped = rows[:keep_last], rows[keep_last:]
+
+                # Rebase the oldest kept checkpoint onto full snapshots so newer
+                # delta chains stop there instead of reaching into dropped history.
+                _, type_, blob = kept[-1]
+                for channel, version in self.serde.loads_typed((type_, blob))["channel_versions"].items():
+                    self._materialize(thread_id, ns, channel, str(version))
+
+                needed = set()
+                for _, type_, blob in kept:
+                    for channel, version in self.serde.loads_typed((type_, blob))["channel_versions"].items():
+                        current = str(version)
+                        while current is not None and (channel, current) not in needed:
+                            needed.add((channel, current))
+                            base = self.conn.execute(
+                                "SELECT base_version FROM blobs "
+                                "WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+                                (thread_id, ns, channel, current),
+                            ).fetchone()
+                            current = base[0] if base else None
+
+                all_blobs = self.conn.execute(
+                    "SELECT channel, version FROM blobs WHERE thread_id=? AND checkpoint_ns=?", (thread_id, ns)
+                ).fetchall()
+                unused = [(thread_id, ns, c, v) for c, v in all_blobs if (c, v) not in needed]
+                dropped_ids = [(thread_id, ns, checkpoint_id) for checkpoint_id, _, _ in dropped]
+
+                with self.conn:
+                    self.conn.executemany(
+                        "DELETE FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?", unused
+                    )
+                    self.conn.executemany(
+                        "DELETE FROM writes WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?", dropped_ids
+                    )
+                    self.conn.executemany(
+                        "DELETE FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?", dropped_ids
+                    )
+                stats["checkpoints"] += len(dropped_ids)
+                stats["blobs"] += len(unused)
+
+            self.evict_expired()
+        return stats
+
+    async def acompact(self, keep_last: int = 20, max_age: Optional[float] = None) -> Dict[str, int]:
+        return await asyncio.to_thread(self.compact, keep_last, max_age)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def get_checkpointer(backend: Optional[str] = None) -> BaseCheckpointSaver:
+    """
+    Returns the checkpointer selected by AGENT_CHECKPOINTER ("sqlite" or "memory").
+    """
+    backend = backend or CHECKPOINT_BACKEND
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        return SqliteCheckpointer(CHECKPOINT_DB)
+    raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+
+async def run_compaction(
+    saver: BaseCheckpointSaver,
+    interval: float = COMPACT_INTERVAL,
+    keep_last: int = COMPACT_KEEP_LAST,
+    max_age: Optional[float] = COMPACT_MAX_AGE,
+):
+    """Background job: periodically compacts old checkpoints of a SqliteCheckpointer."""
+    if not isinstance(saver, SqliteCheckpointer):
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await saver.acompact(keep_last=keep_last, max_age=max_age)
+        except Exception as e:
+            print(f"Checkpoint compaction failed: {e}")
@@ -0,0 +1,41 @@
+import hashlib
+import os
+from typing import List
+
+# Set per process by the production launcher (start.sh prod); a single worker otherwise.
+WORKER_COUNT = max(1, int(os.environ.get("AGENT_WORKERS", "1")))
+WORKER_ID = int(os.environ.get("AGENT_WORKER_ID", "0"))
+WORKER_HOST = os.environ.get("AGENT_WORKER_HOST", "127.0.0.1")
+WORKER_BASE_PORT = int(os.environ.get("AGENT_WORKER_BASE_PORT", "8100"))
+
+
+def _score(thread_id: str, worker: int) -> int:
+    digest = hashlib.blake2b(f"{worker}:{thread_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def ranked_workers(thread_id: str, workers: int = WORKER_COUNT) -> List[int]:
+    """Workers in order of preference for a thread: the owner first, then its fallbacks."""
+    return sorted(range(workers), key=lambda worker: _score(thread_id, worker), reverse=True)
+
+
+def owner_of(thread_id: str, workers: int = WORKER_COUNT) -> int:
+    """
+    The worker that owns a thread's in-process resources (CLI sessions, browser
+    pages, file locks).
+
+    Rendezvous hashing: stable across processes and restarts, and changing the
+    worker count only moves the threads of the workers added or removed.
+    """
+    if workers <= 1:
+        return 0
+    return ranked_workers(thread_id, workers)[0]
+
+
+def worker_url(worker: int) -> str:
+    return f"http://{WORKER_HOST}:{WORKER_BASE_PORT + worker}"
+
+
+def is_primary() -> bool:
+    """Whether this process runs the cluster-wide background jobs (e.g. checkpoint compaction)."""
+    return WORKER_ID == 0
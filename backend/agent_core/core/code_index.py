@@ -0,0 +1,373 @@
+import ast
+import fnmatch
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from agent_core.core.workspace import WorkspaceIndex, get_workspace_index
+
+INDEXED_EXTENSIONS = {
+    ".py", ".pyi", ".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs", ".json", ".css", ".scss", ".html",
+    ".md", ".rst", ".txt", ".toml", ".yaml", ".yml", ".ini", ".cfg", ".sh", ".sql",
+    ".go", ".rs", ".java", ".kt", ".c", ".h", ".cc", ".cpp", ".hpp", ".rb", ".php", ".swift", ".vue",
+}
+INDEXED_NAMES = {"Dockerfile", "Makefile", "requirements.txt"}
+MAX_FILE_BYTES = int(os.environ.get("AGENT_CODE_INDEX_MAX_FILE_BYTES", str(1024 * 1024)))
+RESCAN_INTERVAL = 2.0
+MAX_LINE_CHARS = 200
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Declarations recognised outside Python (where ast is used instead).
+GENERIC_SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|async\s+|abstract\s+)*"
+    r"(?P<kind>class|interface|type|enum|function\*?|def|func|fn|struct|trait|const|let|var)\s+"
+    r"(?P<name>[A-Za-z_$][\w$]*)",
+    re.MULTILINE
+)
+GENERIC_KINDS = {
+    "class": "class", "interface": "interface", "type": "type", "enum": "enum", "struct": "class", "trait": "interface",
+    "function": "function", "function*": "function", "def": "function", "func": "function", "fn": "function",
+    "const": "variable", "let": "variable", "var": "variable",
+}
+
+
+class Symbol:
+    __slots__ = ("name", "kind", "path", "line", "container")
+
+    def __init__(self, name: str, kind: str, path: str, line: int, container: Optional[str] = None):
+        self.name = name
+        self.kind = kind
+        self.path = path
+        self.line = line
+        self.container = container
+
+    @property
+    def qualname(self) -> str:
+        return f"{self.container}.{self.name}" if self.container else self.name
+
+
+def python_symbols(path: str, text: str) -> List[Symbol]:
+    """Classes, functions, methods and module-level assignments from the Python AST."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return generic_symbols(path, text)
+    symbols = []
+
+    def visit(node, container: Optional[str]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                symbols.append(Symbol(child.name, "class", path, child.lineno, container))
+                visit(child, f"{container}.{child.name}" if container else child.name)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                symbols.append(Symbol(child.name, "method" if container else "function", path, child.lineno, container))
+            elif container is None and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append(Symbol(target.id, "variable", path, child.lineno))
+
+    visit(tree, None)
+    return symbols
+
+
+def generic_symbols(path: str, text: str) -> List[Symbol]:
+    symbols = []
+    line, last = 1, 0
+    for match in GENERIC_SYMBOL_RE.finditer(text):
+        line += text.count("\n", last, match.start())
+        last = match.start()
+        symbols.append(Symbol(match.group("name"), GENERIC_KINDS[match.group("kind")], path, line))
+    return symbols
+
+
+class IndexedFile:
+    __slots__ = ("fid", "path", "version", "text", "symbols")
+
+    def __init__(self, fid: int, path: str, version: str, text: str, symbols: List[Symbol]):
+        self.fid = fid
+        self.path = path
+        self.version = version
+        self.text = text
+        self.symbols = symbols
+
+
+class CodeIndex:
+    """
+    In-memory search index over the workspace's text files.
+
+    Keeps each file's text, an inverted index from lower-cased identifier
+    tokens to files, and a symbol table (Python via ast, other languages via
+    declaration patterns). A substring query only scans files whose tokens can
+    contain it. Files are enumerated through the WorkspaceIndex (so hidden and
+    .gitignored paths are skipped) and kept fresh from its watcher events, or
+    by an mtime rescan every few seconds when no watcher is running.
+    """
+
+    def __init__(self, workspace: Optional[WorkspaceIndex] = None):
+        self.workspace = workspace or get_workspace_index()
+        self.root = self.workspace.root
+        self._files: Dict[str, IndexedFile] = {}
+        self._by_id: Dict[int, IndexedFile] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._symbols: Dict[str, List[Symbol]] = {}
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._built = False
+        self._last_scan = 0.0
+        self._dirty: Set[str] = set()
+        self.workspace.add_listener(self._on_change)
+
+    # --- maintenance ---
+
+    def _on_change(self, path: str):
+        with self._lock:
+            self._dirty.add(path)
+
+    @staticmethod
+    def indexable(name: str) -> bool:
+        return name in INDEXED_NAMES or os.path.splitext(name)[1].lower() in INDEXED_EXTENSIONS
+
+    def _walk(self, directory: str) -> Iterable[str]:
+        try:
+            entries = self.workspace.listing(directory).entries
+        except OSError:
+            return
+        for name, is_dir in entries:
+            full = os.path.join(directory, name)
+            if is_dir:
+                yield from self._walk(full)
+            elif self.indexable(name):
+                yield full
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _update(self, full: str):
+        rel = self._rel(full)
+        try:
+            st = os.stat(full)
+        except OSError:
+            self._remove(rel)
+            return
+        version = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        current = self._files.get(rel)
+        if current is not None and current.version == version:
+            return
+        if st.st_size > MAX_FILE_BYTES:
+            self._remove(rel)
+            return
+        try:
+            with open(full, "rb") as f:
+                data = f.read()
+        except OSError:
+            self._remove(rel)
+            return
+        if b"\0" in data[:8192]:
+            self._remove(rel)
+            return
+        text = data.decode("utf-8", errors="replace")
+        symbols = python_symbols(rel, text) if rel.endswith((".py", ".pyi")) else generic_symbols(rel, text)
+        self._remove(rel)
+        entry = IndexedFile(self._next_id, rel, version, text, symbols)
+        self._next_id += 1
+        self._files[rel] = entry
+        self._by_id[entry.fid] = entry
+        for token in set(TOKEN_RE.findall(text.lower())):
+            self._postings.setdefault(token, set()).add(entry.fid)
+        for symbol in symbols:
+            self._symbols.setdefault(symbol.name.lower(), []).append(symbol)
+
+    def _remove(self, rel: str):
+        entry = self._files.pop(rel, None)
+        if entry is None:
+            return
+        del self._by_id[entry.fid]
+        for token in set(TOKEN_RE.findall(entry.text.lower())):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.discard(entry.fid)
+                if not posting:
+                    del self._postings[token]
+        for symbol in entry.symbols:
+            bucket = self._symbols.get(symbol.name.lower())
+            if bucket is not None:
+                bucket[:] = [s for s in bucket if s.path != rel]
+                if not bucket:
+                    del self._symbols[symbol.name.lower()]
+
+    def _full_scan(self):
+        seen = set()
+        for full in self._walk(self.root):
+            seen.add(self._rel(full))
+            self._update(full)
+        for rel in [rel for rel in self._files if rel not in seen]:
+            self._remove(rel)
+        self._last_scan = time.monotonic()
+
+    def refresh(self):
+        """Brings the index up to date (incrementally after the first build)."""
+        with self._lock:
+            if not self._built:
+                self._dirty.clear()
+                self._full_scan()
+                self._built = True
+                return
+            if not self.workspace.watching:
+                if time.monotonic() - self._last_scan >= RESCAN_INTERVAL:
+                    self._full_scan()
+                return
+            dirty, self._dirty = self._dirty, set()
+            for path in dirty:
+                rel = self._rel(path)
+                if os.path.exists(path) and not self._is_filtered(path):
+                    if os.path.isdir(path):
+                        present = set()
+                        for full in self._walk(path):
+                            present.add(self._rel(full))
+                            self._update(full)
+                        for child in [r for r in self._files if r.startswith(rel + "/") and r not in present]:
+                            self._remove(child)
+                    elif self.indexable(os.path.basename(path)):
+                        self._update(path)
+                else:
+                    # Deleted, or now hidden/ignored: drop it and anything below it.
+                    self._remove(rel)
+                    for child in [r for r in self._files if r.startswith(rel + "/")]:
+                        self._remove(child)
+
+    def _is_filtered(self, path: str) -> bool:
+        """True if path is outside the root, or it or an ancestor is hidden or ignored."""
+        path = os.path.abspath(path)
+        while path != self.root:
+            parent = os.path.dirname(path)
+            if parent == path or not path.startswith(self.root + os.sep):
+                return True
+            try:
+                if os.path.basename(path) not in self.workspace.listing(parent).names:
+                    return True
+            except OSError:
+                return True
+            path = parent
+        return False
+
+    # --- queries ---
+
+    def _token_candidates(self, token: str, prefix: bool, suffix: bool) -> Set[int]:
+        """Files containing a token that the query token can be part of."""
+        if not prefix and not suffix:
+            return set(self._postings.get(token, ()))
+        if prefix and suffix:
+            match = lambda t: token in t
+        elif prefix:
+            match = lambda t: t.startswith(token)
+        else:
+            match = lambda t: t.endswith(token)
+        found = set()
+        for vocab, posting in self._postings.items():
+            if match(vocab):
+                found |= posting
+        return found
+
+    def _candidates(self, query: str) -> Optional[Set[int]]:
+        """File ids that can contain query as a substring (None: every file)."""
+        lowered = query.lower()
+        spans = [(m.group(0), m.start(), m.end()) for m in TOKEN_RE.finditer(lowered)]
+        if not spans:
+            return None
+        result = None
+        # Interior tokens first: exact posting lookups are the cheapest filter.
+        ordered = sorted(range(len(spans)), key=lambda i: (i == 0 or i == len(spans) - 1))
+        for i in ordered:
+            token, start, end = spans[i]
+            # A token touching the edge of the query may continue inside the file's token.
+            open_left = start == 0
+            open_right = end == len(lowered)
+            found = self._token_candidates(token, prefix=open_right, suffix=open_left)
+            result = found if result is None else result & found
+            if not result:
+                break
+        return result
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        path: Optional[str] = None,
+        glob: Optional[str] = None,
+        max_results: int = 50,
+    ) -> Tuple[List[Tuple[str, int, str]], bool]:
+        """Returns up to max_results (path, line, text) matching lines and whether more exist."""
+        self.refresh()
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags | re.MULTILINE)
+        prefix = self._rel(os.path.abspath(path)) + "/" if path and os.path.abspath(path) != self.root else ""
+        with self._lock:
+            candidates = None if regex else self._candidates(query)
+            files = self._files.values() if candidates is None else [self._by_id[fid] for fid in candidates]
+            files = sorted(
+                (f for f in files if f.path.startswith(prefix) and (not glob or fnmatch.fnmatch(f.path, glob) or fnmatch.fnmatch(os.path.basename(f.path), glob))),
+                key=lambda f: f.path
+            )
+        matches = []
+        for entry in files:
+            text = entry.text
+            line, last, last_line = 1, 0, -1
+            for match in pattern.finditer(text):
+                line += text.count("\n", last, match.start())
+                last = match.start()
+                if line == last_line:
+                    continue
+                last_line = line
+                if len(matches) == max_results:
+                    # Stop at the first match past the limit instead of counting them all.
+                    return matches, True
+                start = text.rfind("\n", 0, match.start()) + 1
+                end = text.find("\n", match.start())
+                snippet = text[start:end if end != -1 else len(text)].strip()
+                matches.append((entry.path, line, snippet[:MAX_LINE_CHARS]))
+        return matches, False
+
+    def find_symbol(self, name: str, kind: Optional[str] = None, exact: bool = False, max_results: int = 50) -> List[Symbol]:
+        """Symbols named name (or containing it unless exact), best matches first."""
+        self.refresh()
+        key = name.lower()
+        with self._lock:
+            if exact:
+                found = list(self._symbols.get(key, ()))
+            else:
+                found = [s for vocab, bucket in self._symbols.items() if key in vocab for s in bucket]
+        if kind:
+            found = [s for s in found if s.kind == kind]
+        # Exact name (case-sensitive, then not) before partial matches, definitions in shallower paths first.
+        found.sort(key=lambda s: (s.name != name, s.name.lower() != key, len(s.name), s.path.count("/"), s.path, s.line))
+        return found[:max_results]
+
+    def files(self, suffixes: Tuple[str, ...] = ()) -> List[IndexedFile]:
+        """The indexed files (refreshed first), optionally only those whose path ends with one of suffixes."""
+        self.refresh()
+        with self._lock:
+            return [f for f in self._files.values() if not suffixes or f.path.endswith(suffixes)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "tokens": len(self._postings),
+                "symbols": sum(len(bucket) for bucket in self._symbols.values()),
+                "watching": self.workspace.watching,
+            }
+
+
+_code_index: Optional[CodeIndex] = None
+
+
+def get_code_index() -> CodeIndex:
+    """Returns the process-wide code index over the workspace."""
+    global _code_index
+    if _code_index is None:
+        _code_index = CodeIndex()
+    return _code_index
@@ -0,0 +1,161 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.messages import BaseMessage, RemoveMessage
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get("AGENT_PROMPT_TOKEN_BUDGET", "8000"))
+STATE_TOKEN_BUDGET = int(os.environ.get("AGENT_STATE_TOKEN_BUDGET", "16000"))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("AGENT_SUMMARY_TOKEN_BUDGET", "1500"))
+KEEP_RECENT_MESSAGES = int(os.environ.get("AGENT_KEEP_RECENT_MESSAGES", "12"))
+SUMMARY_LINE_CHARS = 240
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def message_text(msg: Any) -> str:
+    content = msg.content if hasattr(msg, "content") else str(msg)
+    if isinstance(content, str):
+        return content
+    # Content blocks: keep the text parts only.
+    return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def message_role(msg: Any) -> str:
+    name = getattr(msg, "name", None)
+    if name:
+        return name
+    return {"human": "User", "ai": "Assistant"}.get(getattr(msg, "type", ""), "Message")
+
+
+def render_message(msg: Any) -> str:
+    return f"{message_role(msg)}: {message_text(msg)}"
+
+
+def extractive_summary(previous: Optional[str], messages: List[BaseMessage], budget: int = SUMMARY_TOKEN_BUDGET) -> str:
+    """
+    Folds messages into the running summary without a model call.
+
+    Each turn keeps its first SUMMARY_LINE_CHARS characters; once the summary is
+    over budget the oldest lines are dropped first.
+    """
+    lines = previous.splitlines() if previous else []
+    for msg in messages:
+        text = " ".join(message_text(msg).split())
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS] + "..."
+        lines.append(f"- {message_role(msg)}: {text}")
+
+    dropped = 0
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+        dropped += 1
+    if dropped:
+        lines.insert(0, f"- ({dropped} older summary lines omitted)")
+    return "\n".join(lines)
+
+
+class ContextManager:
+    """
+    Keeps per-thread conversation state and agent prompts within token budgets.
+
+    compact() moves old messages out of AgentState into a rolling summary (the
+    summary lives in state, so the checkpointer caches it per thread).
+    build_prompt() renders the summary plus the newest messages that fit the
+    prompt budget, or only the unseen messages when the agent's CLI session
+    already holds the earlier turns.
+    """
+
+    def __init__(
+        self,
+        prompt_budget: int = PROMPT_TOKEN_BUDGET,
+        state_budget: int = STATE_TOKEN_BUDGET,
+        keep_recent: int = KEEP_RECENT_MESSAGES,
+        summarizer: Callable[[Optional[str], List[BaseMessage]], str] = extractive_summary,
+    ):
+        self.prompt_budget = prompt_budget
+        self.state_budget = state_budget
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+
+    def compact(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a state update that folds old messages into the summary, or {} if within budget."""
+        messages = state.get("messages", [])
+        total = sum(count_tokens(message_text(m)) for m in messages)
+        # Compact in batches: only once the history is well past the window.
+        if total <= self.state_budget and len(messages) <= self.keep_recent * 2:
+            return {}
+
+        # Keep the newest messages that fit in half of the state budget.
+        keep, used = 0, 0
+        for msg in reversed(messages):
+            cost = count_tokens(message_text(msg))
+            if keep >= self.keep_recent or (keep and used + cost > self.state_budget // 2):
+                break
+            keep += 1
+            used += cost
+        old = messages[: len(messages) - keep]
+        if not old:
+            return {}
+        return {
+            "summary": self.summarizer(state.get("summary"), old),
+            "messages": [RemoveMessage(id=m.id) for m in old if getattr(m, "id", None)],
+        }
+
+    def build_prompt(self, state: Dict[str, Any], since_id: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        Returns (prompt, id of the newest message included).
+
+        With since_id the agent's session already saw everything up to that
+        message, so only newer messages are sent.
+        """
+        messages = state.get("messages", [])
+        if not messages:
+            return "", None
+        last_id = getattr(messages[-1], "id", None)
+
+        if since_id is not None:
+            ids = [getattr(m, "id", None) for m in messages]
+            if since_id in ids:
+                unseen = messages[ids.index(since_id) + 1:]
+                if not unseen:
+                    unseen = messages[-1:]
+                return self._fit(unseen, None), last_id
+
+        return self._fit(messages, state.get("summary")), last_id
+
+    def _fit(self, messages: List[BaseMessage], summary: Optional[str]) -> str:
+        if len(messages) == 1 and not summary:
+            # Common first turn: send the request as-is.
+            return message_text(messages[0])
+
+        budget = self.prompt_budget
+        sections = []
+        if summary:
+            sections.append("[Conversation summary]\n" + summary)
+            budget -= count_tokens(sections[0])
+
+        rendered = []
+        for msg in reversed(messages):
+            line = render_message(msg)
+            cost = count_tokens(line)
+            if rendered and cost > budget:
+                break
+            if cost > budget:
+                # The newest message alone exceeds the budget: keep the tail of its text, after the role prefix.
+                prefix = f"{message_role(msg)}: "
+                keep = budget * 4 - len(prefix)
+                if keep <= 0:
+                    break
+                line = prefix + message_text(msg)[-keep:]
+                cost = budget
+            rendered.append(line)
+            budget -= cost
+        if rendered:
+            rendered.reverse()
+            sections.append("[Recent messages]\n" + "\n\n".join(rendered))
+        return "\n\n".join(sections)
+
+
+context_manager = ContextManager()
@@ -0,0 +1,332 @@
+import asyncio
+import errno
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import AsyncIterable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+# Files at least this large are served through mmap instead of buffered reads.
+MMAP_THRESHOLD = 1024 * 1024
+READ_CACHE_BYTES = int(os.environ.get("AGENT_READ_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class VersionConflict(Exception):
+    """Raised when a conditional write's base version no longer matches the file."""
+
+    def __init__(self, path: str, expected: str, actual: Optional[str]):
+        super().__init__(f"{path} changed on disk (expected version {expected}, found {actual})")
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+
+def file_version(path: str) -> Optional[str]:
+    """Cheap version token from mtime and size; None if the file does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def check_version(path: str, expected: Optional[str]):
+    if expected is None:
+        return
+    actual = file_version(path)
+    if actual != expected:
+        raise VersionConflict(path, expected, actual)
+
+
+def _make_temp(path: str) -> Tuple[int, str]:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix="-" + os.path.basename(path))
+
+
+def _commit(tmp_path: str, path: str, expected_version: Optional[str]) -> str:
+    try:
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+    except FileNotFoundError:
+        pass
+    # Re-check right before the rename to narrow the race with other writers.
+    check_version(path, expected_version)
+    os.replace(tmp_path, path)
+    return file_version(path)
+
+
+def _discard(tmp_path: str):
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+def atomic_write(path: str, chunks: Iterable[bytes], expected_version: Optional[str] = None) -> str:
+    """
+    Writes chunks to a temp file next to path and renames it into place.
+
+    Readers never see a partially written file. The original file mode is kept.
+    Returns the new version token.
+    """
+    check_version(path, expected_version)
+    fd, tmp_path = _make_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        return _commit(tmp_path, path, expected_version)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+
+async def atomic_write_async(path: str, chunks: AsyncIterable[bytes], expected_version: Optional[str] = None) -> str:
+    """Async variant of atomic_write for streamed request bodies; disk I/O runs off the event loop."""
+    check_version(path, expected_version)
+    fd, tmp_path = _make_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                if chunk:
+                    await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(f.flush)
+            await asyncio.to_thread(os.fsync, f.fileno())
+        return await asyncio.to_thread(_commit, tmp_path, path, expected_version)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+
+def same_content(path: str, data: bytes) -> bool:
+    """True if path already holds exactly data (checked by size first)."""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except FileNotFoundError:
+        return False
+
+
+def iter_range(path: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields bytes [start, end] (inclusive) of path; large files are read through mmap."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or start > end:
+            return
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = start
+                while pos <= end:
+                    stop = min(end + 1, pos + chunk_size)
+                    yield mm[pos:stop]
+                    pos = stop
+        else:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range "bytes=" header into an inclusive (start, end).
+
+    Returns None when the whole file should be served (no header or multiple
+    ranges) and raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    spec = header[len("bytes="):].strip()
+    first, _, last = spec.partition("-")
+    if first == "":
+        length = int(last)
+        if length <= 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def apply_byte_edits(path: str, edits: List[Tuple[int, int, bytes]], expected_version: Optional[str] = None) -> str:
+    """
+    Applies (offset, length, replacement) edits against the current bytes of path.
+
+    Unchanged regions are streamed from the original file, so the cost is
+    proportional to the file size on disk, never to the request body.
+    """
+    edits = sorted(edits, key=lambda e: e[0])
+    size = os.path.getsize(path)
+    pos = 0
+    for offset, length, _ in edits:
+        if offset < pos or length < 0 or offset + length > size:
+            raise ValueError(f"Invalid or overlapping edit at offset {offset}")
+        pos = offset + length
+
+    def chunks():
+        cursor = 0
+        for offset, length, data in edits:
+            if offset > cursor:
+                yield from iter_range(path, cursor, offset - 1)
+            yield data
+            cursor = offset + length
+        if cursor < size:
+            yield from iter_range(path, cursor, size - 1)
+
+    return atomic_write(path, chunks(), expected_version)
+
+
+def atomic_write_many(files: List[Tuple[str, bytes]], expected_versions: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Writes several files as one change: either all are replaced or none are.
+
+    Every file is staged to a temp file and every base version checked before
+    the first rename. If a rename fails midway, the files already replaced are
+    restored from hard-link backups (and newly created ones removed).
+    Returns the new version token per path.
+    """
+    expected_versions = expected_versions or {}
+    staged = []
+    try:
+        for path, data in files:
+            fd, tmp_path = _make_temp(path)
+            staged.append((path, tmp_path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+            except FileNotFoundError:
+                pass
+        for path, _ in files:
+            check_version(path, expected_versions.get(path))
+    except BaseException:
+        for _, tmp_path in staged:
+            _discard(tmp_path)
+        raise
+
+    backups = []
+    done = []
+    try:
+        for path, tmp_path in staged:
+            backup = None
+            if os.path.exists(path):
+                backup = tmp_path + ".bak"
+                os.link(path, backup)
+            backups.append(backup)
+            os.replace(tmp_path, path)
+            done.append(path)
+    except BaseException:
+        for path, backup in zip(done, backups):
+            if backup is not None:
+                os.replace(backup, path)
+            else:
+                _discard(path)
+        for _, tmp_path in staged[len(done):]:
+            _discard(tmp_path)
+        raise
+    finally:
+        for backup in backups:
+            if backup is not None:
+                _discard(backup)
+    return {path: file_version(path) for path, _ in files}
+
+
+class _CachedFile:
+    def __init__(self, version: str, digest: str, text: str, size: int):
+        self.version = version
+        self.digest = digest
+        self.text = text
+        self.size = size
+
+
+class ReadCache:
+    """
+    Decoded file contents shared by every agent in the process.
+
+    An entry is served while the file's version token (mtime + size) still
+    matches. When only the mtime moved, the bytes are re-read and compared by
+    hash, so touched-but-identical files keep their cached text. Bounded by
+    total bytes, least recently used first out.
+    """
+
+    def __init__(self, max_bytes: int = READ_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CachedFile]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "revalidated": 0, "misses": 0}
+
+    def read(self, path: str) -> Tuple[str, str]:
+        """Returns (text, version) of path."""
+        key = os.path.realpath(path)
+        version = file_version(key)
+        if version is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.metrics["hits"] += 1
+                return entry.text, version
+        with open(key, "rb") as f:
+            data = f.read()
+        digest = content_hash(data)
+        if entry is not None and entry.digest == digest:
+            self.metrics["revalidated"] += 1
+            text = entry.text
+        else:
+            self.metrics["misses"] += 1
+            text = data.decode("utf-8", errors="replace")
+        self._store(key, _CachedFile(version, digest, text, len(data)))
+        return text, version
+
+    def update(self, path: str, data: bytes, version: Optional[str]):
+        """Write-through after the agent tools write a file."""
+        if version is None:
+            return
+        key = os.path.realpath(path)
+        self._store(key, _CachedFile(version, content_hash(data), data.decode("utf-8", errors="replace"), len(data)))
+
+    def _store(self, key: str, entry: _CachedFile):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def stats(self) -> dict:
+        reads = sum(self.metrics.values())
+        return {
+            **self.metrics,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_ratio": (self.metrics["hits"] + self.metrics["revalidated"]) / reads if reads else 0.0
+        }
+
+
+read_cache = ReadCache()
@@ -0,0 +1,11 @@
+from typing import Optional
+from agent_core.core.process import ProcessResult, run_process
+
+GIT_TIMEOUT = 30
+
+
+async def git(
+    *args: str, cwd: Optional[str] = None, env: Optional[dict] = None, timeout: float = GIT_TIMEOUT, input: Optional[bytes] = None
+) -> ProcessResult:
+    return await run_process(["git", *args], cwd=cwd, env=env, timeout=timeout, input=input)
+
@@ -0,0 +1,416 @@
+import ast
+import asyncio
+import math
+import os
+import shlex
+import sqlite3
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from agent_core.core.code_index import CodeIndex, get_code_index
+from agent_core.core.process import run_process
+
+TEST_COMMAND = shlex.split(os.environ.get("AGENT_TEST_COMMAND", "python -m pytest"))
+# Test processes run at once per workspace, across all run_affected_tests calls. Separate from
+# the shell command slots (AGENT_MAX_PROCS_PER_WORKSPACE): a test run never holds those.
+TEST_WORKERS = int(os.environ.get("AGENT_TEST_WORKERS", str(os.cpu_count() or 1)))
+TEST_TIMEOUT = float(os.environ.get("AGENT_TEST_TIMEOUT", "600"))
+# coverage.py data recorded with per-test contexts (pytest --cov --cov-context=test); used when present.
+COVERAGE_FILE = os.environ.get("AGENT_TEST_COVERAGE_FILE", ".coverage")
+# Changes to these never affect tests.
+DOC_SUFFIXES = (".md", ".rst")
+MAX_FAILURES_PER_MODULE = 5
+MAX_MESSAGE_CHARS = 300
+
+_shard_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+def shard_limit(cwd: str) -> asyncio.Semaphore:
+    """Semaphore bounding concurrent test shards per workspace directory."""
+    key = os.path.realpath(cwd)
+    sem = _shard_limits.get(key)
+    if sem is None:
+        sem = asyncio.Semaphore(TEST_WORKERS)
+        _shard_limits[key] = sem
+    return sem
+
+
+def is_test_file(path: str) -> bool:
+    """pytest's default test module pattern: test_*.py or *_test.py."""
+    name = path.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def module_names(path: str) -> List[str]:
+    """Dotted names a file can be imported as, one per directory above it: a/b/c.py -> a.b.c, b.c, c."""
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+
+def parse_imports(path: str, text: str) -> Set[str]:
+    """Dotted names a file imports, with their parent packages; relative imports resolved against its directory."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return set()
+    directory = path.split("/")[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.level - 1 > len(directory):
+                    continue
+                base = directory[:len(directory) - (node.level - 1)]
+                module = ".".join(base + (node.module.split(".") if node.module else []))
+            else:
+                module = node.module or ""
+            if module:
+                names.add(module)
+            # "from pkg import mod" imports the submodule when there is one.
+            names.update(f"{module}.{alias.name}" if module else alias.name for alias in node.names if alias.name != "*")
+    for name in list(names):
+        parts = name.split(".")
+        names.update(".".join(parts[:i]) for i in range(1, len(parts)))
+    return names
+
+
+class ImportGraph:
+    """
+    Which workspace Python files import which, for mapping changed files to tests.
+
+    Built from the code index's file texts; a file's imports are re-parsed
+    only when its version changes. Module names are matched against every
+    directory suffix of a file's path (src/pkg/mod.py is "src.pkg.mod",
+    "pkg.mod" or "mod"), so src layouts and scripts run from subdirectories
+    resolve without knowing sys.path. When a name matches several files the
+    importer's sibling wins, then the shallowest roots, and ties keep all of
+    them: selection errs towards running more tests, never fewer.
+    """
+
+    def __init__(self, index: Optional[CodeIndex] = None):
+        self._index = index
+        self._parsed: Dict[str, Tuple[str, Set[str]]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> CodeIndex:
+        if self._index is None:
+            self._index = get_code_index()
+        return self._index
+
+    def refresh(self):
+        with self._lock:
+            files = self.index.files((".py",))
+            parsed, changed = {}, len(files) != len(self._parsed)
+            for f in files:
+                cached = self._parsed.get(f.path)
+                if cached is None or cached[0] != f.version:
+                    cached = (f.version, parse_imports(f.path, f.text))
+                    changed = True
+                parsed[f.path] = cached
+            if changed:
+                self._parsed = parsed
+                self._build()
+
+    def _build(self):
+        modules: Dict[str, List[str]] = {}
+        for path in self._parsed:
+            for name in module_names(path):
+                modules.setdefault(name, []).append(path)
+        dependents: Dict[str, Set[str]] = {}
+        for importer, (_, names) in self._parsed.items():
+            directory = importer.rsplit("/", 1)[0] + "/" if "/" in importer else ""
+            for name in names:
+                for target in self._resolve(modules.get(name), name, directory):
+                    if target != importer:
+                        dependents.setdefault(target, set()).add(importer)
+        self._dependents = dependents
+
+    @staticmethod
+    def _resolve(candidates: Optional[List[str]], name: str, directory: str) -> List[str]:
+        if not candidates:
+            return []
+        if len(candidates) == 1:
+            return candidates
+        # pytest and scripts put the importer's own directory on sys.path.
+        sibling = directory + name.replace(".", "/")
+        local = [path for path in candidates if path in (sibling + ".py", sibling + "/__init__.py")]
+        if local:
+            return local
+        depth = lambda path: path.count("/") - name.count(".")
+        shallowest = min(depth(path) for path in candidates)
+        return [path for path in candidates if depth(path) == shallowest]
+
+    def test_files(self) -> List[str]:
+        with self._lock:
+            return sorted(path for path in self._parsed if is_test_file(path))
+
+    def affected(self, changed: Iterable[str]) -> Dict[str, str]:
+        """Test files that import a changed file (directly or not), each with the changed file it depends on."""
+        with self._lock:
+            tests = [path for path in self._parsed if is_test_file(path)]
+            found: Dict[str, str] = {}
+            for origin in changed:
+                seen = {origin}
+                queue = deque([origin])
+                while queue:
+                    path = queue.popleft()
+                    if is_test_file(path) and path in self._parsed:
+                        found.setdefault(path, origin)
+                    if path.rsplit("/", 1)[-1] == "conftest.py":
+                        # Fixtures apply to every test module in the conftest's directory and below.
+                        prefix = path[:-len("conftest.py")]
+                        for test in tests:
+                            if test.startswith(prefix):
+                                found.setdefault(test, origin)
+                    for importer in self._dependents.get(path, ()):
+                        if importer not in seen:
+                            seen.add(importer)
+                            queue.append(importer)
+            return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "python_files": len(self._parsed),
+                "test_files": sum(1 for path in self._parsed if is_test_file(path)),
+                "edges": sum(len(importers) for importers in self._dependents.values()),
+            }
+
+
+class CoverageMap:
+    """
+    Which test modules executed each source file, read from a coverage.py data
+    file recorded with per-test contexts (pytest --cov --cov-context=test).
+
+    Catches dependencies the import graph can't see (plugins, importlib,
+    fixtures in other packages). The file's tables are read directly, so
+    coverage.py doesn't have to be installed; the parsed map is cached until
+    the file changes.
+    """
+
+    def __init__(self, path: str = COVERAGE_FILE):
+        self.path = path
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._tests_by_file: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, root: str):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._stamp, self._tests_by_file = None, {}
+            return
+        if self._stamp == (st.st_mtime_ns, st.st_size):
+            return
+        tests_by_file: Dict[str, Set[str]] = {}
+        try:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                queries = [
+                    f"SELECT DISTINCT file.path, context.context FROM {table} "
+                    f"JOIN file ON file.id = {table}.file_id JOIN context ON context.id = {table}.context_id"
+                    for table in ("line_bits", "arc") if table in tables
+                ]
+                for query in queries:
+                    for path, context in conn.execute(query):
+                        # Contexts look like "tests/test_x.py::TestY::test_z|run"; "" is code run outside tests.
+                        test = context.split("::", 1)[0]
+                        if not test.endswith(".py"):
+                            continue
+                        rel = os.path.relpath(path, root).replace(os.sep, "/")
+                        if not rel.startswith("../"):
+                            tests_by_file.setdefault(rel, set()).add(test)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            tests_by_file = {}
+        self._stamp, self._tests_by_file = (st.st_mtime_ns, st.st_size), tests_by_file
+
+    def affected(self, changed: Iterable[str], root: str) -> Dict[str, str]:
+        with self._lock:
+            self._load(root)
+            found: Dict[str, str] = {}
+            for path in changed:
+                for test in self._tests_by_file.get(path, ()):
+                    found.setdefault(test, path)
+            return found
+
+    @property
+    def available(self) -> bool:
+        return bool(self._tests_by_file)
+
+
+def _module_of(testcase: ET.Element) -> str:
+    path = testcase.get("file")
+    if path:
+        return path.replace(os.sep, "/")
+    # Without a file attribute classname is the dotted module path (plus the class, if any).
+    return testcase.get("classname", "").replace(".", "/") + ".py"
+
+
+def parse_junit(path: str) -> Dict[str, Dict[str, Any]]:
+    """Per test module counts, time and failures from a pytest --junitxml report."""
+    modules: Dict[str, Dict[str, Any]] = {}
+    for testcase in ET.parse(path).getroot().iter("testcase"):
+        module = modules.setdefault(_module_of(testcase), {
+            "passed": 0, "failed": 0, "skipped": 0, "errors": 0, "seconds": 0.0, "failures": []
+        })
+        module["seconds"] += float(testcase.get("time") or 0)
+        problem = next((child for child in testcase if child.tag in ("failure", "error")), None)
+        if problem is not None:
+            module["failed" if problem.tag == "failure" else "errors"] += 1
+            if len(module["failures"]) < MAX_FAILURES_PER_MODULE:
+                message = (problem.get("message") or problem.text or "").strip().splitlines()
+                module["failures"].append(
+                    f"{testcase.get('name')}: {message[0][:MAX_MESSAGE_CHARS] if message else problem.tag}"
+                )
+        elif testcase.find("skipped") is not None:
+            module["skipped"] += 1
+        else:
+            module["passed"] += 1
+    return modules
+
+
+def outcome(result: Dict[str, Any]) -> str:
+    if result.get("outcome"):
+        return result["outcome"]
+    if result["failed"] or result["errors"]:
+        return "failed"
+    return "passed" if result["passed"] else "skipped"
+
+
+async def _run_shard(
+    shard: List[str],
+    cwd: str,
+    timeout: float,
+    extra_args: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    fd, report = tempfile.mkstemp(prefix="agent-tests-", suffix=".xml")
+    os.close(fd)
+    try:
+        args = TEST_COMMAND + ["-q", f"--junitxml={report}", "-o", "junit_family=xunit1"] + extra_args + shard
+        result = await run_process(args, cwd=cwd, timeout=timeout)
+        try:
+            modules = parse_junit(report) if os.path.getsize(report) else {}
+        except ET.ParseError:
+            modules = {}
+    finally:
+        os.unlink(report)
+    # Report paths are relative to pytest's rootdir, which may be below cwd.
+    by_path = {}
+    for key, module in modules.items():
+        for path in shard:
+            if path == key or path.endswith("/" + key):
+                by_path[path] = module
+    results = {}
+    tail = (result.stdout.strip() + "\n" + result.stderr.strip()).strip().splitlines()[-5:]
+    for path in shard:
+        module = by_path.get(path)
+        if module is None:
+            # Nothing reported for the module: it timed out, failed to import, or has no tests.
+            module = {"passed": 0, "failed": 0, "skipped": 0, "errors": 0, "seconds": 0.0, "failures": []}
+            if result.timed_out:
+                module["outcome"] = "timeout"
+            elif result.returncode not in (0, 5):
+                module["outcome"] = "error"
+                module["failures"] = tail
+        module["path"] = path
+        results[path] = module
+    return results
+
+
+async def run_tests(
+    paths: List[str],
+    cwd: Optional[str] = None,
+    workers: int = TEST_WORKERS,
+    timeout: float = TEST_TIMEOUT,
+    extra_args: Optional[List[str]] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Runs test modules with pytest in parallel processes and returns per-module results.
+
+    With several workers modules are split into about twice as many shards
+    so a slow module doesn't leave the other workers idle (a single worker
+    runs one shard: every pytest start costs its import time); on_result gets
+    each module's result as soon as its shard finishes.
+    """
+    cwd = cwd or os.getcwd()
+    workers = max(1, min(workers, len(paths)))
+    size = max(1, math.ceil(len(paths) / (workers * 2 if workers > 1 else 1)))
+    shards = [paths[i:i + size] for i in range(0, len(paths), size)]
+    limit = asyncio.Semaphore(workers)
+    results: Dict[str, Dict[str, Any]] = {}
+    started = time.perf_counter()
+
+    async def run(shard: List[str]):
+        async with limit, shard_limit(cwd):
+            done = await _run_shard(shard, cwd, timeout, extra_args or [])
+        for path in shard:
+            results[path] = done[path]
+            if on_result is not None:
+                on_result(done[path])
+
+    await asyncio.gather(*(run(shard) for shard in shards))
+    return {
+        "modules": [results[path] for path in paths],
+        "shards": len(shards),
+        "workers": workers,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+class ImpactSelector:
+    """Maps changed workspace files to the test modules that depend on them."""
+
+    def __init__(self, graph: Optional[ImportGraph] = None, coverage: Optional[CoverageMap] = None):
+        self.graph = graph or ImportGraph()
+        self.coverage = coverage or CoverageMap()
+        self.metrics = {"selections": 0, "selected": 0, "runs": 0, "modules_run": 0, "seconds": 0.0}
+
+    def select(self, changed: List[str], root: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Affected test modules for changed paths: {"tests": {path: reason}, "total": all
+        test modules, "unmapped": changed non-Python files, which imports can't trace}.
+        """
+        root = root or os.getcwd()
+        self.graph.refresh()
+        relevant = [path for path in changed if not path.endswith(DOC_SUFFIXES)]
+        tests = {test: f"depends on {origin}" if test != origin else "changed"
+                 for test, origin in self.graph.affected(relevant).items()}
+        for test, origin in self.coverage.affected(relevant, root).items():
+            # A test recorded in old coverage data may since have been deleted.
+            if test not in tests and os.path.exists(os.path.join(root, test)):
+                tests[test] = f"covers {origin}"
+        unmapped = [path for path in relevant if not path.endswith(".py")]
+        self.metrics["selections"] += 1
+        self.metrics["selected"] += len(tests)
+        return {
+            "tests": dict(sorted(tests.items())),
+            "total": len(self.graph.test_files()),
+            "unmapped": unmapped,
+            "coverage": self.coverage.available,
+        }
+
+    async def run(self, tests: List[str], **kwargs) -> Dict[str, Any]:
+        result = await run_tests(tests, **kwargs)
+        self.metrics["runs"] += 1
+        self.metrics["modules_run"] += len(tests)
+        self.metrics["seconds"] += result["seconds"]
+        return result
+
+    def stats(self) -> dict:
+        return {**self.metrics, **self.graph.stats()}
+
+
+impact_selector = ImpactSelector()
@@ -1,26 +1,136 @@
+import json
 import os
-from typing import Literal, Optional
+import re
+import threading
+import time
+from typing import Any, Dict, Literal, Optional
+
+TaskType = Literal["reasoning", "coding", "fast"]
+
+# CLI model aliases; override with full model ids to pin versions.
+REASONING_MODEL = os.environ.get("AGENT_MODEL_REASONING", "opus")
+CODING_MODEL = os.environ.get("AGENT_MODEL_CODING", "sonnet")
+FAST_MODEL = os.environ.get("AGENT_MODEL_FAST", "haiku")
+ROUTE_LOG = os.environ.get("AGENT_ROUTE_LOG", "")
+
+COMPLEX_MESSAGE_CHARS = 800
+COMPLEX_KEYWORDS = re.compile(
+    r"\b(refactor|architect\w*|design|migrat\w*|redesign|rewrite|debug\w*|race|deadlock|"
+    r"performance|optimi[sz]\w*|security|concurren\w*|across|multiple files|end-to-end|"
+    r"重构|架构|设计|迁移|优化|性能|并发)",
+    re.IGNORECASE
+)
+FILE_MENTION = re.compile(r"\b[\w./-]+\.(py|ts|tsx|js|jsx|json|css|html|md|toml|yaml|yml|go|rs|java|sh)\b")
+
+
+def classify(message: str) -> Literal["simple", "complex"]:
+    """
+    Cheap request classifier (no model call): long requests, requests naming
+    several files, or mentioning design/debugging/performance work are complex.
+    """
+    if len(message) > COMPLEX_MESSAGE_CHARS:
+        return "complex"
+    if len(set(m.group(0) for m in FILE_MENTION.finditer(message))) >= 3:
+        return "complex"
+    if COMPLEX_KEYWORDS.search(message):
+        return "complex"
+    return "simple"
+
 
 class ModelRouter:
     """
     Routing logic for Hybrid Model Strategy.
     """
-    
-    def get_model_name(self, task_type: Literal["reasoning", "coding", "fast"]) -> str:
+
+    TIERS = [FAST_MODEL, CODING_MODEL, REASONING_MODEL]
+
+    def get_model_name(self, task_type: TaskType) -> str:
         """
         Returns the appropriate model name string for Claude Agent SDK.
         """
         if task_type == "reasoning":
-            # Complex reasoning/planning -> Claude 3.5 Sonnet (or Opus if available)
-            return "claude-3-5-sonnet-20240620"
-            
+            # Complex reasoning/planning
+            return REASONING_MODEL
+
         elif task_type == "coding":
-            # Coding/Editing -> Claude 3.5 Sonnet
-            return "claude-3-5-sonnet-20240620"
-            
+            # Coding/Editing
+            return CODING_MODEL
+
         elif task_type == "fast":
-            # Fast completion -> Claude 3 Haiku
-            return "claude-3-haiku-20240307"
-            
+            # Fast completion
+            return FAST_MODEL
+
         else:
-            return "claude-3-5-sonnet-20240620"
+            return CODING_MODEL
+
+    def route(self, mode: str, message: str) -> Dict[str, Any]:
+        """
+        Picks the models for one run from the mode and a cheap classification
+        of the request. Simple requests stay on smaller models; only complex
+        ones pay for the larger tiers.
+        """
+        complexity = classify(message)
+        hard = complexity == "complex"
+        if mode == "fast":
+            models = {"Editor": self.get_model_name("coding" if hard else "fast")}
+        else:
+            models = {
+                "Manager": self.get_model_name("reasoning" if hard else "coding"),
+                "Editor": self.get_model_name("coding"),
+                "Verifier": self.get_model_name("coding" if hard else "fast"),
+            }
+        return {"name": f"{mode}:{complexity}", "mode": mode, "complexity": complexity, "models": models, "escalations": 0}
+
+    def escalate(self, route: Dict[str, Any], agent: str) -> Dict[str, Any]:
+        """Moves agent one model tier up (e.g. after a failed verification)."""
+        current = route["models"].get(agent, self.get_model_name("coding"))
+        index = self.TIERS.index(current) if current in self.TIERS else 1
+        if index + 1 >= len(self.TIERS):
+            return route
+        models = {**route["models"], agent: self.TIERS[index + 1]}
+        return {**route, "models": models, "escalations": route.get("escalations", 0) + 1}
+
+
+class RouteMetrics:
+    """
+    Latency, token and cost totals per (route, agent, model), for tuning routing
+    from real traffic. Each call is also appended to AGENT_ROUTE_LOG (JSON lines) if set.
+    """
+
+    def __init__(self, log_path: str = ROUTE_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, Dict[str, float]] = {}
+
+    def record(self, route: str, agent: str, model: str, latency: float, tokens: int = 0, cost_usd: Optional[float] = None):
+        key = (route, agent, model)
+        with self._lock:
+            stats = self._stats.setdefault(key, {"calls": 0, "latency_seconds": 0.0, "max_latency_seconds": 0.0, "tokens": 0, "cost_usd": 0.0})
+            stats["calls"] += 1
+            stats["latency_seconds"] += latency
+            stats["max_latency_seconds"] = max(stats["max_latency_seconds"], latency)
+            stats["tokens"] += tokens
+            stats["cost_usd"] += cost_usd or 0.0
+        if self.log_path:
+            entry = {"ts": time.time(), "route": route, "agent": agent, "model": model, "latency": latency, "tokens": tokens, "cost_usd": cost_usd}
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [
+                {
+                    "route": route,
+                    "agent": agent,
+                    "model": model,
+                    **stats,
+                    "avg_latency_seconds": stats["latency_seconds"] / stats["calls"]
+                }
+                for (route, agent, model), stats in sorted(self._stats.items())
+            ]
+
+
+route_metrics = RouteMetrics()
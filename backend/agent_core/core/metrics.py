@@ -0,0 +1,302 @@
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("AGENT_METRICS", "1") != "0"
+# JSON lines of OpenTelemetry-shaped spans; empty disables trace export.
+TRACE_FILE = os.environ.get("AGENT_TRACE_FILE", "")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+Labels = Tuple[str, ...]
+# (name suffix, labels, value); the suffix is "_bucket"/"_count"/"_sum" for histograms.
+Sample = Tuple[str, Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[Family]:
+        with self._lock:
+            samples = [("", dict(zip(self.labelnames, labels)), value) for labels, value in sorted(self._values.items())]
+        return [(self.name, "counter", self.help, samples)]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., count, sum]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return int(state[-2]) if state else 0
+
+    def collect(self) -> List[Family]:
+        with self._lock:
+            items = sorted((labels, list(state)) for labels, state in self._values.items())
+        samples: List[Sample] = []
+        for labels, state in items:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append(("_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append(("_bucket", {**base, "le": "+Inf"}, state[-2]))
+            samples.append(("_count", base, state[-2]))
+            samples.append(("_sum", base, state[-1]))
+        return [(self.name, "histogram", self.help, samples)]
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text format: our own counters and
+    histograms plus collectors that turn existing stats() dicts into gauges.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[Family]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Family]]):
+        self._collectors.append(collector)
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]], labels: Optional[Dict[str, str]] = None):
+        """Exposes every numeric value of stats() as a gauge named agent_<prefix>_<key>."""
+        def collect():
+            families = []
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                families.append((f"agent_{prefix}_{key}", "gauge", f"{prefix} stats: {key}", [("", dict(labels or {}), value)]))
+            return families
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        families: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        sources = [m.collect for m in self._metrics] + self._collectors
+        for source in sources:
+            try:
+                collected = source()
+            except Exception:
+                # A broken stats source must not take /metrics down.
+                continue
+            for name, type_, help, samples in collected:
+                family = families.setdefault(name, (type_, help, []))
+                family[2].extend(samples)
+        lines = []
+        for name, (type_, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type_}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+span_seconds = registry.histogram("agent_span_seconds", "Duration of graph nodes, agent turns and tool calls", ["kind", "name"])
+span_errors = registry.counter("agent_span_errors_total", "Spans that ended with an error", ["kind", "name"])
+cli_spawn_seconds = registry.histogram("agent_cli_spawn_seconds", "Time to start and connect a Claude CLI session", ["mode"])
+first_token_seconds = registry.histogram("agent_first_token_seconds", "Time from sending a prompt to the first text block", ["agent"])
+tokens_total = registry.counter("agent_tokens_total", "Tokens reported by the CLI", ["agent", "direction"])
+sse_bytes_total = registry.counter("agent_sse_bytes_total", "Bytes written to SSE streams")
+sse_events_total = registry.counter("agent_sse_events_total", "Events written to SSE streams")
+
+
+class TraceExporter:
+    """Appends finished spans as JSON lines shaped like OpenTelemetry spans."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: "Span"):
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id,
+            "name": f"{span.kind}:{span.name}",
+            "kind": span.kind,
+            "startTimeUnixNano": span.start_ns,
+            "endTimeUnixNano": span.start_ns + int(span.duration * 1e9),
+            "attributes": span.attributes,
+            "status": {"code": "ERROR", "message": span.error} if span.error else {"code": "OK"},
+        }
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+trace_exporter: Optional[TraceExporter] = TraceExporter(TRACE_FILE) if TRACE_FILE else None
+_current_span: ContextVar[Optional["Span"]] = ContextVar("agent_current_span", default=None)
+
+
+class Span:
+    """A timed region (sync or async context manager). Nested spans share a trace id."""
+
+    __slots__ = ("kind", "name", "attributes", "trace_id", "span_id", "parent_id", "start_ns", "duration", "error", "_started", "_token")
+
+    def __init__(self, kind: str, name: str, attributes: Dict[str, Any]):
+        self.kind = kind
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def fail(self, message: str):
+        """Marks the span as failed for errors that are handled rather than raised."""
+        self.error = message
+
+    def __enter__(self):
+        self._token = None
+        if trace_exporter is not None:
+            # Ids and parent links only matter when spans are exported.
+            parent = _current_span.get()
+            self.span_id = f"{random.getrandbits(64):016x}"
+            self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+            self.parent_id = parent.span_id if parent is not None else None
+            self.start_ns = time.time_ns()
+            self._token = _current_span.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        span_seconds.observe(self.duration, self.kind, self.name)
+        if self.error is not None:
+            span_errors.inc(1.0, self.kind, self.name)
+        if self._token is not None:
+            _current_span.reset(self._token)
+            trace_exporter.export(self)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopSpan:
+    """What span() returns when metrics are disabled: no clocks, no allocation."""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def fail(self, message: str):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(kind: str, name: str, **attributes: Any):
+    if not METRICS_ENABLED:
+        return NOOP_SPAN
+    return Span(kind, name, attributes)
+
+
+def traced(kind: str, name: str):
+    """Decorator timing every call of a function (sync or async) as a span."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with Span(kind, name, {}):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(kind, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
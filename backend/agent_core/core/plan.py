@@ -0,0 +1,118 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+MAX_PARALLEL_EDITORS = int(os.environ.get("AGENT_MAX_PARALLEL_EDITORS", "4"))
+
+
+class PlanError(ValueError):
+    pass
+
+
+def merge_results(current: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """State reducer for task results: parallel branches merge by task id, None resets."""
+    if update is None:
+        return {}
+    return {**(current or {}), **update}
+
+
+def normalize_plan(tasks: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Validates a task list into a DAG.
+
+    Each task is {"id", "description", "files", "depends_on"}; plain strings are
+    accepted as independent tasks. Raises PlanError on duplicate ids, unknown
+    dependencies or cycles.
+    """
+    plan = []
+    for index, task in enumerate(tasks):
+        if isinstance(task, str):
+            task = {"description": task}
+        if not isinstance(task, dict) or not task.get("description"):
+            raise PlanError(f"Task {index + 1} needs a description")
+        plan.append({
+            "id": str(task.get("id") or index + 1),
+            "description": str(task["description"]),
+            "files": [str(f) for f in task.get("files") or []],
+            "depends_on": [str(d) for d in task.get("depends_on") or []],
+        })
+
+    ids = [task["id"] for task in plan]
+    if len(set(ids)) != len(ids):
+        raise PlanError("Task ids must be unique")
+    for task in plan:
+        unknown = [d for d in task["depends_on"] if d not in ids]
+        if unknown:
+            raise PlanError(f"Task {task['id']} depends on unknown task(s): {', '.join(unknown)}")
+    if sum(len(level) for level in waves(plan)) != len(plan):
+        raise PlanError("Task dependencies contain a cycle")
+    return plan
+
+
+def waves(plan: List[Dict[str, Any]]) -> List[List[str]]:
+    """Groups task ids into levels that can run in parallel (cyclic tasks are left out)."""
+    remaining = {task["id"]: set(task["depends_on"]) for task in plan}
+    done = set()
+    levels = []
+    while remaining:
+        level = [tid for tid, deps in remaining.items() if deps <= done]
+        if not level:
+            break
+        levels.append(level)
+        done.update(level)
+        for tid in level:
+            del remaining[tid]
+    return levels
+
+
+def ready_tasks(plan: List[Dict[str, Any]], results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tasks not yet run whose dependencies all finished successfully."""
+    return [
+        task for task in plan
+        if task["id"] not in results
+        and all(results.get(dep, {}).get("status") == "done" for dep in task["depends_on"])
+    ]
+
+
+def blocked_tasks(plan: List[Dict[str, Any]], results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tasks not yet run that can never run because a dependency failed or was skipped."""
+    return [
+        task for task in plan
+        if task["id"] not in results
+        and any(results.get(dep, {}).get("status") in ("failed", "skipped") for dep in task["depends_on"])
+    ]
+
+
+class FileLocks:
+    """Per-file asyncio locks so parallel editors never write the same file at once."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, paths: Iterable[str]):
+        # Sorted acquisition order avoids deadlocks between overlapping tasks.
+        keys = sorted({os.path.realpath(p) for p in paths})
+        for key in keys:
+            self._users[key] = self._users.get(key, 0) + 1
+            self._locks.setdefault(key, asyncio.Lock())
+        acquired = []
+        try:
+            for key in keys:
+                await self._locks[key].acquire()
+                acquired.append(key)
+            yield
+        finally:
+            for key in acquired:
+                self._locks[key].release()
+            for key in keys:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._locks[key]
+
+
+file_locks = FileLocks()
+editor_slots = asyncio.Semaphore(MAX_PARALLEL_EDITORS)
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import signal
+from typing import Dict, List, Optional
+
+MAX_PROCS_PER_WORKSPACE = int(os.environ.get("AGENT_MAX_PROCS_PER_WORKSPACE", "4"))
+OUTPUT_HEAD_BYTES = 16 * 1024
+OUTPUT_TAIL_BYTES = 16 * 1024
+READ_CHUNK = 8192
+
+_workspace_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+class BoundedOutput:
+    """
+    Captures a stream keeping only its first `head` and last `tail` bytes.
+
+    Memory stays bounded no matter how chatty the command is; the middle is
+    replaced by a marker saying how much was dropped.
+    """
+
+    def __init__(self, head: int = OUTPUT_HEAD_BYTES, tail: int = OUTPUT_TAIL_BYTES):
+        self.head_limit = head
+        self.tail_limit = tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_limit:
+                del self.tail[: len(self.tail) - self.tail_limit]
+
+    @property
+    def dropped(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.dropped > 0:
+            return f"{head}\n... [{self.dropped} bytes truncated] ...\n{tail}"
+        return head + tail
+
+
+class ProcessResult:
+    def __init__(self, returncode: Optional[int], stdout: BoundedOutput, stderr: BoundedOutput, timed_out: bool):
+        self.returncode = returncode
+        self.stdout = stdout.text()
+        self.stderr = stderr.text()
+        self.timed_out = timed_out
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+
+def workspace_limit(cwd: Optional[str] = None) -> asyncio.Semaphore:
+    """
+    Semaphore bounding concurrent agent-issued shell commands per workspace directory.
+
+    Only run_shell takes it: internal git plumbing runs while the snapshot
+    store holds its lock and must never queue behind a long build.
+    """
+    key = os.path.realpath(cwd or os.getcwd())
+    sem = _workspace_limits.get(key)
+    if sem is None:
+        sem = asyncio.Semaphore(MAX_PROCS_PER_WORKSPACE)
+        _workspace_limits[key] = sem
+    return sem
+
+
+async def _pump(stream: asyncio.StreamReader, sink: BoundedOutput):
+    while True:
+        chunk = await stream.read(READ_CHUNK)
+        if not chunk:
+            return
+        sink.write(chunk)
+
+
+def _kill(proc: asyncio.subprocess.Process):
+    """Kills the whole process group so shell children don't outlive the tool call."""
+    if proc.returncode is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_process(
+    args: List[str],
+    cwd: Optional[str] = None,
+    timeout: Optional[float] = 60,
+    env: Optional[Dict[str, str]] = None,
+    input: Optional[bytes] = None,
+) -> ProcessResult:
+    """
+    Runs args without blocking the event loop.
+
+    stdout/stderr are drained concurrently into bounded buffers. On timeout or
+    cancellation (e.g. the client disconnected) the process group is killed.
+    input, if given, is written to the process's stdin.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL if input is None else asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    stdout, stderr = BoundedOutput(), BoundedOutput()
+
+    async def feed():
+        if input is None:
+            return
+        try:
+            proc.stdin.write(input)
+            await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    async def communicate():
+        await asyncio.gather(feed(), _pump(proc.stdout, stdout), _pump(proc.stderr, stderr))
+        await proc.wait()
+
+    task = asyncio.ensure_future(communicate())
+    timed_out = False
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        _kill(proc)
+        # Pipes close once the group is dead; don't hang on escaped daemons.
+        try:
+            await asyncio.wait_for(task, 5)
+        except asyncio.TimeoutError:
+            pass
+    except BaseException:
+        _kill(proc)
+        task.cancel()
+        raise
+    return ProcessResult(proc.returncode, stdout, stderr, timed_out)
+
+
+async def run_shell(command: str, cwd: Optional[str] = None, timeout: Optional[float] = 60) -> ProcessResult:
+    """Runs an agent-issued shell command, taking one of the workspace's command slots."""
+    async with workspace_limit(cwd):
+        return await run_process(["/bin/sh", "-c", command], cwd=cwd, timeout=timeout)
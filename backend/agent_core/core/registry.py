@@ -0,0 +1,123 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Components built in the background once the server is up; the rest are built on first use.
+PREWARM = [name.strip() for name in os.environ.get("AGENT_PREWARM", "Manager,Editor,Verifier").split(",") if name.strip()]
+# Also pre-spawn warm CLI sessions for the prewarmed agents.
+SESSION_PREWARM = os.environ.get("AGENT_SESSION_PREWARM", "0") == "1"
+
+
+class Component:
+    def __init__(self, name: str, factory: Callable[[], Any], warm: Optional[Callable[[Any], Awaitable[None]]] = None):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.instance: Any = None
+        self.build_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+
+class LazyRegistry:
+    """
+    Named singletons built on first use.
+
+    Agents build MCP tool servers and pull in the Claude SDK, Playwright and
+    friends, which makes importing the API slow for every worker, script and
+    benchmark that never runs an agent. Registering a factory here instead
+    defers that to the first get(); warm_up() builds the usual ones in a
+    thread after the server is accepting requests.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], warm: Optional[Callable[[Any], Awaitable[None]]] = None):
+        """Registers factory under name; warm(instance), if given, runs after a warm_up() build."""
+        self._components[name] = Component(name, factory, warm)
+
+    def get(self, name: str) -> Any:
+        component = self._components[name]
+        if component.instance is None:
+            with component.lock:
+                if component.instance is None:
+                    started = time.perf_counter()
+                    component.instance = component.factory()
+                    component.build_seconds = time.perf_counter() - started
+        return component.instance
+
+    async def aget(self, name: str) -> Any:
+        """get() for the event loop: a first build runs in a thread instead of blocking the loop."""
+        instance = self._components[name].instance
+        return instance if instance is not None else await asyncio.to_thread(self.get, name)
+
+    def peek(self, name: str) -> Any:
+        """The instance if it was already built, else None (never builds)."""
+        component = self._components.get(name)
+        return component.instance if component is not None else None
+
+    def names(self) -> List[str]:
+        return list(self._components)
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Builds components (default: AGENT_PREWARM) and runs their warm hooks; failures are logged, not raised."""
+        for name in PREWARM if names is None else names:
+            if name not in self._components:
+                print(f"Unknown component to prewarm: {name}")
+                continue
+            try:
+                instance = await self.aget(name)
+                warm = self._components[name].warm
+                if warm is not None:
+                    await warm(instance)
+            except Exception as e:
+                print(f"Prewarming {name} failed: {e}")
+
+    def stats(self) -> dict:
+        built = {c.name: c.build_seconds for c in self._components.values() if c.instance is not None}
+        return {
+            "registered": len(self._components),
+            "built": len(built),
+            "build_seconds": sum(built.values()),
+            "components": built,
+        }
+
+
+def _manager():
+    from agent_core.agents.manager import ManagerAgent
+    return ManagerAgent()
+
+
+def _editor():
+    from agent_core.agents.editor import EditorAgent
+    return EditorAgent()
+
+
+def _verifier():
+    from agent_core.agents.verifier import VerifierAgent
+    return VerifierAgent()
+
+
+def _browser():
+    from agent_core.tools.browser import browser_manager
+    return browser_manager
+
+
+async def _warm_agent(agent):
+    if SESSION_PREWARM and agent.session_pool is not None:
+        await agent.session_pool.warm_up()
+
+
+async def _warm_browser(browser):
+    await browser.start()
+
+
+components = LazyRegistry()
+components.register("Manager", _manager, _warm_agent)
+components.register("Editor", _editor, _warm_agent)
+components.register("Verifier", _verifier, _warm_agent)
+components.register("browser", _browser, _warm_browser)
+
+AGENT_NAMES = ("Manager", "Editor", "Verifier")
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+RESPONSE_CACHE_ENABLED = os.environ.get("AGENT_RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_DB = os.environ.get("AGENT_RESPONSE_CACHE_DB", os.path.join(".agent", "response_cache.sqlite"))
+RESPONSE_CACHE_TTL = float(os.environ.get("AGENT_RESPONSE_CACHE_TTL", str(7 * 86400)))
+RESPONSE_CACHE_SIZE = int(os.environ.get("AGENT_RESPONSE_CACHE_SIZE", "256"))
+# Keep every tool call with its result (usable as offline fixtures), not only the ones replay needs.
+RECORD_TRACES = os.environ.get("AGENT_RESPONSE_CACHE_TRACES", "0") == "1"
+# Bump when the entry format or replay semantics change.
+CACHE_VERSION = 2
+
+# Tools a replay calls again with the recorded input: their effect only depends on it.
+REPLAYED_TOOLS = {"write_file", "write_files", "create_plan", "report_status"}
+# Tools whose effects a replay can't reproduce (shell side effects, checkpoints and
+# resets, navigating or typing into the thread's page, files captured from a live
+# page); turns that call them are not cached.
+UNCACHEABLE_TOOLS = {
+    "run_shell_command", "git_commit", "git_reset",
+    "open_url", "click_element", "fill_form", "take_screenshot", "compare_screenshot"
+}
+# The same for run_browser_script steps.
+UNCACHEABLE_SCRIPT_ACTIONS = {"goto", "click", "fill", "screenshot"}
+MAX_RESULT_CHARS = 4000
+
+
+def bare_tool_name(name: str) -> str:
+    return name.rsplit("__", 1)[-1]
+
+
+class TurnRecorder:
+    """
+    Collects what one agent turn streamed, in order, as steps: {"text": ...}
+    and {"tool": name, "input": ...} (plus "result" when traces are recorded).
+    The same format is what the offline benchmarks' scripted client replays.
+    """
+
+    def __init__(self, record_traces: bool = RECORD_TRACES):
+        self.record_traces = record_traces
+        self.steps: List[Dict[str, Any]] = []
+        self.usage: Dict[str, Any] = {}
+        self.cacheable = True
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    def text(self, text: str):
+        self.steps.append({"text": text})
+
+    def tool_use(self, tool_id: str, name: str, input: Dict[str, Any]):
+        bare = bare_tool_name(name)
+        if bare in UNCACHEABLE_TOOLS or (
+            bare == "run_browser_script"
+            and any(
+                step.get("action") in UNCACHEABLE_SCRIPT_ACTIONS for step in input.get("steps") or [] if isinstance(step, dict)
+            )
+        ):
+            self.cacheable = False
+        if self.record_traces or bare in REPLAYED_TOOLS:
+            step = {"tool": name, "input": input}
+            self.steps.append(step)
+            self._calls[tool_id] = step
+
+    def tool_result(self, tool_id: str, content: Any, is_error: Optional[bool]):
+        step = self._calls.get(tool_id)
+        if step is None or not self.record_traces:
+            return
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        step["result"] = (content or "")[:MAX_RESULT_CHARS]
+        if is_error:
+            step["is_error"] = True
+
+    def entry(self) -> Dict[str, Any]:
+        return {"steps": self.steps, "usage": self.usage}
+
+
+class ResponseCache:
+    """
+    Exact-match cache of agent turns: an in-memory LRU in front of a SQLite
+    table, both with a TTL.
+
+    The key covers everything that determines a turn: agent, system prompt,
+    model, tools, the full prompt and the workspace tree it ran against (the
+    snapshot tree hash), so a hit only happens for the same request on the
+    same files. Entries are the turn's recorded steps; replaying them streams
+    the text again and re-applies file writes, plans and status reports.
+    """
+
+    def __init__(
+        self,
+        path: str = RESPONSE_CACHE_DB,
+        ttl: float = RESPONSE_CACHE_TTL,
+        size: int = RESPONSE_CACHE_SIZE,
+        enabled: bool = RESPONSE_CACHE_ENABLED
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.size = size
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.metrics = {"lookups": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "uncacheable": 0}
+
+    @staticmethod
+    def key(agent: str, system_prompt: str, model: Optional[str], tools: List[str], prompt: str, fingerprint: str) -> str:
+        material = json.dumps([CACHE_VERSION, agent, system_prompt, model, sorted(tools), prompt, fingerprint])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use so importing has no filesystem side effects.
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, agent TEXT NOT NULL, entry TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _remember(self, key: str, created_at: float, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = (created_at, entry)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached entry for key (memory first, then disk), or None."""
+        self.metrics["lookups"] += 1
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None and now - cached[0] > self.ttl:
+                del self._memory[key]
+                cached = None
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return cached[1]
+            row = self._db().execute("SELECT entry, created_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > self.ttl:
+            self.metrics["misses"] += 1
+            return None
+        entry = json.loads(row[0])
+        self._remember(key, row[1], entry)
+        self.metrics["disk_hits"] += 1
+        return entry
+
+    def put(self, key: str, agent: str, entry: Dict[str, Any]):
+        now = time.time()
+        self._remember(key, now, entry)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, agent, entry, created_at) VALUES (?, ?, ?, ?)",
+                (key, agent, json.dumps(entry), now)
+            )
+            db.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl,))
+            db.commit()
+        self.metrics["stored"] += 1
+
+    def export(self, agent: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest entries first, as {"agent", "created_at", "steps", "usage"} (fixtures for offline runs)."""
+        query = "SELECT agent, entry, created_at FROM response_cache"
+        params: tuple = ()
+        if agent is not None:
+            query += " WHERE agent = ?"
+            params = (agent,)
+        with self._lock:
+            rows = self._db().execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [{"agent": row[0], "created_at": row[2], **json.loads(row[1])} for row in rows]
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            removed = db.execute("DELETE FROM response_cache").rowcount
+            db.commit()
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.metrics["lookups"]
+        hits = self.metrics["memory_hits"] + self.metrics["disk_hits"]
+        return {
+            **self.metrics,
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from agent_core.core.cluster import WORKER_ID
+
+MAX_RUNNING = int(os.environ.get("AGENT_MAX_RUNS", "8"))
+MAX_RUNNING_PER_TENANT = int(os.environ.get("AGENT_MAX_RUNS_PER_TENANT", "2"))
+MAX_QUEUED = int(os.environ.get("AGENT_RUN_QUEUE_SIZE", "64"))
+RUN_BUFFER_EVENTS = int(os.environ.get("AGENT_RUN_BUFFER_EVENTS", "5000"))
+RUN_RETENTION_SECONDS = float(os.environ.get("AGENT_RUN_RETENTION_SECONDS", "900"))
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class SchedulerFull(Exception):
+    """Raised when the run queue is full; callers should retry later."""
+
+
+class ThreadBusy(Exception):
+    """Raised when a thread already has a queued or running run."""
+
+    def __init__(self, run: "Run"):
+        super().__init__(f"Thread {run.thread_id} already has an active run ({run.id})")
+        self.run = run
+
+
+class EventBuffer:
+    """
+    Append-only event log of one run, kept as a ring buffer of the last
+    `size` events. Every event gets a sequence number (the SSE event id), so
+    subscribers can resume after a disconnect from the last id they saw.
+    """
+
+    def __init__(self, size: int = RUN_BUFFER_EVENTS):
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=size)
+        self._next_seq = 1
+        self._changed = asyncio.Event()
+        self.closed = False
+
+    def append(self, event: Dict[str, Any]) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._events.append((seq, event))
+        self._wake()
+        return seq
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yields (seq, event) for every event after `after`, then follows the run
+        until it finishes. Events that already fell out of the buffer are
+        reported once as a "gap" event.
+        """
+        while True:
+            changed = self._changed
+            if self._events:
+                oldest = self._events[0][0]
+                if after < oldest - 1:
+                    yield oldest - 1, {"type": "gap", "missed": oldest - 1 - after}
+                    after = oldest - 1
+                for seq, event in list(self._events):
+                    if seq > after:
+                        yield seq, event
+                        after = seq
+            if self.closed and after >= self.last_seq:
+                return
+            await changed.wait()
+
+
+class Run:
+    def __init__(self, thread_id: str, tenant: str, make_events: Callable[[], AsyncIterator[Dict[str, Any]]], meta: Dict[str, Any]):
+        # The worker id prefix lets the multi-worker router send /runs/{id} to the right process.
+        self.id = f"{WORKER_ID}-{uuid.uuid4().hex}"
+        self.thread_id = thread_id
+        self.tenant = tenant
+        self.meta = meta
+        self.make_events = make_events
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events = EventBuffer()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status not in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "thread_id": self.thread_id,
+            "tenant": self.tenant,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "last_event_id": self.events.last_seq,
+            **self.meta,
+        }
+
+
+class RunScheduler:
+    """
+    Runs graph executions as background tasks, decoupled from the HTTP
+    connection that started them.
+
+    At most `max_running` runs execute at once, and at most `per_tenant` per
+    tenant; the rest wait in a bounded FIFO queue (a full queue rejects new
+    runs, which is the backpressure signal). The queue is scanned in order for
+    the first run whose tenant has a free slot, so one busy tenant can't block
+    the others. A thread has at most one active run, since runs of the same
+    thread would race on its state.
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING, per_tenant: int = MAX_RUNNING_PER_TENANT, max_queued: int = MAX_QUEUED):
+        self.max_running = max_running
+        self.per_tenant = per_tenant
+        self.max_queued = max_queued
+        self._runs: Dict[str, Run] = {}
+        self._queue: List[Run] = []
+        self._running: Dict[str, int] = {}
+        self._listeners: List[Callable[[Run], Awaitable[None]]] = []
+        self.metrics = {"submitted": 0, "rejected": 0, "started": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "queue_wait_seconds": 0.0}
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    def submit(
+        self,
+        thread_id: str,
+        make_events: Callable[[], AsyncIterator[Dict[str, Any]]],
+        tenant: str = "default",
+        meta: Optional[Dict[str, Any]] = None
+    ) -> Run:
+        """Queues a run whose events come from make_events(); raises ThreadBusy or SchedulerFull."""
+        self._prune()
+        for run in self._runs.values():
+            if run.thread_id == thread_id and run.active:
+                raise ThreadBusy(run)
+        if len(self._queue) >= self.max_queued:
+            self.metrics["rejected"] += 1
+            raise SchedulerFull(f"Run queue is full ({self.max_queued} waiting)")
+        run = Run(thread_id, tenant, make_events, meta or {})
+        self._runs[run.id] = run
+        self._queue.append(run)
+        self.metrics["submitted"] += 1
+        run.events.append({"type": "queued", "run_id": run.id, "thread_id": thread_id, "position": len(self._queue)})
+        self._pump()
+        return run
+
+    def add_listener(self, callback: Callable[[Run], Awaitable[None]]):
+        """Registers a coroutine function awaited with every run once it has finished (e.g. to free its resources)."""
+        self._listeners.append(callback)
+
+    def _pump(self):
+        for run in list(self._queue):
+            if self.running >= self.max_running:
+                return
+            if self._running.get(run.tenant, 0) >= self.per_tenant:
+                continue
+            self._queue.remove(run)
+            self._running[run.tenant] = self._running.get(run.tenant, 0) + 1
+            run.status = "running"
+            run.started_at = time.time()
+            self.metrics["started"] += 1
+            self.metrics["queue_wait_seconds"] += run.started_at - run.created_at
+            run.task = asyncio.create_task(self._execute(run))
+
+    async def _execute(self, run: Run):
+        try:
+            async for event in run.make_events():
+                run.events.append(event)
+            run.status = "succeeded"
+        except asyncio.CancelledError:
+            run.status = "cancelled"
+            run.events.append({"type": "cancelled"})
+        except Exception as e:
+            run.status = "failed"
+            run.error = str(e)
+            run.events.append({"type": "error", "message": str(e)})
+        finally:
+            run.finished_at = time.time()
+            run.events.close()
+            self.metrics[run.status] += 1
+            self._running[run.tenant] -= 1
+            if not self._running[run.tenant]:
+                del self._running[run.tenant]
+            self._pump()
+            for callback in self._listeners:
+                try:
+                    await callback(run)
+                except Exception:
+                    pass
+
+    def cancel(self, run_id: str) -> Optional[Run]:
+        """Cancels a queued or running run. Returns None for unknown ids."""
+        run = self._runs.get(run_id)
+        if run is None or not run.active:
+            return run
+        if run in self._queue:
+            self._queue.remove(run)
+            run.status = "cancelled"
+            run.finished_at = time.time()
+            run.events.append({"type": "cancelled"})
+            run.events.close()
+            self.metrics["cancelled"] += 1
+        elif run.task is not None:
+            run.task.cancel()
+        return run
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self._runs.get(run_id)
+
+    def list(self, thread_id: Optional[str] = None) -> List[Run]:
+        self._prune()
+        return [run for run in self._runs.values() if thread_id is None or run.thread_id == thread_id]
+
+    def _prune(self):
+        cutoff = time.time() - RUN_RETENTION_SECONDS
+        for run_id in [r.id for r in self._runs.values() if r.finished_at is not None and r.finished_at < cutoff]:
+            del self._runs[run_id]
+
+    async def shutdown(self):
+        """Cancels every queued and running run (server shutdown)."""
+        for run in list(self._runs.values()):
+            self.cancel(run.id)
+        tasks = [run.task for run in self._runs.values() if run.task is not None and not run.task.done()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        started = self.metrics["started"]
+        return {
+            **self.metrics,
+            "running": self.running,
+            "queued": len(self._queue),
+            "running_by_tenant": dict(self._running),
+            "avg_queue_wait_seconds": self.metrics["queue_wait_seconds"] / started if started else 0.0,
+        }
+
+
+run_scheduler = RunScheduler()
@@ -0,0 +1,346 @@
+import glob
+import hashlib
+import io
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+SCREENSHOT_DIR = os.environ.get("AGENT_SCREENSHOT_DIR", os.path.join(".agent", "screenshots"))
+SCREENSHOT_TTL = float(os.environ.get("AGENT_SCREENSHOT_TTL", str(3 * 86400)))
+SCREENSHOT_MAX_BYTES = int(os.environ.get("AGENT_SCREENSHOT_MAX_MB", "200")) * 1024 * 1024
+# Captures within this many bits (of 64) of an earlier one are pixel-compared as dedupe candidates.
+PHASH_DISTANCE = int(os.environ.get("AGENT_SCREENSHOT_PHASH_DISTANCE", "6"))
+# A pixel counts as changed when a channel differs by more than this (absorbs anti-aliasing noise).
+PIXEL_THRESHOLD = int(os.environ.get("AGENT_SCREENSHOT_PIXEL_THRESHOLD", "24"))
+PREVIEW_WIDTH = int(os.environ.get("AGENT_SCREENSHOT_PREVIEW_WIDTH", "768"))
+PREVIEW_FORMAT = os.environ.get("AGENT_SCREENSHOT_PREVIEW_FORMAT", "webp")
+PREVIEW_QUALITY = 70
+# Changed pixels are grouped into regions on a grid of cells this many pixels wide.
+DIFF_CELL = 16
+MAX_REGIONS = 10
+DEDUPE_CANDIDATES = 3
+EVICT_INTERVAL = 60.0
+
+
+class ScreenshotError(Exception):
+    pass
+
+
+def _pil():
+    # Imported on first use: Pillow is only needed once something is hashed, previewed or diffed.
+    try:
+        from PIL import Image, ImageChops
+    except ImportError:
+        raise ScreenshotError("Pillow is required for screenshot hashing, previews and diffs (pip install pillow)")
+    return Image, ImageChops
+
+
+def png_size(data: bytes) -> tuple:
+    """(width, height) from a PNG header, without decoding it."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n" or len(data) < 24:
+        raise ScreenshotError("not a PNG image")
+    return struct.unpack(">II", data[16:24])
+
+
+def dhash(image) -> str:
+    """64-bit difference hash: how brightness changes between neighbouring cells of a 9x8 thumbnail."""
+    Image, _ = _pil()
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _regions(mask, width: int, height: int) -> List[Dict[str, int]]:
+    """Bounding boxes (pixels) of 8-connected groups of changed grid cells, largest first."""
+    cols, rows = math.ceil(width / DIFF_CELL), math.ceil(height / DIFF_CELL)
+    # reduce() averages each cell (partial edge cells included), so any changed pixel leaves it non-zero.
+    grid = list(mask.reduce(DIFF_CELL).getdata())
+    seen = [False] * len(grid)
+    boxes = []
+    for start, value in enumerate(grid):
+        if not value or seen[start]:
+            continue
+        seen[start] = True
+        stack, cells = [start], 0
+        left, top, right, bottom = cols, rows, -1, -1
+        while stack:
+            cell = stack.pop()
+            cells += 1
+            r, c = divmod(cell, cols)
+            left, top, right, bottom = min(left, c), min(top, r), max(right, c), max(bottom, r)
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < rows and 0 <= nc < cols:
+                        neighbour = nr * cols + nc
+                        if grid[neighbour] and not seen[neighbour]:
+                            seen[neighbour] = True
+                            stack.append(neighbour)
+        x, y = left * DIFF_CELL, top * DIFF_CELL
+        boxes.append((cells, {
+            "x": x,
+            "y": y,
+            "width": min((right + 1) * DIFF_CELL, width) - x,
+            "height": min((bottom + 1) * DIFF_CELL, height) - y,
+        }))
+    boxes.sort(key=lambda box: -box[0])
+    return [box for _, box in boxes]
+
+
+def diff_images(base, current, threshold: int = PIXEL_THRESHOLD) -> Dict[str, Any]:
+    """Pixel diff of current against base: similarity (1 - changed fraction), changed regions."""
+    Image, ImageChops = _pil()
+    resized = current.size != base.size
+    if resized:
+        current = current.resize(base.size, Image.BILINEAR)
+    delta = ImageChops.difference(base.convert("RGB"), current.convert("RGB"))
+    red, green, blue = delta.split()
+    mask = ImageChops.lighter(ImageChops.lighter(red, green), blue).point(lambda v: 255 if v > threshold else 0)
+    width, height = base.size
+    changed = mask.histogram()[255]
+    regions = _regions(mask, width, height) if changed else []
+    return {
+        "similarity": round(1 - changed / (width * height), 4),
+        "changed_pixels": changed,
+        "regions": regions[:MAX_REGIONS],
+        "region_count": len(regions),
+        "resized": resized,
+    }
+
+
+class ScreenshotStore:
+    """
+    Content-addressed screenshot storage with perceptual dedupe.
+
+    Shots are PNGs under <root>/<id[:2]>/<id>.png, named by content hash and
+    indexed in SQLite with a 64-bit difference hash. A capture identical to a
+    stored one, or within PHASH_DISTANCE bits of one and without a single
+    changed pixel above PIXEL_THRESHOLD, resolves to the existing shot instead
+    of a new file. Downscaled previews for the model are made on demand and
+    kept next to the original. Named baselines pin a shot for compare();
+    other shots are evicted once unused for the TTL or past the size budget.
+    """
+
+    def __init__(
+        self,
+        root: str = SCREENSHOT_DIR,
+        ttl: float = SCREENSHOT_TTL,
+        max_bytes: int = SCREENSHOT_MAX_BYTES,
+        phash_distance: int = PHASH_DISTANCE
+    ):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.phash_distance = phash_distance
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_evict = 0.0
+        self.metrics = {
+            "captures": 0,
+            "stored": 0,
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "bytes_saved": 0,
+            "previews": 0,
+            "diffs": 0,
+            "evicted": 0,
+        }
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use so importing has no filesystem side effects.
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS shots ("
+                "id TEXT PRIMARY KEY, phash TEXT, width INTEGER NOT NULL, height INTEGER NOT NULL, "
+                "bytes INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS baselines (name TEXT PRIMARY KEY, shot_id TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def path(self, shot_id: str, suffix: str = "png") -> str:
+        return os.path.join(self.root, shot_id[:2], f"{shot_id}.{suffix}")
+
+    def _row(self, shot_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db().execute(
+            "SELECT id, phash, width, height, bytes, created_at FROM shots WHERE id = ?", (shot_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "phash": row[1], "width": row[2], "height": row[3], "bytes": row[4], "created_at": row[5]}
+
+    def _touch(self, shot_id: str, now: float):
+        self._db().execute("UPDATE shots SET last_used = ? WHERE id = ?", (now, shot_id))
+        self._db().commit()
+
+    def _near_duplicate(self, image, phash: str, width: int, height: int) -> Optional[str]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id, phash FROM shots WHERE width = ? AND height = ? AND phash IS NOT NULL "
+                "ORDER BY last_used DESC LIMIT 500",
+                (width, height)
+            ).fetchall()
+        candidates = sorted(
+            (hamming(phash, other), shot_id) for shot_id, other in rows if hamming(phash, other) <= self.phash_distance
+        )
+        for _, shot_id in candidates[:DEDUPE_CANDIDATES]:
+            try:
+                if diff_images(self.open(shot_id), image)["changed_pixels"] == 0:
+                    return shot_id
+            except (OSError, ScreenshotError):
+                continue
+        return None
+
+    def put(self, data: bytes) -> Dict[str, Any]:
+        """Stores a PNG capture; returns its shot ({"id", "width", "height", "bytes", "duplicate"})."""
+        self.metrics["captures"] += 1
+        now = time.time()
+        shot_id = hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            shot = self._row(shot_id)
+            if shot is not None and os.path.exists(self.path(shot_id)):
+                self._touch(shot_id, now)
+                self.metrics["exact_duplicates"] += 1
+                self.metrics["bytes_saved"] += len(data)
+                return {**shot, "duplicate": "exact"}
+
+        width, height = png_size(data)
+        phash = None
+        try:
+            Image, _ = _pil()
+            image = Image.open(io.BytesIO(data))
+            phash = dhash(image)
+            existing = self._near_duplicate(image, phash, width, height)
+        except ScreenshotError:
+            existing = None
+        if existing is not None:
+            with self._lock:
+                self._touch(existing, now)
+                shot = self._row(existing)
+            if shot is not None:
+                self.metrics["near_duplicates"] += 1
+                self.metrics["bytes_saved"] += len(data)
+                return {**shot, "duplicate": "near"}
+
+        path = self.path(shot_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO shots (id, phash, width, height, bytes, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (shot_id, phash, width, height, len(data), now, now)
+            )
+            db.commit()
+        self.metrics["stored"] += 1
+        if now - self._last_evict > EVICT_INTERVAL:
+            self.evict(now)
+        return {"id": shot_id, "phash": phash, "width": width, "height": height, "bytes": len(data), "created_at": now, "duplicate": None}
+
+    def get(self, shot_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._row(shot_id)
+
+    def read(self, shot_id: str) -> bytes:
+        with open(self.path(shot_id), "rb") as f:
+            return f.read()
+
+    def open(self, shot_id: str):
+        Image, _ = _pil()
+        image = Image.open(self.path(shot_id))
+        image.load()
+        return image
+
+    def preview(self, shot_id: str, width: int = PREVIEW_WIDTH, fmt: str = PREVIEW_FORMAT) -> str:
+        """Path of a downscaled JPEG/WebP copy of the shot (made once, then reused)."""
+        fmt = "jpeg" if fmt.lower() in ("jpg", "jpeg") else "webp"
+        path = self.path(shot_id, f"{width}.{'jpg' if fmt == 'jpeg' else 'webp'}")
+        if os.path.exists(path):
+            return path
+        Image, _ = _pil()
+        image = self.open(shot_id).convert("RGB")
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        image.save(tmp, format=fmt.upper(), quality=PREVIEW_QUALITY)
+        os.replace(tmp, path)
+        self.metrics["previews"] += 1
+        return path
+
+    def set_baseline(self, name: str, shot_id: str):
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO baselines (name, shot_id, updated_at) VALUES (?, ?, ?)", (name, shot_id, time.time()))
+            db.commit()
+
+    def baseline(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute("SELECT shot_id FROM baselines WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None and os.path.exists(self.path(row[0])) else None
+
+    def compare(self, shot_id: str, baseline_id: str, threshold: int = PIXEL_THRESHOLD) -> Dict[str, Any]:
+        """Diff of a shot against another (normally a baseline): similarity, changed regions, phash distance."""
+        self.metrics["diffs"] += 1
+        if shot_id == baseline_id:
+            return {"similarity": 1.0, "changed_pixels": 0, "regions": [], "region_count": 0, "resized": False, "phash_distance": 0}
+        result = diff_images(self.open(baseline_id), self.open(shot_id), threshold)
+        shot, base = self.get(shot_id), self.get(baseline_id)
+        if shot and base and shot["phash"] and base["phash"]:
+            result["phash_distance"] = hamming(shot["phash"], base["phash"])
+        return result
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Drops shots unused for the TTL, then least recently used ones over the size budget; baselines are kept."""
+        now = now or time.time()
+        self._last_evict = now
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT id, bytes, last_used FROM shots WHERE id NOT IN (SELECT shot_id FROM baselines) ORDER BY last_used"
+            ).fetchall()
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM shots").fetchone()[0]
+            doomed = []
+            for shot_id, size, last_used in rows:
+                if now - last_used <= self.ttl and total <= self.max_bytes:
+                    break
+                doomed.append(shot_id)
+                total -= size
+            db.executemany("DELETE FROM shots WHERE id = ?", [(shot_id,) for shot_id in doomed])
+            db.commit()
+        for shot_id in doomed:
+            for path in glob.glob(self.path(shot_id, "*")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.metrics["evicted"] += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> dict:
+        if self._conn is None:
+            return {**self.metrics, "shots": 0, "bytes": 0, "baselines": 0}
+        with self._lock:
+            shots, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM shots").fetchone()
+            baselines = self._conn.execute("SELECT COUNT(*) FROM baselines").fetchone()[0]
+        return {**self.metrics, "shots": shots, "bytes": size, "baselines": baselines}
+
+
+screenshot_store = ScreenshotStore()
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+from agent_core.core.metrics import cli_spawn_seconds
+
+if TYPE_CHECKING:
+    from claude_agent_sdk import ClaudeAgentOptions
+
+POOL_MAX_SIZE = int(os.environ.get("AGENT_POOL_MAX_SIZE", "32"))
+POOL_WARM_SIZE = int(os.environ.get("AGENT_POOL_WARM_SIZE", "1"))
+POOL_IDLE_TTL = float(os.environ.get("AGENT_POOL_IDLE_TTL", "600"))
+POOL_MAX_TURNS = int(os.environ.get("AGENT_POOL_MAX_TURNS", "200"))
+
+
+class SessionContext:
+    """
+    Mutable context shared with the in-process MCP tool handlers of one client.
+
+    Tool handlers run in tasks spawned when the client connects, so they see the
+    context bound at connect time; the pool updates thread_id on every lease.
+    """
+
+    def __init__(self, thread_id: str = "default"):
+        self.thread_id = thread_id
+        # Newest message this client has already been sent (None for a fresh CLI session)
+        self.last_message_id: Optional[str] = None
+        # Model switched to with set_model (None: the options' model)
+        self.model: Optional[str] = None
+        # Sink for progress events the tools stream to the client during the current turn
+        self.emit: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+_session_context: ContextVar[Optional[SessionContext]] = ContextVar("agent_session_context", default=None)
+
+
+@contextmanager
+def bind_session_context(context: SessionContext):
+    token = _session_context.set(context)
+    try:
+        yield context
+    finally:
+        _session_context.reset(token)
+
+
+def current_thread_id() -> str:
+    """Thread id of the agent turn the calling tool handler belongs to."""
+    context = _session_context.get()
+    return context.thread_id if context is not None else "default"
+
+
+def emit_tool_event(event: Dict[str, Any]):
+    """Streams a progress event from a tool handler to whoever is watching the current turn (if anyone)."""
+    context = _session_context.get()
+    if context is not None and context.emit is not None:
+        context.emit(event)
+
+
+# Parallel plan tasks run in sessions keyed "<thread>::<task id>".
+TASK_SEPARATOR = "::"
+
+
+def task_session_key(thread_id: str, task_id: str) -> str:
+    return f"{thread_id}{TASK_SEPARATOR}{task_id}"
+
+
+def base_thread_id(session_key: str) -> str:
+    """The conversation thread a (possibly per-task) session key belongs to."""
+    return session_key.split(TASK_SEPARATOR, 1)[0]
+
+
+class ToolOutbox:
+    """
+    Values tool handlers hand back to the graph (plans, status reports).
+
+    Tools can't write graph state, so they park values under the caller's
+    thread id and the node that ran the agent collects them after its turn.
+    """
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, str], Any] = {}
+
+    def put(self, thread_id: str, key: str, value: Any):
+        self._values[(thread_id, key)] = value
+
+    def pop(self, thread_id: str, key: str) -> Any:
+        return self._values.pop((thread_id, key), None)
+
+
+tool_outbox = ToolOutbox()
+
+
+class PooledSession:
+    """
+    A connected client plus the bookkeeping the pool needs to reuse it.
+    """
+
+    def __init__(self, client: Any, context: SessionContext):
+        self.client = client
+        self.context = context
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.turns = 0
+        self.broken = False
+        self.lock = asyncio.Lock()
+
+
+class SessionPool:
+    """
+    Per-agent pool of long-lived ClaudeSDKClient sessions.
+
+    Each thread_id is bound to one live client so consecutive turns of the same
+    conversation skip the CLI spawn and MCP handshake. A few spare clients are
+    kept pre-spawned so new threads start warm as well.
+    """
+
+    def __init__(
+        self,
+        options: "ClaudeAgentOptions",
+        client_factory: Optional[Callable[..., Any]] = None,
+        max_size: int = POOL_MAX_SIZE,
+        warm_size: int = POOL_WARM_SIZE,
+        idle_ttl: float = POOL_IDLE_TTL,
+        max_turns_per_session: int = POOL_MAX_TURNS,
+    ):
+        if client_factory is None:
+            # Imported here: the SDK is slow to import and this module is on the API's import path.
+            from claude_agent_sdk import ClaudeSDKClient
+            client_factory = ClaudeSDKClient
+        self.options = options
+        self.client_factory = client_factory
+        self.max_size = max_size
+        self.warm_size = warm_size
+        self.idle_ttl = idle_ttl
+        self.max_turns_per_session = max_turns_per_session
+
+        self._sessions: "OrderedDict[str, PooledSession]" = OrderedDict()
+        self._warm: List[PooledSession] = []
+        self._lock = asyncio.Lock()
+        self._warm_task: Optional[asyncio.Task] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, int] = {"spawned": 0, "reused": 0, "warm_hits": 0, "evicted": 0, "discarded": 0}
+
+    async def _spawn(self) -> PooledSession:
+        client = self.client_factory(options=self.options)
+        context = SessionContext()
+        started = time.perf_counter()
+        with bind_session_context(context):
+            await client.connect()
+        cli_spawn_seconds.observe(time.perf_counter() - started, "pooled")
+        self.stats["spawned"] += 1
+        return PooledSession(client, context)
+
+    async def _close(self, session: PooledSession):
+        try:
+            await session.client.disconnect()
+        except Exception:
+            pass
+
+    def _is_healthy(self, session: PooledSession) -> bool:
+        if session.broken:
+            return False
+        if session.turns >= self.max_turns_per_session:
+            return False
+        transport = getattr(session.client, "_transport", None)
+        is_ready = getattr(transport, "is_ready", None)
+        if callable(is_ready) and not is_ready():
+            return False
+        return True
+
+    def _is_idle(self, session: PooledSession, now: float) -> bool:
+        return not session.lock.locked() and now - session.last_used > self.idle_ttl
+
+    def _collect_expired(self) -> List[PooledSession]:
+        """Removes idle or unhealthy sessions. Caller must hold self._lock."""
+        now = time.monotonic()
+        expired = []
+        for thread_id, session in list(self._sessions.items()):
+            if session.lock.locked():
+                continue
+            if self._is_idle(session, now) or not self._is_healthy(session):
+                del self._sessions[thread_id]
+                expired.append(session)
+        for session in list(self._warm):
+            if self._is_idle(session, now) or not self._is_healthy(session):
+                self._warm.remove(session)
+                expired.append(session)
+        for session in expired:
+            session.broken = True
+        self.stats["evicted"] += len(expired)
+        return expired
+
+    def _collect_overflow(self) -> List[PooledSession]:
+        """Drops least recently used idle sessions above max_size. Caller must hold self._lock."""
+        overflow = []
+        for thread_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_size:
+                break
+            if session.lock.locked():
+                continue
+            del self._sessions[thread_id]
+            session.broken = True
+            overflow.append(session)
+        self.stats["evicted"] += len(overflow)
+        return overflow
+
+    async def _acquire(self, thread_id: str) -> PooledSession:
+        self._ensure_reaper()
+        async with self._lock:
+            stale = self._collect_expired()
+            session = self._sessions.get(thread_id)
+            if session is not None:
+                self._sessions.move_to_end(thread_id)
+                self.stats["reused"] += 1
+            elif self._warm:
+                session = self._warm.pop()
+                self._sessions[thread_id] = session
+                self.stats["warm_hits"] += 1
+            stale.extend(self._collect_overflow())
+        for s in stale:
+            await self._close(s)
+
+        if session is None:
+            spawned = await self._spawn()
+            async with self._lock:
+                # Another turn of the same thread may have won the race.
+                session = self._sessions.get(thread_id)
+                if session is None:
+                    session = spawned
+                    self._sessions[thread_id] = session
+                else:
+                    self._warm.append(spawned)
+
+        self._schedule_warm()
+        return session
+
+    async def _discard(self, thread_id: str, session: PooledSession):
+        async with self._lock:
+            if self._sessions.get(thread_id) is session:
+                del self._sessions[thread_id]
+        self.stats["discarded"] += 1
+        await self._close(session)
+
+    @asynccontextmanager
+    async def lease(self, thread_id: str):
+        """
+        Yields the live client bound to thread_id. Turns of the same thread are
+        serialized; a session that raised or was cancelled is never reused.
+        """
+        while True:
+            session = await self._acquire(thread_id)
+            await session.lock.acquire()
+            if not session.broken:
+                break
+            # Evicted or failed while we were queued behind another turn.
+            session.lock.release()
+        session.context.thread_id = thread_id
+        try:
+            yield session.client
+        except BaseException:
+            session.broken = True
+            raise
+        finally:
+            session.turns += 1
+            session.last_used = time.monotonic()
+            session.lock.release()
+            if session.broken:
+                await self._discard(thread_id, session)
+
+    def context(self, thread_id: str) -> Optional[SessionContext]:
+        """Context of the session currently bound to thread_id, if any."""
+        session = self._sessions.get(thread_id)
+        return session.context if session is not None else None
+
+    async def warm_up(self):
+        """Pre-spawns clients until the warm reserve is full."""
+        while len(self._warm) < self.warm_size:
+            try:
+                session = await self._spawn()
+            except Exception:
+                return
+            async with self._lock:
+                self._warm.append(session)
+
+    def _schedule_warm(self):
+        if self.warm_size <= 0 or len(self._warm) >= self.warm_size:
+            return
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.get_running_loop().create_task(self.warm_up())
+
+    def _ensure_reaper(self):
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self):
+        interval = max(1.0, min(self.idle_ttl / 2, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            async with self._lock:
+                stale = self._collect_expired()
+            for s in stale:
+                await self._close(s)
+
+    async def close(self):
+        """Disconnects every pooled client and stops background tasks."""
+        for task in (self._warm_task, self._reaper_task):
+            if task is not None and not task.done():
+                task.cancel()
+        async with self._lock:
+            sessions = list(self._sessions.values()) + self._warm
+            self._sessions.clear()
+            self._warm = []
+        for s in sessions:
+            await self._close(s)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,367 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from agent_core.core.cluster import WORKER_ID
+from agent_core.core.git import git
+from agent_core.core.workspace import STATE_DIR, get_workspace_index
+
+REF_PREFIX = "refs/agent"
+# The server's own state dir is never snapshotted.
+EXCLUDE_STATE = f":(exclude){STATE_DIR}"
+# Commit trailer naming a checkpoint's kind. Explicit checkpoints (git_commit, the API) carry none;
+# restore() targets the latest of those by default, never the workflow's or its own snapshots.
+KIND_TRAILER = "Agent-Checkpoint"
+EXPLICIT = "checkpoint"
+AUTO = "auto"
+PRE_RESTORE = "pre-restore"
+# Beyond this many changed paths a full `git add -A` is cheaper than per-path updates.
+MAX_INCREMENTAL_PATHS = int(os.environ.get("AGENT_SNAPSHOT_MAX_INCREMENTAL", "5000"))
+# Lets watcher events for writes made just before a snapshot arrive before it is taken.
+WATCH_SETTLE_SECONDS = float(os.environ.get("AGENT_SNAPSHOT_SETTLE_SECONDS", "0.05"))
+AGENT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "agent",
+    "GIT_AUTHOR_EMAIL": "agent@localhost",
+    "GIT_COMMITTER_NAME": "agent",
+    "GIT_COMMITTER_EMAIL": "agent@localhost",
+}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def ref_component(thread_id: str) -> str:
+    """
+    Makes a thread id safe to use as one ref path component, without two ids sharing one.
+
+    Ids that are already safe are used as they are; others get their unsafe
+    characters replaced plus a hash of the raw id after a ".", which a safe
+    id can't contain.
+    """
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", thread_id)
+    if safe and safe == thread_id:
+        return safe
+    return f"{safe or '_'}.{hashlib.sha256(thread_id.encode()).hexdigest()[:12]}"
+
+
+def nul_list(paths: Iterable[str]) -> bytes:
+    return b"".join(path.encode() + b"\0" for path in paths)
+
+
+def is_state_path(rel: str) -> bool:
+    return rel == STATE_DIR or rel.startswith(STATE_DIR + "/")
+
+
+def name_status(out: str) -> List[Dict[str, str]]:
+    """Parses `git diff-tree --name-status -z` output (state paths recorded by older snapshots are dropped)."""
+    fields = out.split("\0")
+    return [
+        {"status": status, "path": path}
+        for status, path in zip(fields[0::2], fields[1::2])
+        if path and not is_state_path(path)
+    ]
+
+
+class SnapshotStore:
+    """
+    Workspace checkpoints recorded as commits under refs/agent/<thread>/<n>.
+
+    Snapshots are staged in a private index (<git-dir>/agent/index-<worker>),
+    so the user's index, HEAD and branch history are never touched. Paths reported by
+    the workspace watcher since the last snapshot are the only ones re-staged,
+    so a checkpoint costs O(changed files); without watcher events (first
+    snapshot, no watchdog, or a burst of changes) it falls back to `git add -A`
+    against the private index, which still only re-hashes modified files.
+    Restores diff the two trees and rewrite only the paths that differ.
+    """
+
+    def __init__(self, root: Optional[str] = None, watch: bool = True):
+        # watch=False: the caller reports every change through mark_dirty().
+        self.root = os.path.abspath(root or os.getcwd())
+        self._git_dir: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._dirty: Set[str] = set()
+        self._dirty_lock = threading.Lock()
+        self._workspace = None
+        self._explicit = not watch
+        self._synced = False
+        self._next_n: Dict[str, int] = {}
+        self.metrics = {"snapshots": 0, "incremental": 0, "full": 0, "unchanged": 0, "restores": 0, "last_seconds": 0.0}
+        if watch:
+            workspace = get_workspace_index()
+            if workspace.root == self.root:
+                workspace.add_listener(self._on_change)
+                self._workspace = workspace
+
+    def _on_change(self, path: str):
+        rel = os.path.relpath(path, self.root)
+        if rel == ".git" or rel.startswith(".git" + os.sep) or rel.startswith(".."):
+            return
+        rel = rel.replace(os.sep, "/")
+        if is_state_path(rel):
+            return
+        with self._dirty_lock:
+            self._dirty.add(rel)
+
+    def mark_dirty(self, paths: Iterable[str]):
+        """Records changed paths (relative to root) when no watcher reports them."""
+        for path in paths:
+            self._on_change(os.path.join(self.root, path))
+
+    # --- plumbing ---
+
+    async def _git(self, *args: str, input: Optional[bytes] = None, index: bool = True, ok_codes=(0,)) -> str:
+        env = {**os.environ, **AGENT_IDENTITY}
+        command = args
+        if index:
+            env["GIT_INDEX_FILE"] = await self._index_path()
+            # A split index keeps per-snapshot index writes small on large trees.
+            command = ("-c", "core.splitIndex=true", *args)
+        result = await git(*command, cwd=self.root, env=env, input=input)
+        if result.timed_out or result.returncode not in ok_codes:
+            raise SnapshotError(f"git {args[0]} failed: {(result.stderr or result.stdout).strip()}")
+        return result.stdout
+
+    async def git_dir(self) -> str:
+        if self._git_dir is None:
+            result = await git("rev-parse", "--absolute-git-dir", cwd=self.root)
+            if not result.ok:
+                raise SnapshotError(f"{self.root} is not a git repository")
+            self._git_dir = result.stdout.strip()
+            os.makedirs(os.path.join(self._git_dir, "agent"), exist_ok=True)
+        return self._git_dir
+
+    async def _index_path(self) -> str:
+        # One index per API worker: concurrent writers would fail on index.lock.
+        return os.path.join(await self.git_dir(), "agent", f"index-{WORKER_ID}")
+
+    async def _seed_index(self):
+        """Starts the private index from the user's index so unchanged files keep their stat cache."""
+        git_dir = await self.git_dir()
+        private = await self._index_path()
+        if not os.path.exists(private) and os.path.exists(os.path.join(git_dir, "index")):
+            shutil.copyfile(os.path.join(git_dir, "index"), private)
+
+    async def _settle(self):
+        """Waits for watcher events of just-made writes; called before taking the lock so callers wait in parallel."""
+        if self._workspace is not None and self._workspace.watching and self._synced:
+            await asyncio.sleep(WATCH_SETTLE_SECONDS)
+
+    async def _stage(self):
+        # Without a running watcher we can't know what changed since last time.
+        watching = self._workspace is not None and self._workspace.watching
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        tracked = self._explicit or watching
+        if not self._synced or not tracked or len(dirty) > MAX_INCREMENTAL_PATHS:
+            await self._seed_index()
+            # The seed (the user's index) may track state files; the snapshot must not.
+            await self._git("rm", "-r", "-q", "--cached", "--ignore-unmatch", "--", STATE_DIR)
+            await self._git("add", "-A", "--", ".", EXCLUDE_STATE)
+            await self._git("update-index", "--index-version", "4")
+            self._synced = True
+            self.metrics["full"] += 1
+            return
+        self.metrics["incremental"] += 1
+        if not dirty:
+            return
+        paths = sorted(dirty)
+        # --no-index skips loading the (large) index; tracked files are never skipped below.
+        ignored = set(filter(None, (await self._git(
+            "check-ignore", "--no-index", "--stdin", "-z", input=nul_list(paths), index=False, ok_codes=(0, 1)
+        )).split("\0")))
+        if ignored:
+            tracked = await self._git("ls-files", "-z", "--cached", "--", *sorted(ignored))
+            ignored -= set(tracked.split("\0"))
+        files, dirs, missing = [], [], []
+        for path in paths:
+            if path in ignored:
+                continue
+            full = os.path.join(self.root, path)
+            if os.path.isdir(full) and not os.path.islink(full):
+                dirs.append(path)
+            elif os.path.lexists(full):
+                files.append(path)
+            else:
+                missing.append(path)
+        if missing:
+            # A deleted directory: drop every index entry below it too.
+            below = await self._git("ls-files", "-z", "--cached", "--", *missing)
+            files.extend(filter(None, below.split("\0")))
+            files.extend(missing)
+        if files:
+            await self._git("update-index", "--add", "--remove", "-z", "--stdin", input=nul_list(files))
+        if dirs:
+            await self._git("add", "-A", "--", *dirs, EXCLUDE_STATE)
+
+    async def _refs(self, thread_id: str) -> List[Dict[str, Any]]:
+        prefix = f"{REF_PREFIX}/{ref_component(thread_id)}/"
+        out = await self._git(
+            "for-each-ref",
+            f"--format=%(refname)%00%(objectname)%00%(creatordate:unix)%00%(trailers:key={KIND_TRAILER},valueonly,separator=%x2C)%00%(subject)",
+            prefix, index=False
+        )
+        checkpoints = []
+        for line in filter(None, out.splitlines()):
+            refname, commit, created, kind, subject = line.split("\0", 4)
+            name = refname[len(prefix):]
+            if name.isdigit():
+                checkpoints.append({
+                    "n": int(name), "commit": commit, "created_at": int(created), "message": subject, "kind": kind or EXPLICIT
+                })
+        checkpoints.sort(key=lambda c: c["n"])
+        return checkpoints
+
+    # --- API ---
+
+    async def current_tree(self) -> str:
+        """Tree id of the workspace as it is now (stages pending changes, records nothing)."""
+        await self._settle()
+        async with self._lock:
+            await self._stage()
+            return (await self._git("write-tree")).strip()
+
+    async def checkpoint(
+        self, thread_id: str, message: str = "checkpoint", force: bool = False, kind: str = EXPLICIT
+    ) -> Dict[str, Any]:
+        """
+        Records the workspace as the thread's next checkpoint and returns it.
+
+        If nothing changed since the thread's latest checkpoint that one is
+        returned instead (unless force, or an explicit checkpoint is asked
+        for and the latest one is automatic). kind is recorded as a commit
+        trailer.
+        """
+        started = time.perf_counter()
+        await self._settle()
+        async with self._lock:
+            await self._stage()
+            tree = (await self._git("write-tree")).strip()
+            existing = await self._refs(thread_id)
+            parent = existing[-1]["commit"] if existing else None
+            # An automatic snapshot doesn't stand in for an explicit checkpoint (restore's default skips it).
+            if parent is not None and not force and (kind != EXPLICIT or existing[-1]["kind"] == EXPLICIT):
+                parent_tree = (await self._git("rev-parse", f"{parent}^{{tree}}", index=False)).strip()
+                if parent_tree == tree:
+                    self.metrics["unchanged"] += 1
+                    return {**existing[-1], "tree": tree, "created": False}
+            args = ["commit-tree", tree, "-m", message]
+            if kind != EXPLICIT:
+                args += ["-m", f"{KIND_TRAILER}: {kind}"]
+            if parent is not None:
+                args += ["-p", parent]
+            commit = (await self._git(*args, index=False)).strip()
+            n = max(self._next_n.get(thread_id, 1), existing[-1]["n"] + 1 if existing else 1)
+            await self._git("update-ref", f"{REF_PREFIX}/{ref_component(thread_id)}/{n}", commit, "", index=False)
+            self._next_n[thread_id] = n + 1
+        self.metrics["snapshots"] += 1
+        self.metrics["last_seconds"] = time.perf_counter() - started
+        return {
+            "n": n, "commit": commit, "tree": tree, "created_at": int(time.time()), "message": message, "kind": kind, "created": True
+        }
+
+    async def list(self, thread_id: str) -> List[Dict[str, Any]]:
+        return await self._refs(thread_id)
+
+    async def _resolve(self, thread_id: str, n: Optional[int]) -> Dict[str, Any]:
+        checkpoints = await self._refs(thread_id)
+        if n is None:
+            # The workflow's and restore()'s own snapshots take an explicit n: restoring the
+            # state saved by the last restore, for one, would just undo it.
+            checkpoints = [checkpoint for checkpoint in checkpoints if checkpoint["kind"] == EXPLICIT]
+            if not checkpoints:
+                raise SnapshotError(f"No explicit checkpoints for thread {thread_id}; pass a checkpoint number")
+        if not checkpoints:
+            raise SnapshotError(f"No checkpoints for thread {thread_id}")
+        if n is None:
+            return checkpoints[-1]
+        for checkpoint in checkpoints:
+            if checkpoint["n"] == n:
+                return checkpoint
+        raise SnapshotError(f"Checkpoint {n} not found for thread {thread_id}")
+
+    async def changes(self, thread_id: str, n: int) -> List[Dict[str, str]]:
+        """Files changed by checkpoint n relative to the checkpoint before it."""
+        checkpoint = await self._resolve(thread_id, n)
+        args = ["diff-tree", "-r", "--no-commit-id", "--name-status", "-z", "--root", checkpoint["commit"]]
+        return name_status(await self._git(*args, index=False))
+
+    async def diff(self, thread_id: str, n: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Files that differ between checkpoint n and the workspace as it is now.
+
+        By default n is the latest checkpoint (not counting the snapshots taken
+        by restore) the workspace differs from: the
+        uncommitted changes, or, when the workspace is exactly at its latest
+        checkpoint (as after an editing round is checkpointed), what that
+        checkpoint changed.
+        """
+        if n is not None:
+            checkpoints = [await self._resolve(thread_id, n)]
+        else:
+            checkpoints = [c for c in reversed(await self._refs(thread_id)) if c["kind"] != PRE_RESTORE]
+        if not checkpoints:
+            raise SnapshotError(f"No checkpoints for thread {thread_id}")
+        tree = await self.current_tree()
+        for checkpoint in checkpoints:
+            changes = name_status(await self._git(
+                "diff-tree", "-r", "-z", "--name-status", "--no-renames", checkpoint["commit"], tree, index=False
+            ))
+            if changes:
+                return {"checkpoint": checkpoint, "changes": changes}
+        return {"checkpoint": checkpoints[0], "changes": []}
+
+    async def restore(self, thread_id: str, n: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Restores the workspace to checkpoint n (default: the latest explicit
+        checkpoint).
+
+        The current state is checkpointed first (as a pre-restore snapshot),
+        so a restore can itself be undone by naming that checkpoint. Only
+        paths that differ between the two trees are rewritten.
+        """
+        target = await self._resolve(thread_id, n)
+        before = await self.checkpoint(thread_id, message=f"before restore to {target['n']}", kind=PRE_RESTORE)
+        async with self._lock:
+            deleted, written = [], []
+            # State paths are skipped: a checkpoint must never rewrite the live databases under their connections.
+            for change in name_status(await self._git(
+                "diff-tree", "-r", "-z", "--name-status", "--no-renames", before["tree"], target["commit"], index=False
+            )):
+                (deleted if change["status"] == "D" else written).append(change["path"])
+            for path in deleted:
+                full = os.path.join(self.root, path)
+                if os.path.lexists(full):
+                    os.unlink(full)
+                # Remove directories left empty by the deletion.
+                directory = os.path.dirname(full)
+                while directory != self.root and os.path.isdir(directory) and not os.listdir(directory):
+                    os.rmdir(directory)
+                    directory = os.path.dirname(directory)
+            if written:
+                await self._git(
+                    "restore", f"--source={target['commit']}", "--worktree", "--pathspec-from-file=-", "--pathspec-file-nul",
+                    input=nul_list(written), index=False
+                )
+            self.mark_dirty(deleted + written)
+        self.metrics["restores"] += 1
+        return {"restored": target, "previous": before, "files_changed": len(deleted) + len(written)}
+
+    def stats(self) -> dict:
+        return {**self.metrics, "pending_paths": len(self._dirty)}
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Returns the process-wide snapshot store for the workspace (current working directory)."""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore()
+    return _snapshot_store
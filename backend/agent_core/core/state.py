@@ -1,16 +1,30 @@
 from typing import TypedDict, List, Optional, Dict, Any, Annotated
-import operator
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+from agent_core.core.plan import merge_results
+
+
+def add_or_reset(current: Optional[int], update: Optional[int]) -> int:
+    """State reducer for counters summed across parallel branches; None resets."""
+    if update is None:
+        return 0
+    return (current or 0) + update
 
 class AgentState(TypedDict):
     """
     Global state for the Multi-Agent System.
     """
-    # Chat history
-    messages: Annotated[List[BaseMessage], operator.add]
+    # Chat history (recent window; older turns are folded into `summary`)
+    messages: Annotated[List[BaseMessage], add_messages]
+
+    # Rolling summary of messages removed from the window
+    summary: Optional[str]
     
-    # Current plan/task breakdown
+    # Current plan/task breakdown: [{"id", "description", "files", "depends_on"}]
     plan: Optional[List[Dict[str, Any]]]
+
+    # Outcome of each plan task by id: {"status": "done" | "failed" | "skipped", "output"}
+    task_results: Annotated[Dict[str, Any], merge_results]
     
     # Current active agent
     next_agent: Optional[str]
@@ -23,6 +37,19 @@ class AgentState(TypedDict):
     
     # System mode (Build, Plan, Fast, Autonomy)
     mode: str
+
+    # Models chosen for this run: {"name", "mode", "complexity", "models": {agent: model}, "escalations"}
+    route: Optional[Dict[str, Any]]
     
-    # Iteration count for autonomy limits
+    # Iteration count for autonomy limits (Verifier -> Editor retries this run)
     iteration_count: int
+
+    # Latest structured report_status: {"status", "details", "agent", "stop_reason"}
+    status: Optional[Dict[str, Any]]
+
+    # Run budgets: wall-clock start and tokens spent by agents this run
+    started_at: Optional[float]
+    tokens_used: Annotated[int, add_or_reset]
+
+    # Workspace tree ids seen this run (git write-tree), for no-change / convergence checks
+    workspace_versions: List[Optional[str]]
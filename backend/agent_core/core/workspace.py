@@ -0,0 +1,446 @@
+import bisect
+import hashlib
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; fall back to directory mtime checks
+    FileSystemEventHandler = object
+    Observer = None
+
+ALWAYS_SKIPPED = {"__pycache__", "node_modules"}
+# The server's own state (checkpoint and cache databases, screenshots).
+STATE_DIR = ".agent"
+# Never watched, wherever they are; gitignored directories aren't either.
+UNWATCHED = {".git", STATE_DIR}
+# Each scheduled watch costs the observer a thread (and an inotify instance). Directories
+# holding an ignored subtree are watched one level deep, without it, while within this budget.
+MAX_WATCHES = int(os.environ.get("AGENT_WORKSPACE_MAX_WATCHES", "32"))
+
+
+def is_hidden(name: str) -> bool:
+    """Mirrors the tree's historic filter: hidden entries except .gitignore are skipped."""
+    if name.startswith(".") and name != ".gitignore":
+        return True
+    return name in ALWAYS_SKIPPED
+
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob into a regex fragment."""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRule:
+    def __init__(self, base: str, line: str):
+        self.base = base
+        self.negate = line.startswith("!")
+        if self.negate:
+            line = line[1:]
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        prefix = "^" if anchored else "^(?:.*/)?"
+        self.regex = re.compile(prefix + _translate(line) + "$")
+
+    def matches(self, rel: str, is_dir: bool) -> bool:
+        """rel is the posix path relative to this rule's .gitignore directory."""
+        if self.dir_only and not is_dir:
+            return False
+        return bool(self.regex.match(rel))
+
+
+def parse_gitignore(directory: str) -> List[IgnoreRule]:
+    rules = []
+    try:
+        with open(os.path.join(directory, ".gitignore"), "r", errors="replace") as f:
+            for raw in f:
+                line = raw.rstrip("\n").rstrip()
+                if not line or line.startswith("#"):
+                    continue
+                rules.append(IgnoreRule(directory, line))
+    except OSError:
+        pass
+    return rules
+
+
+def is_ignored(rules: List[IgnoreRule], prefixes: Dict[str, str], name: str, is_dir: bool) -> bool:
+    """prefixes maps each rule base to the scanned directory's path relative to it."""
+    ignored = False
+    for rule in rules:
+        if rule.negate != ignored:
+            continue
+        if rule.matches(prefixes[rule.base] + name, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _has_subdirectory(path: str) -> bool:
+    try:
+        with os.scandir(path) as it:
+            return any(entry.is_dir(follow_symlinks=False) for entry in it)
+    except OSError:
+        return False
+
+
+class DirListing:
+    """One cached directory: visible (name, is_dir) entries sorted by name."""
+
+    def __init__(self, entries: List[Tuple[str, bool]], version: str):
+        self.entries = entries
+        self.names = [name for name, _ in entries]
+        self.version = version
+
+
+class _InvalidationHandler(FileSystemEventHandler):
+    def __init__(self, index: "WorkspaceIndex"):
+        self.index = index
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed", "closed_no_write"):
+            return
+        recursive = event.is_directory and event.event_type in ("moved", "deleted")
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if not path:
+                continue
+            path = os.fsdecode(path)
+            # Events from ignored directories under a recursive watch stop here.
+            if self.index.skipped(path, event.is_directory):
+                continue
+            self.index.invalidate(path, recursive=recursive)
+            if os.path.basename(path) == ".gitignore":
+                self.index.rewatch()
+            elif event.is_directory:
+                self.index.watch_new_directory(path)
+
+
+class WorkspaceIndex:
+    """
+    In-memory index of directory listings for the workspace.
+
+    Listings are read with os.scandir, filtered by the usual hidden/vendor rules
+    and by .gitignore files, and cached per directory. When watchdog is
+    available an observer invalidates listings as files change; it leaves out
+    .git, the state dir and gitignored directories, and drops their events
+    before they reach listeners. Otherwise each cached listing is revalidated
+    against the directory mtime.
+    """
+
+    def __init__(self, root: str = ".", watch: bool = True):
+        self.root = os.path.abspath(root)
+        self._listings: Dict[str, DirListing] = {}
+        self._rules: Dict[str, List[IgnoreRule]] = {}
+        self._lock = threading.RLock()
+        self._observer = None
+        self._watches: Dict[str, Any] = {}
+        self._flat: Set[str] = set()
+        self._watch = watch and Observer is not None
+        self._generation = 0
+        self._listeners: List[Callable[[str], None]] = []
+
+    # --- watching ---
+
+    def start(self):
+        """Starts the filesystem watcher (no-op without watchdog)."""
+        if not self._watch or self._observer is not None:
+            return
+        try:
+            observer = Observer()
+            self._observer = observer
+            self._schedule()
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            # e.g. inotify watch limit reached; mtime validation still keeps us correct
+            print(f"Workspace watcher disabled: {e}")
+            self._observer = None
+            self._watch = False
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+            self._watches.clear()
+            self._flat.clear()
+
+    def _skipped_dir(self, directory: str, name: str) -> bool:
+        if name in UNWATCHED:
+            return True
+        rules = self.rules_for(directory)
+        return bool(rules) and is_ignored(rules, self._prefixes(rules, directory), name, True)
+
+    def skipped(self, path: str, is_dir: bool) -> bool:
+        """True for paths the watcher doesn't report: in or below .git, the state dir or a gitignored path."""
+        rel = os.path.relpath(path, self.root)
+        if rel == "." or rel.startswith(".."):
+            return False
+        parts = rel.split(os.sep)
+        directory = self.root
+        for name in parts[:-1]:
+            if self._skipped_dir(directory, name):
+                return True
+            directory = os.path.join(directory, name)
+        name = parts[-1]
+        if name in UNWATCHED:
+            return True
+        rules = self.rules_for(directory)
+        return bool(rules) and is_ignored(rules, self._prefixes(rules, directory), name, is_dir)
+
+    def _plan(self, directory: str, budget: List[int]) -> Optional[List[Tuple[str, bool]]]:
+        """
+        Watches covering directory without its heavy skipped subtrees, as
+        (path, recursive) pairs, or None when one recursive watch will do.
+
+        Only skipped directories that have subdirectories are worth splitting
+        a watch for: a leaf like __pycache__ costs one inotify watch, a split
+        costs a thread.
+        """
+        heavy, children = False, []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                    except OSError:
+                        continue
+                    if self._skipped_dir(directory, entry.name):
+                        heavy = heavy or _has_subdirectory(entry.path)
+                    else:
+                        children.append(entry.path)
+        except OSError:
+            return None
+        remaining = budget[0]
+        plans = [(child, self._plan(child, budget)) for child in children]
+        if not heavy and all(plan is None for _, plan in plans):
+            return None
+        # This directory's own watch plus one per child watched whole.
+        cost = 1 + sum(1 for _, plan in plans if plan is None)
+        if budget[0] < cost:
+            budget[0] = remaining
+            return None
+        budget[0] -= cost
+        watches = [(directory, False)]
+        for child, plan in plans:
+            watches += plan if plan is not None else [(child, True)]
+        return watches
+
+    def _schedule(self):
+        handler = _InvalidationHandler(self)
+        plan = self._plan(self.root, [MAX_WATCHES]) or [(self.root, True)]
+        for path, recursive in plan:
+            self._watches[path] = self._observer.schedule(handler, path, recursive=recursive)
+            if not recursive:
+                self._flat.add(path)
+
+    def rewatch(self):
+        """Re-plans the watches, e.g. after a .gitignore changed which directories are skipped."""
+        if self._observer is None:
+            return
+        self._observer.unschedule_all()
+        self._watches.clear()
+        self._flat.clear()
+        self._schedule()
+        # Changes made while unwatched may have been missed.
+        self.invalidate(self.root, recursive=True)
+
+    def watch_new_directory(self, path: str):
+        """Extends one-level watches to a directory created or moved under them (and drops deleted ones)."""
+        if self._observer is None:
+            return
+        watch = self._watches.get(path)
+        if watch is not None and not os.path.isdir(path):
+            self._observer.unschedule(watch)
+            del self._watches[path]
+            self._flat.discard(path)
+        elif watch is None and os.path.dirname(path) in self._flat and os.path.isdir(path):
+            self._watches[path] = self._observer.schedule(_InvalidationHandler(self), path, recursive=True)
+            # Files may have been written into it before the watch started.
+            self.invalidate(path, recursive=True)
+
+    @property
+    def watching(self) -> bool:
+        return self._observer is not None
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Registers a callback invoked with every changed path reported by the watcher."""
+        self._listeners.append(callback)
+
+    def invalidate(self, path: str, recursive: bool = False):
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        with self._lock:
+            self._generation += 1
+            self._listings.pop(parent, None)
+            self._listings.pop(path, None)
+            if recursive:
+                prefix = path + os.sep
+                for key in [k for k in self._listings if k.startswith(prefix)]:
+                    del self._listings[key]
+                for key in [k for k in self._rules if k == path or k.startswith(prefix)]:
+                    del self._rules[key]
+            if os.path.basename(path) == ".gitignore":
+                # Rules are inherited, so every listing below may change.
+                self._rules.clear()
+                self._listings.clear()
+            else:
+                self._rules.pop(path, None)
+        for callback in self._listeners:
+            try:
+                callback(path)
+            except Exception:
+                pass
+
+    # --- listings ---
+
+    def rules_for(self, directory: str) -> List[IgnoreRule]:
+        directory = os.path.abspath(directory)
+        with self._lock:
+            rules = self._rules.get(directory)
+            if rules is not None:
+                return rules
+        parent = os.path.dirname(directory)
+        inherited = []
+        if directory != self.root and directory.startswith(self.root + os.sep):
+            inherited = self.rules_for(parent)
+        rules = inherited + parse_gitignore(directory)
+        with self._lock:
+            self._rules[directory] = rules
+        return rules
+
+    @staticmethod
+    def _prefixes(rules: List[IgnoreRule], directory: str) -> Dict[str, str]:
+        prefixes = {}
+        for rule in rules:
+            if rule.base not in prefixes:
+                rel = os.path.relpath(directory, rule.base).replace(os.sep, "/")
+                prefixes[rule.base] = "" if rel == "." else rel + "/"
+        return prefixes
+
+    def _scan(self, directory: str) -> DirListing:
+        rules = self.rules_for(directory)
+        prefixes = self._prefixes(rules, directory)
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if is_hidden(entry.name):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if rules and is_ignored(rules, prefixes, entry.name, is_dir):
+                    continue
+                entries.append((entry.name, is_dir))
+        entries.sort()
+        version = str(os.stat(directory).st_mtime_ns)
+        return DirListing(entries, version)
+
+    def listing(self, directory: str) -> DirListing:
+        key = os.path.abspath(directory)
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None:
+            if self.watching:
+                return cached
+            try:
+                if str(os.stat(key).st_mtime_ns) == cached.version:
+                    return cached
+            except OSError:
+                pass
+        generation = self._generation
+        listing = self._scan(key)
+        with self._lock:
+            # Don't cache a listing that a concurrent change may already have outdated.
+            if generation == self._generation or not self.watching:
+                self._listings[key] = listing
+        return listing
+
+    # --- tree API ---
+
+    def tree(
+        self,
+        path: str = ".",
+        depth: int = 1,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Returns one page of the tree under path plus an ETag for it.
+
+        Directories deeper than ``depth`` are returned with ``children`` set to
+        None so the client can expand them on demand. ``cursor`` is the last
+        name of the previous page of ``path``'s own children.
+        """
+        digest = hashlib.sha1(f"{path}|{depth}|{cursor}|{limit}".encode())
+
+        def build(dir_path: str, level: int, page_cursor: Optional[str], page_limit: Optional[int]):
+            try:
+                listing = self.listing(dir_path)
+            except PermissionError:
+                return [], None
+            digest.update(f"{dir_path}:{listing.version};".encode())
+            start = 0
+            if page_cursor is not None:
+                start = bisect.bisect_right(listing.names, page_cursor)
+            end = len(listing.entries) if page_limit is None else min(len(listing.entries), start + page_limit)
+
+            nodes = []
+            for name, is_dir in listing.entries[start:end]:
+                full_path = os.path.join(dir_path, name)
+                node = {"name": name, "path": full_path, "type": "directory" if is_dir else "file", "children": None}
+                if is_dir and level < depth:
+                    node["children"], _ = build(full_path, level + 1, None, None)
+                nodes.append(node)
+            next_cursor = listing.names[end - 1] if end < len(listing.entries) else None
+            return nodes, next_cursor
+
+        children, next_cursor = build(path, 1, cursor, limit)
+        return {"path": path, "children": children, "next_cursor": next_cursor}, digest.hexdigest()
+
+
+_workspace_index: Optional[WorkspaceIndex] = None
+
+
+def get_workspace_index() -> WorkspaceIndex:
+    """Returns the process-wide index rooted at the current working directory."""
+    global _workspace_index
+    if _workspace_index is None:
+        _workspace_index = WorkspaceIndex(os.getcwd())
+        _workspace_index.start()
+    return _workspace_index
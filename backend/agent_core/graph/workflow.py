@@ -1,54 +1,267 @@
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Send
+from langgraph.config import get_stream_writer
 from agent_core.core.state import AgentState
-from agent_core.agents.manager import ManagerAgent
-from agent_core.agents.editor import EditorAgent
-from agent_core.agents.verifier import VerifierAgent
+from agent_core.core.checkpoint import get_checkpointer
+from agent_core.core.budget import run_budget
+from agent_core.core.context import context_manager, count_tokens
+from agent_core.core.llm import ModelRouter, route_metrics
+from agent_core.core.metrics import traced
+from agent_core.core.plan import blocked_tasks, editor_slots, file_locks, ready_tasks
+from agent_core.core.registry import components
+from agent_core.core.session import task_session_key, tool_outbox
+from agent_core.core.snapshots import AUTO, SnapshotError, get_snapshot_store
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig
+import time
+import uuid
 
-manager = ManagerAgent()
-editor = EditorAgent()
-verifier = VerifierAgent()
+model_router = ModelRouter()
 
-async def manager_node(state: AgentState):
-    response = await manager.run(state)
-    return {"messages": [AIMessage(content=response)]}
+# Graph variant per mode: which stages run and whether failed verification is retried.
+MODE_PIPELINES = {
+    "autonomy": {"manager": True, "edit": True, "verify": True, "retry": True},
+    "build": {"manager": True, "edit": True, "verify": True, "retry": False},
+    "plan": {"manager": True, "edit": False, "verify": False, "retry": False},
+    "fast": {"manager": False, "edit": True, "verify": False, "retry": False},
+}
 
-async def editor_node(state: AgentState):
-    response = await editor.run(state)
-    return {"messages": [AIMessage(content=response)]}
+def get_pipeline(state: AgentState) -> dict:
+    return MODE_PIPELINES.get((state.get("mode") or "autonomy").lower(), MODE_PIPELINES["autonomy"])
 
-async def verifier_node(state: AgentState):
-    response = await verifier.run(state)
-    return {"messages": [AIMessage(content=response)]}
+def get_thread_id(config: RunnableConfig) -> str:
+    return (config or {}).get("configurable", {}).get("thread_id", "default")
+
+async def run_agent_node(agent, state: AgentState, config: RunnableConfig, session_key: str = None, name: str = None):
+    """
+    Runs an agent, streaming its text blocks as custom events under one message id
+    (along with progress events its tools emit).
+
+    Also collects the structured status the agent reported via report_status and
+    the tokens it used (as reported by the CLI, else estimated from the text).
+    """
+    message_id = str(uuid.uuid4())
+    name = name or agent.name
+    session_key = session_key or get_thread_id(config)
+    route = state.get("route") or {}
+    model = route.get("models", {}).get(agent.name) or agent.options.model
+    writer = get_stream_writer()
+    usage = {}
+
+    def on_text(text: str):
+        writer({"type": "delta", "id": message_id, "node": name, "text": text})
+
+    def on_event(event: dict):
+        writer({**event, "node": name})
+
+    started = time.perf_counter()
+    response = await agent.run(
+        state, thread_id=session_key, on_text=on_text, on_usage=usage.update, model=model, on_event=on_event
+    )
+    tokens = (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+    tokens = tokens or count_tokens(response)
+    route_metrics.record(
+        route.get("name", "default"), agent.name, model,
+        time.perf_counter() - started, tokens, usage.get("total_cost_usd")
+    )
+    update = {
+        "messages": [AIMessage(content=response, id=message_id, name=name)],
+        "tokens_used": tokens
+    }
+    status = tool_outbox.pop(session_key, "status")
+    if status is not None:
+        status["agent"] = name
+        update["status"] = status
+    return update
+
+def last_request(state: AgentState) -> str:
+    return next(
+        (m.content for m in reversed(state.get("messages", [])) if getattr(m, "type", None) == "human"),
+        ""
+    )
+
+def emit_status(status: dict):
+    if status is not None:
+        get_stream_writer()({"type": "status", **status})
+
+async def workspace_checkpoint(config: RunnableConfig, message: str):
+    """Checkpoints the workspace for this thread; None outside a git repository."""
+    try:
+        return await get_snapshot_store().checkpoint(get_thread_id(config), message=message, kind=AUTO)
+    except SnapshotError:
+        return None
+
+async def context_node(state: AgentState, config: RunnableConfig):
+    """
+    Starts a run: folds old turns into the rolling summary so state and prompts
+    stay bounded, resets the per-run budgets and status, and checkpoints the
+    workspace so the run can be rolled back.
+    """
+    update = context_manager.compact(state)
+    request = last_request(state)
+    route = model_router.route((state.get("mode") or "autonomy").lower(), request)
+    get_stream_writer()({"type": "route", **route})
+    update.update({
+        "route": route,
+        "iteration_count": 0,
+        "status": None,
+        "started_at": time.time(),
+        "tokens_used": None,
+    })
+    checkpoint = await workspace_checkpoint(config, "before: " + " ".join(request.split())[:72])
+    update["workspace_versions"] = [checkpoint["tree"] if checkpoint else None]
+    return update
+
+async def manager_node(state: AgentState, config: RunnableConfig):
+    update = await run_agent_node(await components.aget("Manager"), state, config)
+    # Pick up the plan the Manager made via create_plan this turn (None clears the previous one).
+    update["plan"] = tool_outbox.pop(get_thread_id(config), "plan")
+    update["task_results"] = None
+    emit_status(update.get("status"))
+    return update
+
+async def editor_node(state: AgentState, config: RunnableConfig):
+    return await run_agent_node(await components.aget("Editor"), state, config)
+
+def task_prompt(task: dict, request: str) -> str:
+    lines = [f"Overall request: {request}", "", f"Your task ({task['id']}): {task['description']}"]
+    if task["files"]:
+        lines.append("Files you own for this task: " + ", ".join(task["files"]))
+    lines.append("Other tasks run in parallel in other Editors; do not modify files outside your task.")
+    return "\n".join(lines)
+
+async def task_node(payload: dict, config: RunnableConfig):
+    """One Editor worker running a single plan task (fanned out with Send)."""
+    task = payload["task"]
+    state = {
+        "messages": [HumanMessage(content=task_prompt(task, payload["request"]), id=str(uuid.uuid4()))],
+        "summary": payload.get("summary"),
+        "route": payload.get("route"),
+    }
+    # Each task gets its own pooled CLI session so tasks in one thread run concurrently.
+    session_key = task_session_key(get_thread_id(config), task["id"])
+    editor = await components.aget("Editor")
+    async with editor_slots:
+        async with file_locks.hold(task["files"]):
+            update = await run_agent_node(editor, state, config, session_key=session_key, name=f"Editor[{task['id']}]")
+    output = update["messages"][0].content
+    failed = output.startswith("Error running agent")
+    update["task_results"] = {task["id"]: {"status": "failed" if failed else "done", "output": output}}
+    return update
+
+def dispatch_tasks(state: AgentState):
+    """Sends every ready plan task to its own Editor; without a plan, falls back to one Editor."""
+    plan = state.get("plan")
+    if not plan:
+        return "Editor"
+    ready = ready_tasks(plan, state.get("task_results") or {})
+    if not ready:
+        return "Changes"
+    payload = {"request": last_request(state), "summary": state.get("summary"), "route": state.get("route")}
+    return [Send("Task", {"task": task, **payload}) for task in ready]
+
+def join_node(state: AgentState):
+    """Runs after every wave of parallel tasks; marks tasks whose dependencies failed as skipped."""
+    plan = state.get("plan") or []
+    results = dict(state.get("task_results") or {})
+    skipped = {}
+    # Skipping propagates down the dependency chain.
+    while True:
+        blocked = blocked_tasks(plan, results)
+        if not blocked:
+            break
+        for task in blocked:
+            results[task["id"]] = skipped[task["id"]] = {"status": "skipped", "output": ""}
+    return {"task_results": skipped} if skipped else {}
+
+def route_context(state: AgentState):
+    return "Manager" if get_pipeline(state)["manager"] else "Editor"
+
+def route_manager(state: AgentState):
+    # Plan mode stops here; the Manager may also finish the request itself.
+    if not get_pipeline(state)["edit"] or (state.get("status") or {}).get("status") == "success":
+        return END
+    return dispatch_tasks(state)
+
+async def changes_node(state: AgentState, config: RunnableConfig):
+    """
+    Checkpoints the workspace after an editing round. Verification is skipped
+    when nothing changed, and the loop stops when edits return to a tree seen
+    earlier in the run (the retries have converged or are oscillating).
+    """
+    versions = list(state.get("workspace_versions") or [None])
+    checkpoint = await workspace_checkpoint(config, f"after editing round {len(versions)}")
+    current = checkpoint["tree"] if checkpoint else None
+    update = {"workspace_versions": versions + [current]}
+    if current is None:
+        return update
+    if current == versions[-1]:
+        update["status"] = {"status": "no_changes", "details": "No files changed; verification skipped.", "agent": "Editor"}
+    elif current in versions[:-1]:
+        update["status"] = {"status": "converged", "details": "Edits reverted to an earlier state; stopping.", "agent": "Editor"}
+    emit_status(update.get("status"))
+    return update
+
+def should_verify(state: AgentState):
+    status = (state.get("status") or {}).get("status")
+    if not get_pipeline(state)["verify"] or status in ("no_changes", "converged"):
+        return END
+    return "Verifier"
+
+async def verifier_node(state: AgentState, config: RunnableConfig):
+    update = await run_agent_node(await components.aget("Verifier"), state, config)
+    update["iteration_count"] = state.get("iteration_count", 0) + 1
+    # A Verifier that reports nothing ends the run rather than looping blindly.
+    status = update.setdefault("status", None)
+    if status is not None and status["status"] == "failure":
+        spent = {
+            **state,
+            "iteration_count": update["iteration_count"],
+            "tokens_used": (state.get("tokens_used") or 0) + update["tokens_used"]
+        }
+        reason = run_budget.exhausted(spent) if get_pipeline(state)["retry"] else "retries disabled in this mode"
+        if reason is not None:
+            status["stop_reason"] = reason
+        elif update["iteration_count"] > 1:
+            # Repeated failure: give the Editor a larger model for the next attempt.
+            update["route"] = model_router.escalate(state["route"], "Editor")
+    emit_status(status)
+    return update
 
 def should_end(state: AgentState):
-    messages = state.get("messages", [])
-    for msg in reversed(messages[-3:]):
-        content = msg.content if hasattr(msg, 'content') else str(msg)
-        if "STATUS_REPORT: success" in content:
-            return END
-    return "continue"
+    """Retries the Editor after a reported failure while the run budget lasts."""
+    status = state.get("status") or {}
+    if status.get("status") == "failure" and not status.get("stop_reason"):
+        return "continue"
+    return END
 
 workflow = StateGraph(AgentState)
 
-workflow.add_node("Manager", manager_node)
-workflow.add_node("Editor", editor_node)
-workflow.add_node("Verifier", verifier_node)
+workflow.add_node("Context", traced("node", "Context")(context_node))
+workflow.add_node("Manager", traced("node", "Manager")(manager_node))
+workflow.add_node("Editor", traced("node", "Editor")(editor_node))
+workflow.add_node("Task", traced("node", "Task")(task_node))
+workflow.add_node("Join", traced("node", "Join")(join_node))
+workflow.add_node("Changes", traced("node", "Changes")(changes_node))
+workflow.add_node("Verifier", traced("node", "Verifier")(verifier_node))
 
-workflow.set_entry_point("Manager")
+workflow.set_entry_point("Context")
 
-workflow.add_edge("Manager", "Editor")
-workflow.add_edge("Editor", "Verifier")
+workflow.add_conditional_edges("Context", route_context, ["Manager", "Editor"])
+workflow.add_conditional_edges("Manager", route_manager, ["Editor", "Task", "Changes", END])
+workflow.add_edge("Editor", "Changes")
+workflow.add_edge("Task", "Join")
+workflow.add_conditional_edges("Join", dispatch_tasks, ["Task", "Changes"])
+workflow.add_conditional_edges("Changes", should_verify, ["Verifier", END])
 
 workflow.add_conditional_edges(
     "Verifier",
     should_end,
     {
         END: END,
-        "continue": END
+        "continue": "Editor"
     }
 )
 
-memory = MemorySaver()
+memory = get_checkpointer()
 app = workflow.compile(checkpointer=memory)
@@ -1,26 +1,299 @@
 from claude_agent_sdk import tool
-from playwright.async_api import async_playwright
-import base64
+from agent_core.core.screenshots import ScreenshotError, screenshot_store
+from agent_core.core.session import TASK_SEPARATOR, current_thread_id
+from agent_core.tools.extraction import DEFAULT_TOKEN_BUDGET, extract_page, format_page
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+import asyncio
+import os
+import time
 
-# Global browser instance management (simplified for demo)
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_CONTEXTS = int(os.environ.get("BROWSER_MAX_CONTEXTS", "8"))
+BROWSER_IDLE_TTL = float(os.environ.get("BROWSER_IDLE_TTL", "300"))
+BROWSER_BLOCK_RESOURCES = os.environ.get("BROWSER_BLOCK_RESOURCES", "0") == "1"
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+# Last URLs of contexts closed under a thread (evicted, reaped, crashed) that are reopened on its next lease.
+RECYCLED_URLS_KEPT = 1024
+
+class ContextLease:
+    """An isolated BrowserContext + page owned by one thread."""
+
+    def __init__(self, key: str, browser, context, page):
+        self.key = key
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        # Set when this context replaces one that was recycled: the page to reopen first.
+        self.restore_url = None
+
+    @property
+    def alive(self) -> bool:
+        return self.browser.is_connected()
+
+# Pool of pre-warmed Chromium browsers handing out one context per thread
 class BrowserManager:
-    def __init__(self):
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_contexts: int = BROWSER_MAX_CONTEXTS,
+        idle_ttl: float = BROWSER_IDLE_TTL,
+        block_resources: bool = BROWSER_BLOCK_RESOURCES
+    ):
+        self.size = size
+        self.max_contexts = max_contexts
+        self.idle_ttl = idle_ttl
+        self.block_resources = block_resources
         self.playwright = None
-        self.browser = None
-        self.page = None
+        self.browsers = []
+        self.leases: "OrderedDict[str, ContextLease]" = OrderedDict()
+        self._recycled: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._released = asyncio.Condition(self._lock)
+        self._reaper = None
+        self.metrics = {
+            "launches": 0,
+            "crashes": 0,
+            "contexts_created": 0,
+            "contexts_reused": 0,
+            "contexts_reaped": 0,
+            "contexts_restored": 0,
+            "contexts_released": 0,
+            "leases": 0,
+            "lease_wait_seconds": 0.0,
+            "max_lease_wait_seconds": 0.0
+        }
 
-    async def get_page(self):
+    async def _launch(self):
+        browser = await self.playwright.chromium.launch(headless=True)
+        self.metrics["launches"] += 1
+        browser.on("disconnected", lambda b: self._on_disconnected(b))
+        return browser
+
+    def _on_disconnected(self, browser):
+        if browser in self.browsers:
+            self.metrics["crashes"] += 1
+            self.browsers.remove(browser)
+        for key, lease in list(self.leases.items()):
+            if lease.browser is browser:
+                self._recycle(self.leases.pop(key))
+
+    async def start(self):
+        """Starts Playwright and pre-launches the browser pool."""
+        async with self._lock:
+            await self._ensure_browsers()
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def _ensure_browsers(self):
         if not self.playwright:
+            # Imported on first launch: Playwright is slow to import and most runs never browse.
+            from playwright.async_api import async_playwright
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=True)
-            self.page = await self.browser.new_page()
-        return self.page
+        self.browsers = [b for b in self.browsers if b.is_connected()]
+        while len(self.browsers) < self.size:
+            self.browsers.append(await self._launch())
+
+    def _least_loaded_browser(self):
+        load = {id(b): 0 for b in self.browsers}
+        for lease in self.leases.values():
+            if id(lease.browser) in load:
+                load[id(lease.browser)] += 1
+        return min(self.browsers, key=lambda b: load[id(b)])
+
+    async def _new_context(self, key: str) -> ContextLease:
+        browser = self._least_loaded_browser()
+        context = await browser.new_context()
+        if self.block_resources:
+            await context.route("**/*", self._route_filter)
+        page = await context.new_page()
+        self.metrics["contexts_created"] += 1
+        return ContextLease(key, browser, context, page)
+
+    @staticmethod
+    async def _route_filter(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _close_lease(self, lease: ContextLease):
+        try:
+            await lease.context.close()
+        except Exception:
+            pass
+
+    def _recycle(self, lease: ContextLease):
+        """Remembers where the thread's page was so its next lease reopens it instead of about:blank."""
+        try:
+            url = lease.restore_url or lease.page.url
+        except Exception:
+            return
+        if not url or url == "about:blank":
+            return
+        self._recycled[lease.key] = url
+        self._recycled.move_to_end(lease.key)
+        while len(self._recycled) > RECYCLED_URLS_KEPT:
+            self._recycled.popitem(last=False)
+
+    def _evict_one(self):
+        """Removes the least recently used lease that is not mid tool call."""
+        for key, lease in self.leases.items():
+            if not lease.lock.locked():
+                del self.leases[key]
+                self._recycle(lease)
+                return lease
+        return None
+
+    async def _acquire(self, key: str) -> ContextLease:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+        started = time.monotonic()
+        stale = []
+        async with self._lock:
+            await self._ensure_browsers()
+            while True:
+                lease = self.leases.get(key)
+                if lease is not None and not lease.alive:
+                    del self.leases[key]
+                    self._recycle(lease)
+                    stale.append(lease)
+                    lease = None
+                if lease is not None:
+                    self.leases.move_to_end(key)
+                    self.metrics["contexts_reused"] += 1
+                    break
+                if len(self.leases) >= self.max_contexts:
+                    evicted = self._evict_one()
+                    if evicted is None:
+                        # Every context is busy: wait for one to be released.
+                        await self._released.wait()
+                        await self._ensure_browsers()
+                        continue
+                    stale.append(evicted)
+                lease = await self._new_context(key)
+                lease.restore_url = self._recycled.pop(key, None)
+                self.leases[key] = lease
+                break
+        for old in stale:
+            await self._close_lease(old)
+
+        waited = time.monotonic() - started
+        self.metrics["leases"] += 1
+        self.metrics["lease_wait_seconds"] += waited
+        self.metrics["max_lease_wait_seconds"] = max(self.metrics["max_lease_wait_seconds"], waited)
+        return lease
+
+    @asynccontextmanager
+    async def page(self, key: str = None, restore: bool = True):
+        """
+        Leases the page of the calling thread's context for one tool call.
+
+        If the thread's previous context was recycled (evicted for another
+        thread, reaped when idle, or lost in a crash), its last URL is
+        reopened first; form input and scroll position are not. Callers
+        that navigate right away pass restore=False.
+        """
+        key = key or current_thread_id()
+        while True:
+            lease = await self._acquire(key)
+            await lease.lock.acquire()
+            if self.leases.get(key) is lease and lease.browser.is_connected():
+                break
+            # Evicted or crashed between acquire and lock; take a fresh lease.
+            lease.lock.release()
+        try:
+            if lease.page.is_closed():
+                # Page crashed or was closed by the site; the context survives.
+                lease.page = await lease.context.new_page()
+            url, lease.restore_url = lease.restore_url, None
+            if url and restore:
+                try:
+                    await lease.page.goto(url)
+                except Exception as e:
+                    raise RuntimeError(
+                        f"the browser context was recycled and reopening {url} failed ({e}); open the URL again"
+                    ) from e
+                self.metrics["contexts_restored"] += 1
+            yield lease.page
+        finally:
+            lease.last_used = time.monotonic()
+            lease.lock.release()
+            async with self._lock:
+                self._released.notify_all()
+
+    async def get_page(self):
+        """Returns the current thread's page (without holding it for a call)."""
+        async with self.page() as page:
+            return page
+
+    async def release(self, thread_id: str):
+        """
+        Closes the contexts of a conversation thread (its own and its tasks'),
+        e.g. when its run finishes. Their URLs are kept, so the thread's next
+        run reopens its pages; contexts mid tool call are left to the reaper.
+        """
+        prefix = thread_id + TASK_SEPARATOR
+        async with self._lock:
+            keys = [
+                key for key, lease in self.leases.items()
+                if (key == thread_id or key.startswith(prefix)) and not lease.lock.locked()
+            ]
+            released = [self.leases.pop(key) for key in keys]
+            for lease in released:
+                self._recycle(lease)
+            if released:
+                self._released.notify_all()
+        for lease in released:
+            self.metrics["contexts_released"] += 1
+            await self._close_lease(lease)
+
+    async def _reap_loop(self):
+        interval = max(1.0, min(self.idle_ttl / 2, 30.0))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            async with self._lock:
+                idle = [
+                    key for key, lease in self.leases.items()
+                    if not lease.lock.locked() and now - lease.last_used > self.idle_ttl
+                ]
+                expired = [self.leases.pop(key) for key in idle]
+                for lease in expired:
+                    self._recycle(lease)
+                if expired:
+                    self._released.notify_all()
+            for lease in expired:
+                self.metrics["contexts_reaped"] += 1
+                await self._close_lease(lease)
+
+    def stats(self) -> dict:
+        leases = self.metrics["leases"]
+        return {
+            **self.metrics,
+            "browsers": len(self.browsers),
+            "active_contexts": len(self.leases),
+            "reuse_ratio": self.metrics["contexts_reused"] / leases if leases else 0.0,
+            "avg_lease_wait_seconds": self.metrics["lease_wait_seconds"] / leases if leases else 0.0
+        }
 
     async def close(self):
-        if self.browser:
-            await self.browser.close()
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for lease in list(self.leases.values()):
+            await self._close_lease(lease)
+        self.leases.clear()
+        for browser in self.browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self.browsers = []
         if self.playwright:
             await self.playwright.stop()
+            self.playwright = None
 
 browser_manager = BrowserManager()
 
@@ -29,9 +302,9 @@ async def open_url(args) -> dict:
     """Opens a URL in the headless browser."""
     url = args["url"]
     try:
-        page = await browser_manager.get_page()
-        await page.goto(url)
-        title = await page.title()
+        async with browser_manager.page(restore=False) as page:
+            await page.goto(url)
+            title = await page.title()
         return {"content": [{"type": "text", "text": f"Navigated to {url}. Page Title: {title}"}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error navigating to {url}: {str(e)}"}]}
@@ -41,8 +314,8 @@ async def click_element(args) -> dict:
     """Clicks an element on the current page."""
     selector = args["selector"]
     try:
-        page = await browser_manager.get_page()
-        await page.click(selector)
+        async with browser_manager.page() as page:
+            await page.click(selector)
         return {"content": [{"type": "text", "text": f"Clicked element matching '{selector}'."}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error clicking '{selector}': {str(e)}"}]}
@@ -53,34 +326,262 @@ async def fill_form(args) -> dict:
     selector = args["selector"]
     value = args["value"]
     try:
-        page = await browser_manager.get_page()
-        await page.fill(selector, value)
+        async with browser_manager.page() as page:
+            await page.fill(selector, value)
         return {"content": [{"type": "text", "text": f"Filled '{selector}' with '{value}'."}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error filling '{selector}': {str(e)}"}]}
 
-@tool("take_screenshot", "Takes a screenshot of the current page", {"filename": str})
+async def _capture(page, full_page: bool = False, filename: str = None, timeout: float = None) -> dict:
+    """Screenshots page in memory into the screenshot store (and filename, if given)."""
+    data = await page.screenshot(full_page=full_page, timeout=timeout)
+    shot = await asyncio.to_thread(screenshot_store.put, data)
+    if filename:
+        os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else ".", exist_ok=True)
+        with open(filename, "wb") as f:
+            f.write(data)
+    return shot
+
+def _describe_shot(shot: dict) -> str:
+    text = f"Screenshot {shot['id']} ({shot['width']}x{shot['height']}, {shot['bytes'] / 1024:.1f}K)"
+    if shot.get("duplicate"):
+        text += ", same as an earlier capture" if shot["duplicate"] == "exact" else ", visually identical to an earlier capture"
+    return text
+
+def _format_diff(shot_id: str, name: str, baseline_id: str, diff: dict) -> str:
+    if not diff["changed_pixels"]:
+        return f"Screenshot {shot_id} matches baseline '{name}' ({baseline_id}): similarity 1.0, no changed regions."
+    regions = ", ".join(f"({r['x']},{r['y']} {r['width']}x{r['height']})" for r in diff["regions"])
+    more = diff["region_count"] - len(diff["regions"])
+    text = (
+        f"Screenshot {shot_id} differs from baseline '{name}' ({baseline_id}): similarity {diff['similarity']}, "
+        f"{diff['changed_pixels']} changed pixels in {diff['region_count']} region(s) (x,y WxH): {regions}"
+    )
+    if more > 0:
+        text += f" and {more} smaller"
+    if diff["resized"]:
+        text += ". Sizes differ; the screenshot was scaled to the baseline's size"
+    return text + "."
+
+@tool(
+    "take_screenshot",
+    "Takes a screenshot of the current page into the screenshot store and returns its id. "
+    "Optionally also saves it to filename, records it as a named baseline for compare_screenshot, "
+    "or returns the path of a downscaled preview.",
+    {
+        "type": "object",
+        "properties": {
+            "filename": {"type": "string", "description": "Also write the PNG here"},
+            "full_page": {"type": "boolean"},
+            "baseline": {"type": "string", "description": "Record the screenshot as this named baseline"},
+            "preview": {"type": "boolean", "description": "Return a downscaled JPEG/WebP copy for viewing"}
+        },
+        "required": []
+    }
+)
 async def take_screenshot(args) -> dict:
     """Takes a screenshot of the current page."""
-    filename = args["filename"]
+    filename = args.get("filename") or None
     try:
-        page = await browser_manager.get_page()
-        # Ensure directory exists
-        import os
-        os.makedirs(os.path.dirname(filename) if os.path.dirname(filename) else ".", exist_ok=True)
-        
-        await page.screenshot(path=filename)
-        return {"content": [{"type": "text", "text": f"Screenshot saved to {filename}"}]}
+        async with browser_manager.page() as page:
+            shot = await _capture(page, bool(args.get("full_page")), filename)
+        text = _describe_shot(shot)
+        if filename:
+            text += f", saved to {filename}"
+        if args.get("baseline"):
+            await asyncio.to_thread(screenshot_store.set_baseline, args["baseline"], shot["id"])
+            text += f", recorded as baseline '{args['baseline']}'"
+        if args.get("preview"):
+            try:
+                text += f", preview at {await asyncio.to_thread(screenshot_store.preview, shot['id'])}"
+            except ScreenshotError as e:
+                text += f" (no preview: {str(e)})"
+        return {"content": [{"type": "text", "text": text + "."}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error taking screenshot: {str(e)}"}]}
 
-@tool("get_page_content", "Gets the text content of the current page", {})
+@tool(
+    "compare_screenshot",
+    "Visual regression check in one call: screenshots the current page (or takes a stored screenshot id) "
+    "and diffs it against a named baseline, returning a similarity score and the changed regions. "
+    "If the baseline doesn't exist yet, the screenshot becomes the baseline.",
+    {
+        "type": "object",
+        "properties": {
+            "baseline": {"type": "string", "description": "Baseline name, e.g. 'login-page'"},
+            "screenshot": {"type": "string", "description": "Stored screenshot id (default: capture the page now)"},
+            "full_page": {"type": "boolean"},
+            "update_baseline": {"type": "boolean", "description": "Make this screenshot the new baseline afterwards"}
+        },
+        "required": ["baseline"]
+    }
+)
+async def compare_screenshot(args) -> dict:
+    """Diffs the current page (or a stored screenshot) against a named baseline."""
+    name = args["baseline"]
+    try:
+        shot_id = args.get("screenshot") or None
+        if shot_id is None:
+            async with browser_manager.page() as page:
+                shot_id = (await _capture(page, bool(args.get("full_page"))))["id"]
+        elif await asyncio.to_thread(screenshot_store.get, shot_id) is None:
+            return {"content": [{"type": "text", "text": f"Error comparing screenshot: unknown screenshot {shot_id}"}]}
+        baseline_id = await asyncio.to_thread(screenshot_store.baseline, name)
+        if baseline_id is None:
+            await asyncio.to_thread(screenshot_store.set_baseline, name, shot_id)
+            return {"content": [{"type": "text", "text": f"No baseline '{name}' yet; recorded screenshot {shot_id} as the baseline."}]}
+        diff = await asyncio.to_thread(screenshot_store.compare, shot_id, baseline_id)
+        text = _format_diff(shot_id, name, baseline_id, diff)
+        if args.get("update_baseline") and shot_id != baseline_id:
+            await asyncio.to_thread(screenshot_store.set_baseline, name, shot_id)
+            text += f" Baseline '{name}' is now {shot_id}."
+        return {"content": [{"type": "text", "text": text}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error comparing screenshot: {str(e)}"}]}
+
+@tool(
+    "get_page_content",
+    "Gets a compact outline of the visible text on the current page (headings, links, controls, text). "
+    "Long pages are paged: pass the returned cursor to continue. Optional selector limits it to a subtree.",
+    {
+        "type": "object",
+        "properties": {
+            "selector": {"type": "string", "description": "CSS selector of the region to extract"},
+            "cursor": {"type": "integer", "description": "Line offset returned by the previous call"},
+            "max_tokens": {"type": "integer", "description": "Token budget for this page of output"}
+        },
+        "required": []
+    }
+)
 async def get_page_content(args) -> dict:
-    """Gets the text content of the current page."""
+    """Gets the visible content of the current page as a compact, paged outline."""
+    selector = args.get("selector") or None
+    cursor = int(args.get("cursor") or 0)
+    max_tokens = int(args.get("max_tokens") or DEFAULT_TOKEN_BUDGET)
     try:
-        page = await browser_manager.get_page()
-        content = await page.content()
-        # Simple text extraction, in real app might use BeautifulSoup or similar
-        return {"content": [{"type": "text", "text": content[:2000] + "... (truncated)"}]}
+        async with browser_manager.page() as page:
+            lines, _ = await extract_page(page, selector)
+            title = await page.title()
+            url = page.url
+        return {"content": [{"type": "text", "text": format_page(url, title, lines, cursor, max_tokens)}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error getting content: {str(e)}"}]}
+
+SCRIPT_STEP_TIMEOUT_MS = int(os.environ.get("BROWSER_SCRIPT_STEP_TIMEOUT_MS", "5000"))
+SCRIPT_MAX_STEPS = 50
+SCRIPT_ACTIONS = ("goto", "fill", "click", "wait_for", "expect_text", "screenshot")
+
+async def _run_step(page, step: dict, timeout: float) -> str:
+    """Runs one script step on page; returns extra detail for the report (or ""), raises on failure."""
+    action = step.get("action")
+    selector = step.get("selector")
+    if action == "goto":
+        response = await page.goto(step["url"], wait_until=step.get("wait_until", "load"), timeout=timeout)
+        status = f"HTTP {response.status}" if response else "no response"
+        return status if page.url == step["url"] else f"{status}, redirected to {page.url}"
+    if action == "fill":
+        await page.fill(selector, step.get("value", ""), timeout=timeout)
+        return ""
+    if action == "click":
+        await page.click(selector, timeout=timeout)
+        return ""
+    if action == "wait_for":
+        if step.get("url"):
+            await page.wait_for_url(step["url"], timeout=timeout)
+            return ""
+        if step.get("text"):
+            scope = page.locator(selector) if selector else page
+            await scope.get_by_text(step["text"]).first.wait_for(state=step.get("state", "visible"), timeout=timeout)
+            return ""
+        await page.locator(selector).first.wait_for(state=step.get("state", "visible"), timeout=timeout)
+        return ""
+    if action == "expect_text":
+        # Auto-waits for a visible element (inside selector, if given) containing the text.
+        scope = page.locator(selector or "body")
+        await scope.filter(has_text=step["text"]).first.wait_for(state="visible", timeout=timeout)
+        return ""
+    if action == "screenshot":
+        shot = await _capture(page, bool(step.get("full_page")), step.get("filename"), timeout)
+        return shot["id"]
+    raise ValueError(f"unknown action {action!r} (expected one of {', '.join(SCRIPT_ACTIONS)})")
+
+def _describe(step: dict) -> str:
+    if step.get("text"):
+        target = repr(step["text"]) + (f" in {step['selector']}" if step.get("selector") else "")
+    else:
+        target = step.get("url") or step.get("selector") or step.get("filename") or ""
+    return f"{step.get('action', '?')} {target}".strip()
+
+def _short_error(e: Exception) -> str:
+    # Playwright errors carry a multi-line call log; the first line says what failed.
+    return (str(e).strip().splitlines() or [type(e).__name__])[0][:200]
+
+@tool(
+    "run_browser_script",
+    "Runs a sequence of browser actions and checks in one call, on the thread's page: "
+    "goto(url), fill(selector, value), click(selector), wait_for(selector | text | url), "
+    "expect_text(text, selector?), screenshot(filename?; returns the stored screenshot id). Every step auto-waits for its "
+    "target up to timeout_ms; the script stops at the first failing step. "
+    "Returns one line per step with its timing.",
+    {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "action": {"type": "string", "enum": list(SCRIPT_ACTIONS)},
+                        "url": {"type": "string"},
+                        "selector": {"type": "string"},
+                        "value": {"type": "string"},
+                        "text": {"type": "string"},
+                        "filename": {"type": "string"},
+                        "state": {"type": "string", "description": "wait_for: visible, hidden, attached or detached"},
+                        "full_page": {"type": "boolean"},
+                        "timeout_ms": {"type": "integer"}
+                    },
+                    "required": ["action"]
+                }
+            },
+            "timeout_ms": {"type": "integer", "description": "Default auto-wait per step"},
+            "continue_on_failure": {"type": "boolean", "description": "Run the remaining steps after a failure"}
+        },
+        "required": ["steps"]
+    }
+)
+async def run_browser_script(args) -> dict:
+    """Runs a batch of browser actions and assertions, returning per-step results."""
+    steps = args.get("steps") or []
+    default_timeout = int(args.get("timeout_ms") or SCRIPT_STEP_TIMEOUT_MS)
+    keep_going = bool(args.get("continue_on_failure"))
+    if not steps:
+        return {"content": [{"type": "text", "text": "Error running browser script: no steps given."}]}
+    if len(steps) > SCRIPT_MAX_STEPS:
+        return {"content": [{"type": "text", "text": f"Error running browser script: at most {SCRIPT_MAX_STEPS} steps per call."}]}
+    lines = []
+    failed = 0
+    started = time.perf_counter()
+    try:
+        async with browser_manager.page(restore=steps[0].get("action") != "goto") as page:
+            for i, step in enumerate(steps, 1):
+                if failed and not keep_going:
+                    lines.append(f"{i}. skip {_describe(step)}")
+                    continue
+                step_started = time.perf_counter()
+                try:
+                    detail = await _run_step(page, step, int(step.get("timeout_ms") or default_timeout))
+                    line = f"ok   {_describe(step)}" + (f" -> {detail}" if detail else "")
+                except Exception as e:
+                    failed += 1
+                    line = f"FAIL {_describe(step)}: {_short_error(e)}"
+                elapsed_ms = (time.perf_counter() - step_started) * 1000
+                lines.append(f"{i}. {line} ({elapsed_ms:.0f}ms)")
+            title = await page.title()
+            url = page.url
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error running browser script: {str(e)}"}]}
+    total = time.perf_counter() - started
+    verdict = f"{failed} of {len(steps)} steps failed" if failed else f"all {len(steps)} steps passed"
+    summary = f"Browser script: {verdict} in {total:.2f}s. Now at {url} ({title!r})."
+    return {"content": [{"type": "text", "text": summary + "\n" + "\n".join(lines)}]}
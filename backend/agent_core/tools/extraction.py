@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+DEFAULT_TOKEN_BUDGET = 1500
+CACHE_SIZE = 64
+
+# Cheap fingerprint of the rendered DOM, so unchanged pages skip extraction. Live form state
+# (typed values, checkboxes, selections) is not in innerHTML but is in the outline, so it is hashed too.
+DOM_HASH_JS = """
+(selector) => {
+    const root = (selector && document.querySelector(selector)) || document.body || document.documentElement;
+    if (!root) return "empty";
+    let html = root.innerHTML;
+    for (const el of root.querySelectorAll("input, textarea, select")) {
+        html += "\\n" + (el.tagName === "SELECT" ? el.selectedIndex : el.value) + (el.checked ? " checked" : "");
+    }
+    let h = 0x811c9dc5;
+    for (let i = 0; i < html.length; i++) {
+        h ^= html.charCodeAt(i);
+        h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(16) + ":" + html.length;
+}
+"""
+
+# Walks the visible DOM and emits a compact outline: headings, links, controls and text.
+EXTRACT_JS = """
+(selector) => {
+    const root = (selector && document.querySelector(selector)) || document.body || document.documentElement;
+    const SKIP = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE", "SVG", "CANVAS", "IFRAME", "HEAD"]);
+    const lines = [];
+    const clean = (s) => (s || "").replace(/\\s+/g, " ").trim();
+    const visible = (el) => {
+        if (el.getAttribute && el.getAttribute("aria-hidden") === "true") return false;
+        const style = window.getComputedStyle(el);
+        return style.display !== "none" && style.visibility !== "hidden";
+    };
+    const label = (el) => clean(el.getAttribute("aria-label") || el.innerText || el.value || el.getAttribute("title"));
+    const walk = (el) => {
+        if (el.nodeType === Node.TEXT_NODE) {
+            const text = clean(el.textContent);
+            if (text) lines.push(text);
+            return;
+        }
+        if (el.nodeType !== Node.ELEMENT_NODE || SKIP.has(el.tagName) || !visible(el)) return;
+        const tag = el.tagName;
+        if (/^H[1-6]$/.test(tag)) {
+            lines.push("#".repeat(Number(tag[1])) + " " + clean(el.innerText));
+            return;
+        }
+        if (tag === "A" && el.href) {
+            lines.push(`[${label(el)}](${el.getAttribute("href")})`);
+            return;
+        }
+        if (tag === "BUTTON" || el.getAttribute("role") === "button") {
+            lines.push(`[button] ${label(el)}`);
+            return;
+        }
+        if (tag === "INPUT" || tag === "TEXTAREA" || tag === "SELECT") {
+            const attrs = ["type", "name", "id", "placeholder"]
+                .map((a) => el.getAttribute(a) ? `${a}=${el.getAttribute(a)}` : null)
+                .filter(Boolean).join(" ");
+            const value = tag === "SELECT" ? clean(el.options[el.selectedIndex]?.text) : el.value;
+            lines.push(`[${tag.toLowerCase()} ${attrs}]` + (value ? ` value=${value}` : ""));
+            return;
+        }
+        if (tag === "IMG") {
+            const alt = clean(el.getAttribute("alt"));
+            if (alt) lines.push(`[img] ${alt}`);
+            return;
+        }
+        const start = lines.length;
+        for (const child of el.childNodes) walk(child);
+        if (tag === "LI" && lines.length > start) lines[start] = "- " + lines[start];
+    };
+    if (root) walk(root);
+    return lines;
+}
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def dedupe(lines: List[str]) -> List[str]:
+    """Drops empty lines and repeats (nav bars, footers echoed across the page)."""
+    seen = set()
+    out = []
+    for line in lines:
+        if not line or line in seen:
+            continue
+        seen.add(line)
+        out.append(line)
+    return out
+
+
+def paginate(lines: List[str], cursor: int = 0, max_tokens: int = DEFAULT_TOKEN_BUDGET) -> Tuple[List[str], Optional[int]]:
+    """Returns lines starting at cursor that fit the token budget, and the next cursor."""
+    page, used = [], 0
+    index = max(0, cursor)
+    while index < len(lines):
+        cost = estimate_tokens(lines[index])
+        if page and used + cost > max_tokens:
+            break
+        page.append(lines[index])
+        used += cost
+        index += 1
+    return page, (index if index < len(lines) else None)
+
+
+class ExtractionCache:
+    """LRU of extracted outlines keyed by (url, selector, dom hash)."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[Tuple[str, str, str], List[str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[List[str]]:
+        lines = self._entries.get(key)
+        if lines is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return lines
+
+    def put(self, key: Tuple[str, str, str], lines: List[str]):
+        self._entries[key] = lines
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+extraction_cache = ExtractionCache()
+
+
+async def extract_page(page, selector: Optional[str] = None) -> Tuple[List[str], bool]:
+    """Returns the deduplicated outline of page (or the selector's subtree) and whether it was cached."""
+    dom_hash = await page.evaluate(DOM_HASH_JS, selector)
+    key = (page.url, selector or "", dom_hash)
+    lines = extraction_cache.get(key)
+    if lines is not None:
+        return lines, True
+    lines = dedupe(await page.evaluate(EXTRACT_JS, selector))
+    extraction_cache.put(key, lines)
+    return lines, False
+
+
+def format_page(url: str, title: str, lines: List[str], cursor: int, max_tokens: int) -> str:
+    page_lines, next_cursor = paginate(lines, cursor, max_tokens)
+    end = cursor + len(page_lines)
+    header = f"URL: {url}\nTitle: {title}\nLines {cursor}-{end} of {len(lines)}"
+    if next_cursor is not None:
+        header += f" (more: call again with cursor={next_cursor})"
+    return header + "\n\n" + "\n".join(page_lines)
@@ -1,69 +1,321 @@
 from claude_agent_sdk import tool
+from typing import Optional
+import asyncio
+import fnmatch
 import os
-import subprocess
+import time
+from agent_core.core.code_index import get_code_index
+from agent_core.core.files import VersionConflict, atomic_write, atomic_write_many, read_cache
+from agent_core.core.process import run_shell
+from agent_core.core.session import base_thread_id, current_thread_id
+from agent_core.core.snapshots import get_snapshot_store
+from agent_core.core.workspace import get_workspace_index
+
+READ_FILES_MAX_CHARS = 200_000
+LIST_MAX_ENTRIES = 500
+LIST_MAX_DEPTH = 8
+SEARCH_MAX_RESULTS = 50
 
 @tool("read_file", "Reads a file from the filesystem", {"file_path": str})
 async def read_file(args) -> dict:
     """Reads a file from the filesystem."""
     file_path = args["file_path"]
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
+        content, _ = await asyncio.to_thread(read_cache.read, file_path)
         return {"content": [{"type": "text", "text": content}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error reading file: {str(e)}"}]}
 
+def _read_section(spec) -> str:
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"]
+    try:
+        text, version = read_cache.read(path)
+    except Exception as e:
+        return f"=== {path} ===\nError reading file: {str(e)}"
+    lines = text.splitlines(keepends=True)
+    start = max(1, int(spec.get("start_line") or 1))
+    end = min(len(lines), int(spec.get("end_line") or len(lines)))
+    if start == 1 and end == len(lines):
+        return f"=== {path} ({len(lines)} lines, version {version}) ===\n{text}"
+    return f"=== {path} (lines {start}-{end} of {len(lines)}, version {version}) ===\n" + "".join(lines[start - 1:end])
+
+@tool(
+    "read_files",
+    "Reads several files (optionally line ranges) in one call. Prefer this over repeated read_file calls.",
+    {
+        "type": "object",
+        "properties": {
+            "files": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "start_line": {"type": "integer", "description": "First line to return (1-based)"},
+                        "end_line": {"type": "integer", "description": "Last line to return (inclusive)"}
+                    },
+                    "required": ["path"]
+                }
+            }
+        },
+        "required": ["files"]
+    }
+)
+async def read_files(args) -> dict:
+    """Reads many files or line ranges, returning them as one text block with a header per file."""
+    try:
+        sections = await asyncio.to_thread(lambda: [_read_section(spec) for spec in args["files"]])
+        text = "\n".join(sections)
+        if len(text) > READ_FILES_MAX_CHARS:
+            text = text[:READ_FILES_MAX_CHARS] + f"\n... [output truncated at {READ_FILES_MAX_CHARS} characters; request fewer files or line ranges]"
+        return {"content": [{"type": "text", "text": text}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error reading files: {str(e)}"}]}
+
+def _write_through(file_path: str, data: bytes) -> str:
+    version = atomic_write(file_path, [data])
+    read_cache.update(file_path, data, version)
+    return version
+
 @tool("write_file", "Writes content to a file", {"file_path": str, "content": str})
 async def write_file(args) -> dict:
     """Writes content to a file."""
     file_path = args["file_path"]
     content = args["content"]
     try:
-        with open(file_path, 'w') as f:
-            f.write(content)
+        await asyncio.to_thread(_write_through, file_path, content.encode("utf-8"))
         return {"content": [{"type": "text", "text": f"Successfully wrote to {file_path}"}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error writing file: {str(e)}"}]}
 
+@tool(
+    "write_files",
+    "Writes several files as one atomic change: all are written or none. "
+    "Pass base_version (from read_files) to fail instead of overwriting concurrent edits.",
+    {
+        "type": "object",
+        "properties": {
+            "files": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "content": {"type": "string"},
+                        "base_version": {"type": "string", "description": "Version the edit was based on"}
+                    },
+                    "required": ["path", "content"]
+                }
+            }
+        },
+        "required": ["files"]
+    }
+)
+async def write_files(args) -> dict:
+    """Writes many files atomically (all-or-nothing)."""
+    try:
+        files = [(spec["path"], spec["content"].encode("utf-8")) for spec in args["files"]]
+        expected = {spec["path"]: spec["base_version"] for spec in args["files"] if spec.get("base_version")}
+        versions = await asyncio.to_thread(atomic_write_many, files, expected)
+        for path, data in files:
+            read_cache.update(path, data, versions.get(path))
+        listing = "\n".join(f"- {path} (version {versions[path]})" for path, _ in files)
+        return {"content": [{"type": "text", "text": f"Successfully wrote {len(files)} files:\n{listing}"}]}
+    except VersionConflict as e:
+        return {"content": [{"type": "text", "text": f"No files written: {str(e)}. Re-read it and retry."}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error writing files (no files written): {str(e)}"}]}
+
 @tool("run_shell_command", "Runs a shell command", {"command": str})
 async def run_shell_command(args) -> dict:
     """Runs a shell command in the sandbox environment."""
     command = args["command"]
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=60)
-        output = f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}"
+        result = await run_shell(command, timeout=60)
+        output = f"STDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}\nEXIT CODE: {result.returncode}"
+        if result.timed_out:
+            output += "\nCommand timed out after 60 seconds and was killed."
         return {"content": [{"type": "text", "text": output}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error executing command: {str(e)}"}]}
 
-@tool("list_directory", "Lists files in a directory", {"path": str})
+def _format_size(size: int) -> str:
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024 or unit == "G":
+            return f"{size}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+def _list_entries(path: str, recursive: bool, max_depth: int, show_all: bool):
+    """Yields (relative path, is_dir) under path; hidden and gitignored entries are skipped unless show_all."""
+    index = get_workspace_index()
+
+    def walk(directory: str, prefix: str, depth: int):
+        if show_all:
+            with os.scandir(directory) as it:
+                entries = sorted((entry.name, entry.is_dir()) for entry in it)
+        else:
+            entries = index.listing(directory).entries
+        for name, is_dir in entries:
+            rel = prefix + name
+            yield rel, is_dir
+            if is_dir and recursive and depth < max_depth:
+                yield from walk(os.path.join(directory, name), rel + "/", depth + 1)
+
+    yield from walk(path, "", 1)
+
+def _list_directory(path: str, recursive: bool, pattern: Optional[str], details: bool, max_depth: int, limit: int, show_all: bool) -> str:
+    lines = []
+    for rel, is_dir in _list_entries(path, recursive, max_depth, show_all):
+        if pattern and (is_dir or not (fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(os.path.basename(rel), pattern))):
+            continue
+        if len(lines) >= limit:
+            lines.append(f"... more entries not shown (limit {limit}); narrow with pattern or path")
+            break
+        line = rel + "/" if is_dir else rel
+        if details and not is_dir:
+            st = os.stat(os.path.join(path, rel))
+            line += f"  {_format_size(st.st_size)}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(st.st_mtime))}"
+        lines.append(line)
+    return "\n".join(lines) if lines else "(empty)"
+
+@tool(
+    "list_directory",
+    "Lists files in a directory, one per line (directories end with '/'). Hidden and .gitignored entries "
+    "are skipped unless all=true. Options: recursive, max_depth, glob pattern (e.g. '*.py'), details (size, mtime).",
+    {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string"},
+            "recursive": {"type": "boolean"},
+            "max_depth": {"type": "integer"},
+            "pattern": {"type": "string", "description": "Glob matched against the relative path or file name"},
+            "details": {"type": "boolean", "description": "Include size and modification time"},
+            "limit": {"type": "integer", "description": "Maximum entries to return"},
+            "all": {"type": "boolean", "description": "Include hidden and ignored entries"}
+        },
+        "required": []
+    }
+)
 async def list_directory(args) -> dict:
     """Lists files in a directory."""
-    path = args.get("path", ".")
+    path = args.get("path") or "."
     try:
-        files = str(os.listdir(path))
+        files = await asyncio.to_thread(
+            _list_directory,
+            path,
+            bool(args.get("recursive")),
+            args.get("pattern") or None,
+            bool(args.get("details")),
+            int(args.get("max_depth") or LIST_MAX_DEPTH),
+            int(args.get("limit") or LIST_MAX_ENTRIES),
+            bool(args.get("all"))
+        )
         return {"content": [{"type": "text", "text": files}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error listing directory: {str(e)}"}]}
 
-@tool("git_commit", "Commits changes to git", {"message": str})
+@tool(
+    "search_code",
+    "Searches the workspace's text files (hidden and .gitignored files excluded) from an in-memory index. "
+    "Returns 'path:line: text' matches. Much faster than grep via run_shell_command.",
+    {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "Text to find (a regex if regex=true)"},
+            "regex": {"type": "boolean"},
+            "case_sensitive": {"type": "boolean"},
+            "path": {"type": "string", "description": "Only search under this directory"},
+            "glob": {"type": "string", "description": "Only search files matching this glob, e.g. '*.py'"},
+            "max_results": {"type": "integer"}
+        },
+        "required": ["query"]
+    }
+)
+async def search_code(args) -> dict:
+    """Full-text search over the workspace using the code index."""
+    query = args["query"]
+    try:
+        matches, truncated = await asyncio.to_thread(
+            get_code_index().search,
+            query,
+            bool(args.get("regex")),
+            bool(args.get("case_sensitive")),
+            args.get("path") or None,
+            args.get("glob") or None,
+            int(args.get("max_results") or SEARCH_MAX_RESULTS)
+        )
+        if not matches:
+            return {"content": [{"type": "text", "text": f"No matches for '{query}'."}]}
+        header = f"{len(matches)} matching lines" + (" (more exist; narrow with path, glob or a longer query)" if truncated else "")
+        lines = "\n".join(f"{path}:{line}: {text}" for path, line, text in matches)
+        return {"content": [{"type": "text", "text": f"{header}:\n{lines}"}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error searching code: {str(e)}"}]}
+
+@tool(
+    "find_symbol",
+    "Finds where classes, functions, methods and variables are defined in the workspace.",
+    {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "description": "Symbol name (partial names match unless exact=true)"},
+            "kind": {"type": "string", "enum": ["class", "function", "method", "variable", "interface", "type", "enum"]},
+            "exact": {"type": "boolean"}
+        },
+        "required": ["name"]
+    }
+)
+async def find_symbol(args) -> dict:
+    """Looks up symbol definitions in the code index."""
+    name = args["name"]
+    try:
+        symbols = await asyncio.to_thread(get_code_index().find_symbol, name, args.get("kind") or None, bool(args.get("exact")))
+        if not symbols:
+            return {"content": [{"type": "text", "text": f"No symbol matching '{name}'."}]}
+        lines = "\n".join(f"{s.path}:{s.line} {s.kind} {s.qualname}" for s in symbols)
+        return {"content": [{"type": "text", "text": lines}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error finding symbol: {str(e)}"}]}
+
+@tool(
+    "git_commit",
+    "Records a checkpoint of the workspace (all files, tracked or not) that git_reset can return to. "
+    "Checkpoints are kept under refs/agent/<thread>/<n>; the branch, HEAD and index are not touched.",
+    {"message": str}
+)
 async def git_commit(args) -> dict:
-    """Commits changes to git."""
+    """Records a workspace checkpoint for the current thread."""
     message = args["message"]
     try:
-        subprocess.run("git add .", shell=True, check=True)
-        subprocess.run(f'git commit -m "{message}"', shell=True, check=True)
-        return {"content": [{"type": "text", "text": f"Successfully committed with message: {message}"}]}
+        checkpoint = await get_snapshot_store().checkpoint(base_thread_id(current_thread_id()), message=message)
+        if not checkpoint["created"]:
+            return {"content": [{"type": "text", "text": f"No changes since checkpoint {checkpoint['n']}."}]}
+        return {"content": [{"type": "text", "text": f"Created checkpoint {checkpoint['n']} ({checkpoint['commit'][:12]}): {message}"}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error committing: {str(e)}"}]}
 
-@tool("git_reset", "Resets git to previous commit", {"hard": bool})
+@tool(
+    "git_reset",
+    "Restores the workspace to a checkpoint made by git_commit (default: the latest one). "
+    "The checkpoints recorded automatically around each run and the one taken before a reset are only restored by number. "
+    "The current state is checkpointed first, so the reset can be undone by passing that checkpoint's number.",
+    {
+        "type": "object",
+        "properties": {
+            "checkpoint": {"type": "integer", "description": "Checkpoint number to restore (default: the latest git_commit checkpoint)"}
+        }
+    }
+)
 async def git_reset(args) -> dict:
-    """Resets git to previous commit."""
-    hard = args.get("hard", False)
+    """Restores the workspace to one of the current thread's checkpoints."""
     try:
-        cmd = "git reset --hard HEAD~1" if hard else "git reset HEAD~1"
-        subprocess.run(cmd, shell=True, check=True)
-        return {"content": [{"type": "text", "text": "Successfully reset to previous commit."}]}
+        result = await get_snapshot_store().restore(base_thread_id(current_thread_id()), args.get("checkpoint"))
+        restored = result["restored"]
+        return {"content": [{"type": "text", "text": (
+            f"Restored checkpoint {restored['n']} ({restored['message']}); {result['files_changed']} files changed. "
+            f"The previous state is checkpoint {result['previous']['n']}."
+        )}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error resetting: {str(e)}"}]}
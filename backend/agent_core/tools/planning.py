@@ -1,12 +1,42 @@
 from claude_agent_sdk import tool
 from typing import List
-from duckduckgo_search import DDGS
+from agent_core.core.plan import PlanError, normalize_plan, waves
+from agent_core.core.session import current_thread_id, tool_outbox
+from agent_core.tools.search import search_service
 
-@tool("create_plan", "Creates a structured plan of tasks", {"tasks": list})
+@tool(
+    "create_plan",
+    "Creates a plan of tasks for the Editors. Independent tasks run in parallel; "
+    "list the files each task writes and the ids of tasks it depends on.",
+    {
+        "type": "object",
+        "properties": {
+            "tasks": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "description": "Short unique task id"},
+                        "description": {"type": "string", "description": "What the Editor should do"},
+                        "files": {"type": "array", "items": {"type": "string"}, "description": "Files the task writes"},
+                        "depends_on": {"type": "array", "items": {"type": "string"}, "description": "Ids of tasks that must finish first"}
+                    },
+                    "required": ["description"]
+                }
+            }
+        },
+        "required": ["tasks"]
+    }
+)
 async def create_plan(args) -> dict:
-    """Creates a structured plan of tasks."""
-    tasks = args["tasks"]
-    return {"content": [{"type": "text", "text": f"Plan created with {len(tasks)} tasks."}]}
+    """Creates a structured plan of tasks (a dependency DAG) for the graph to dispatch."""
+    try:
+        plan = normalize_plan(args["tasks"])
+    except PlanError as e:
+        return {"content": [{"type": "text", "text": f"Invalid plan: {str(e)}"}]}
+    tool_outbox.put(current_thread_id(), "plan", plan)
+    stages = "\n".join(f"Stage {i + 1}: {', '.join(level)}" for i, level in enumerate(waves(plan)))
+    return {"content": [{"type": "text", "text": f"Plan created with {len(plan)} tasks.\n{stages}"}]}
 
 @tool("delegate_task", "Delegates a specific task to a sub-agent", {"agent_name": str, "task_description": str})
 async def delegate_task(args) -> dict:
@@ -17,25 +47,38 @@ async def delegate_task(args) -> dict:
 
 @tool("search_web", "Searches the web for documentation or information", {"query": str})
 async def search_web(args) -> dict:
-    """Searches the web for documentation or information using DuckDuckGo."""
+    """Searches the web for documentation or information (cached, coalesced and rate limited)."""
     query = args["query"]
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=3))
-        
+        results = await search_service.search(query, max_results=3)
+
         formatted_results = "\n".join([f"- {r['title']}: {r['body']} ({r['href']})" for r in results])
         return {"content": [{"type": "text", "text": f"Search results for '{query}':\n{formatted_results}"}]}
     except Exception as e:
         return {"content": [{"type": "text", "text": f"Error searching web: {str(e)}"}]}
 
-@tool("report_status", "Reports the status of the current task", {"status": str, "details": str})
+@tool(
+    "report_status",
+    "Reports the status of the current task",
+    {
+        "type": "object",
+        "properties": {
+            "status": {"type": "string", "enum": ["success", "failure"]},
+            "details": {"type": "string", "description": "Description of the outcome or error"}
+        },
+        "required": ["status", "details"]
+    }
+)
 async def report_status(args) -> dict:
     """
     Reports the status of the current task.
     status: 'success' or 'failure'
     details: Description of the outcome or error.
     """
-    status = args["status"]
+    status = str(args["status"]).strip().lower()
     details = args["details"]
-    # This tool's output will be used by the graph to decide the next step
+    if status not in ("success", "failure"):
+        return {"content": [{"type": "text", "text": f"Invalid status '{status}': use 'success' or 'failure'."}]}
+    # The graph reads this structured report (not the text) to decide the next step.
+    tool_outbox.put(current_thread_id(), "status", {"status": status, "details": details})
     return {"content": [{"type": "text", "text": f"STATUS_REPORT: {status} - {details}"}]}
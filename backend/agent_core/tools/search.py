@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+SEARCH_BACKEND = os.environ.get("AGENT_SEARCH_BACKEND", "duckduckgo")
+SEARCH_CACHE_DB = os.environ.get("AGENT_SEARCH_CACHE_DB", os.path.join(".agent", "search_cache.sqlite"))
+SEARCH_CACHE_TTL = float(os.environ.get("AGENT_SEARCH_CACHE_TTL", "86400"))
+SEARCH_CACHE_SIZE = int(os.environ.get("AGENT_SEARCH_CACHE_SIZE", "512"))
+SEARCH_MIN_INTERVAL = float(os.environ.get("AGENT_SEARCH_MIN_INTERVAL", "1.0"))
+SEARCH_LOCAL_DIR = os.environ.get("AGENT_SEARCH_LOCAL_DIR", "docs")
+MAX_RETRIES = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+Result = Dict[str, str]
+
+
+class RateLimited(Exception):
+    """Raised by backends when the provider asks us to slow down."""
+
+
+class SearchBackend:
+    """A search provider. search() is synchronous and runs in a worker thread."""
+
+    name = "base"
+    min_interval = SEARCH_MIN_INTERVAL
+
+    def search(self, query: str, max_results: int) -> List[Result]:
+        raise NotImplementedError
+
+
+class DuckDuckGoBackend(SearchBackend):
+    name = "duckduckgo"
+
+    def search(self, query: str, max_results: int) -> List[Result]:
+        from duckduckgo_search import DDGS
+        from duckduckgo_search.exceptions import RatelimitException
+
+        try:
+            with DDGS() as ddgs:
+                results = ddgs.text(query, max_results=max_results) or []
+        except RatelimitException as e:
+            raise RateLimited(str(e))
+        return [{"title": r.get("title", ""), "body": r.get("body", ""), "href": r.get("href", "")} for r in results]
+
+
+class LocalBackend(SearchBackend):
+    """
+    Offline stand-in: ranks local documents by query term overlap.
+
+    Indexes .md/.txt/.rst files under root, plus .jsonl files whose lines are
+    {"title", "body", "href"} records (handy as fixtures for offline tests).
+    """
+
+    name = "local"
+    min_interval = 0.0
+
+    def __init__(self, root: str = SEARCH_LOCAL_DIR):
+        self.root = root
+        self._docs: Optional[List[Result]] = None
+
+    def _load(self) -> List[Result]:
+        docs = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if filename.endswith(".jsonl"):
+                        with open(path, encoding="utf-8") as f:
+                            docs.extend(json.loads(line) for line in f if line.strip())
+                    elif filename.endswith((".md", ".txt", ".rst")):
+                        with open(path, encoding="utf-8", errors="replace") as f:
+                            text = f.read()
+                        title = next((line.lstrip("# ").strip() for line in text.splitlines() if line.strip()), filename)
+                        docs.append({"title": title, "body": text, "href": path})
+                except (OSError, ValueError):
+                    continue
+        return docs
+
+    def search(self, query: str, max_results: int) -> List[Result]:
+        if self._docs is None:
+            self._docs = self._load()
+        terms = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for doc in self._docs:
+            words = re.findall(r"\w+", (doc.get("title", "") + " " + doc.get("body", "")).lower())
+            score = sum(1 for w in words if w in terms)
+            if score:
+                scored.append((score, doc))
+        scored.sort(key=lambda item: -item[0])
+        return [
+            {"title": doc.get("title", ""), "body": " ".join(doc.get("body", "").split())[:300], "href": doc.get("href", "")}
+            for _, doc in scored[:max_results]
+        ]
+
+
+BACKENDS = {"duckduckgo": DuckDuckGoBackend, "local": LocalBackend}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    TTL cache of search results: an in-memory LRU in front of a SQLite table,
+    so results survive restarts and are shared by every thread.
+    """
+
+    def __init__(self, path: str = SEARCH_CACHE_DB, ttl: float = SEARCH_CACHE_TTL, size: int = SEARCH_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.size = size
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use so importing the tools has no filesystem side effects.
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, results TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get_memory(self, key: str) -> Optional[List[Result]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, results = entry
+            if time.time() - created_at > self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return results
+
+    def _remember(self, key: str, created_at: float, results: List[Result]):
+        with self._lock:
+            self._memory[key] = (created_at, results)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    def get_disk(self, key: str) -> Optional[List[Result]]:
+        with self._lock:
+            row = self._db().execute("SELECT results, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        results = json.loads(row[0])
+        self._remember(key, row[1], results)
+        return results
+
+    def put(self, key: str, results: List[Result]):
+        now = time.time()
+        self._remember(key, now, results)
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO search_cache (key, results, created_at) VALUES (?, ?, ?)", (key, json.dumps(results), now))
+            db.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl,))
+            db.commit()
+
+
+class SearchService:
+    """
+    search_web's engine: cache lookups, single-flight coalescing of identical
+    in-flight queries, and per-backend rate limiting with exponential backoff.
+    Backend calls run in a worker thread so the event loop never blocks.
+    """
+
+    def __init__(self, backend: Optional[SearchBackend] = None, cache: Optional[SearchCache] = None):
+        self.backend = backend or BACKENDS.get(SEARCH_BACKEND, DuckDuckGoBackend)()
+        self.cache = cache or SearchCache()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._next_call = 0.0
+        self._backoff = 0.0
+        self.metrics = {"queries": 0, "memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0, "errors": 0, "rate_limited": 0}
+
+    async def search(self, query: str, max_results: int = 3) -> List[Result]:
+        self.metrics["queries"] += 1
+        key = f"{self.backend.name}:{max_results}:{normalize_query(query)}"
+        results = self.cache.get_memory(key)
+        if results is not None:
+            self.metrics["memory_hits"] += 1
+            return results
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.metrics["coalesced"] += 1
+        else:
+            # The lookup runs in its own task: a caller that is cancelled stops waiting,
+            # but neither the fetch nor the other callers waiting on it are cancelled.
+            task = asyncio.create_task(self._load(key, query, max_results))
+            self._inflight[key] = task
+            task.add_done_callback(self._finished(key))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str):
+        def done(task: asyncio.Task):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Callers may all have gone; don't warn about an unretrieved exception.
+            if not task.cancelled():
+                task.exception()
+        return done
+
+    async def _load(self, key: str, query: str, max_results: int) -> List[Result]:
+        results = await asyncio.to_thread(self.cache.get_disk, key)
+        if results is not None:
+            self.metrics["disk_hits"] += 1
+            return results
+        self.metrics["misses"] += 1
+        results = await self._fetch(query, max_results)
+        await asyncio.to_thread(self.cache.put, key, results)
+        return results
+
+    async def _throttle(self):
+        if self._rate_lock is None:
+            self._rate_lock = asyncio.Lock()
+        async with self._rate_lock:
+            delay = self._next_call - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_call = time.monotonic() + max(self.backend.min_interval, self._backoff)
+
+    async def _fetch(self, query: str, max_results: int) -> List[Result]:
+        for attempt in range(MAX_RETRIES):
+            await self._throttle()
+            try:
+                results = await asyncio.to_thread(self.backend.search, query, max_results)
+                self._backoff = 0.0
+                return results
+            except RateLimited:
+                self.metrics["rate_limited"] += 1
+                self._backoff = min(BACKOFF_MAX, max(self._backoff * 2, BACKOFF_BASE))
+                self._next_call = max(self._next_call, time.monotonic() + self._backoff)
+                if attempt == MAX_RETRIES - 1:
+                    self.metrics["errors"] += 1
+                    raise
+            except Exception:
+                self.metrics["errors"] += 1
+                raise
+        return []
+
+    def stats(self) -> dict:
+        queries = self.metrics["queries"]
+        hits = self.metrics["memory_hits"] + self.metrics["disk_hits"] + self.metrics["coalesced"]
+        return {
+            **self.metrics,
+            "backend": self.backend.name,
+            "hit_ratio": hits / queries if queries else 0.0,
+            "backoff_seconds": self._backoff
+        }
+
+
+search_service = SearchService()
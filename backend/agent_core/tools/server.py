@@ -1,25 +1,66 @@
-from claude_agent_sdk import create_sdk_mcp_server
-from agent_core.tools.filesystem import read_file, write_file, run_shell_command, list_directory, git_commit, git_reset
-from agent_core.tools.browser import open_url, click_element, fill_form, take_screenshot, get_page_content
+from dataclasses import replace
+from functools import lru_cache
+from typing import List, Optional
+from claude_agent_sdk import SdkMcpTool, create_sdk_mcp_server
+from agent_core.core.metrics import traced
+from agent_core.tools.filesystem import (
+    read_file, read_files, write_file, write_files, run_shell_command, list_directory,
+    search_code, find_symbol, git_commit, git_reset
+)
+from agent_core.tools.browser import (
+    open_url, click_element, fill_form, take_screenshot, compare_screenshot, get_page_content, run_browser_script
+)
 from agent_core.tools.planning import create_plan, delegate_task, search_web, report_status
+from agent_core.tools.testing import run_affected_tests
 
+FILESYSTEM_TOOLS = [
+    read_file, read_files, write_file, write_files, run_shell_command, list_directory,
+    search_code, find_symbol, git_commit, git_reset
+]
+BROWSER_TOOLS = [
+    open_url, click_element, fill_form, take_screenshot, compare_screenshot, get_page_content, run_browser_script
+]
+PLANNING_TOOLS = [create_plan, delegate_task, search_web, report_status]
+TESTING_TOOLS = [run_affected_tests]
+TOOLS_BY_NAME = {t.name: t for t in FILESYSTEM_TOOLS + BROWSER_TOOLS + PLANNING_TOOLS + TESTING_TOOLS}
+
+def instrument(tools: List[SdkMcpTool]) -> List[SdkMcpTool]:
+    """Times every call of each tool as a span (a no-op when metrics are disabled)."""
+    return [replace(t, handler=traced("tool", t.name)(t.handler)) for t in tools]
+
+def find_tool(name: str) -> Optional[SdkMcpTool]:
+    """A tool by its bare ("write_file") or MCP ("mcp__filesystem__write_file") name."""
+    return TOOLS_BY_NAME.get(name.rsplit("__", 1)[-1])
+
+# Built once, on the first agent that needs it; agents sharing a server share the instance.
+@lru_cache(maxsize=None)
 def get_filesystem_server():
     return create_sdk_mcp_server(
         name="filesystem-tools",
         version="1.0.0",
-        tools=[read_file, write_file, run_shell_command, list_directory, git_commit, git_reset]
+        tools=instrument(FILESYSTEM_TOOLS)
     )
 
+@lru_cache(maxsize=None)
 def get_browser_server():
     return create_sdk_mcp_server(
         name="browser-tools",
         version="1.0.0",
-        tools=[open_url, click_element, fill_form, take_screenshot, get_page_content]
+        tools=instrument(BROWSER_TOOLS)
     )
 
+@lru_cache(maxsize=None)
 def get_planning_server():
     return create_sdk_mcp_server(
         name="planning-tools",
         version="1.0.0",
-        tools=[create_plan, delegate_task, search_web, report_status]
+        tools=instrument(PLANNING_TOOLS)
+    )
+
+@lru_cache(maxsize=None)
+def get_testing_server():
+    return create_sdk_mcp_server(
+        name="testing-tools",
+        version="1.0.0",
+        tools=instrument(TESTING_TOOLS)
     )
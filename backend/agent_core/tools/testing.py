@@ -0,0 +1,101 @@
+from claude_agent_sdk import tool
+import asyncio
+import os
+from agent_core.core.impact import impact_selector, outcome
+from agent_core.core.session import base_thread_id, current_thread_id, emit_tool_event
+from agent_core.core.snapshots import get_snapshot_store
+
+# Passing modules are listed one by one up to this many; beyond it they are summarized.
+LIST_PASSED_MODULES = 20
+LIST_UNMAPPED = 10
+
+def _counts(module: dict) -> str:
+    parts = [f"{module[key]} {key}" for key in ("passed", "failed", "errors", "skipped") if module[key]]
+    return ", ".join(parts) or "no tests"
+
+@tool(
+    "run_affected_tests",
+    "Runs only the tests affected by the changes since the last git_commit checkpoint (or by the given paths): "
+    "test modules that import a changed file, directly or through other modules, or that executed it in recorded "
+    "coverage data. They run in parallel pytest processes and results stream as they finish. "
+    "Use dry_run to see the selection and why each module was picked.",
+    {
+        "type": "object",
+        "properties": {
+            "paths": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Changed files (default: the diff since the last checkpoint)"
+            },
+            "checkpoint": {"type": "integer", "description": "Checkpoint number to diff against"},
+            "dry_run": {"type": "boolean", "description": "Only list the selected test modules"},
+            "pytest_args": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Extra pytest arguments, e.g. [\"-x\"] or [\"-k\", \"login\"]"
+            }
+        },
+        "required": []
+    }
+)
+async def run_affected_tests(args) -> dict:
+    """Selects the test modules affected by recent changes and runs them in parallel."""
+    try:
+        if args.get("paths"):
+            changed = [os.path.relpath(os.path.abspath(path)).replace(os.sep, "/") for path in args["paths"]]
+            source = f"{len(changed)} given file(s)"
+        else:
+            diff = await get_snapshot_store().diff(base_thread_id(current_thread_id()), args.get("checkpoint"))
+            changed = [change["path"] for change in diff["changes"]]
+            source = f"{len(changed)} file(s) changed since checkpoint {diff['checkpoint']['n']}"
+            if not changed:
+                return {"content": [{"type": "text", "text": f"No changes since checkpoint {diff['checkpoint']['n']}; no tests to run."}]}
+
+        selection = await asyncio.to_thread(impact_selector.select, changed)
+        tests = list(selection["tests"])
+        method = "import graph and coverage data" if selection["coverage"] else "import graph"
+        lines = [f"Selected {len(tests)} of {selection['total']} test modules for {source} ({method})."]
+        unmapped = selection["unmapped"]
+        if unmapped:
+            more = f" and {len(unmapped) - LIST_UNMAPPED} more" if len(unmapped) > LIST_UNMAPPED else ""
+            lines.append(f"Not traceable through imports: {', '.join(unmapped[:LIST_UNMAPPED])}{more}.")
+        if not tests:
+            lines.append("No test modules depend on the changed files.")
+            return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+        if args.get("dry_run"):
+            lines += [f"- {test} ({reason})" for test, reason in selection["tests"].items()]
+            return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+
+        emit_tool_event({"type": "tests", "phase": "selected", "modules": tests})
+
+        def on_result(module: dict):
+            emit_tool_event({
+                "type": "tests",
+                "phase": "result",
+                "module": module["path"],
+                "outcome": outcome(module),
+                **{key: module[key] for key in ("passed", "failed", "errors", "skipped", "seconds")}
+            })
+
+        result = await impact_selector.run(tests, extra_args=list(args.get("pytest_args") or []), on_result=on_result)
+        modules = result["modules"]
+        totals = {key: sum(module[key] for module in modules) for key in ("passed", "failed", "errors", "skipped")}
+        bad = [module for module in modules if outcome(module) not in ("passed", "skipped")]
+        emit_tool_event({"type": "tests", "phase": "done", "seconds": result["seconds"], **totals})
+
+        lines.append(
+            f"{'FAILED' if bad else 'PASSED'}: {_counts(totals)} in {result['seconds']:.1f}s "
+            f"(shards: {result['shards']}, workers: {result['workers']})."
+        )
+        listed = modules if len(modules) <= LIST_PASSED_MODULES else bad
+        for module in listed:
+            lines.append(
+                f"{outcome(module).upper():8}{module['path']} ({_counts(module)}, {module['seconds']:.1f}s) "
+                f"- {selection['tests'][module['path']]}"
+            )
+            lines += [f"    {failure}" for failure in module["failures"]]
+        if len(listed) < len(modules):
+            lines.append(f"... and {len(modules) - len(listed)} more modules without failures.")
+        return {"content": [{"type": "text", "text": "\n".join(lines)}]}
+    except Exception as e:
+        return {"content": [{"type": "text", "text": f"Error running affected tests: {str(e)}"}]}
@@ -1,172 +1,576 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from agent_core.graph.workflow import app as graph_app
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse, JSONResponse
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from agent_core.graph.workflow import app as graph_app, memory as checkpointer
+from agent_core.core.checkpoint import run_compaction
+from agent_core.core.cluster import WORKER_COUNT, WORKER_ID, is_primary
+from agent_core.core.llm import route_metrics
+from agent_core.core.metrics import registry as metrics_registry, span, sse_bytes_total, sse_events_total
+from agent_core.core.registry import AGENT_NAMES, PREWARM, components
+from agent_core.core.response_cache import response_cache
+from agent_core.core.screenshots import ScreenshotError, screenshot_store
 from agent_core.core.state import AgentState
+from agent_core.core.workspace import get_workspace_index
+from agent_core.core.code_index import get_code_index
+from agent_core.core.runs import SchedulerFull, ThreadBusy, run_scheduler
+from agent_core.core.snapshots import SnapshotError, get_snapshot_store
+from agent_core.core.impact import impact_selector
+from agent_core.tools.search import search_service
+from agent_core.core.files import (
+    VersionConflict, apply_byte_edits, atomic_write, atomic_write_async,
+    content_hash, file_version, iter_range, parse_range, read_cache, same_content
+)
 from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.checkpoint.memory import MemorySaver
 import uuid
 import os
+import sys
 import json
+import asyncio
+import base64
+import mimetypes
 import re
 
 app = FastAPI(title="Claude Code Agent SDK API")
 
+@app.on_event("startup")
+async def start_background_jobs():
+    if WORKER_COUNT > 1 and isinstance(checkpointer, MemorySaver):
+        raise RuntimeError("AGENT_CHECKPOINTER=memory cannot be shared between API workers; use sqlite")
+    if is_primary():
+        # One compaction job per deployment, not one per worker.
+        app.state.compaction_task = asyncio.create_task(run_compaction(checkpointer))
+    get_workspace_index()
+    if os.environ.get("CODE_INDEX_PREWARM", "1") == "1":
+        # Build the search index in the background so the first search_code is fast.
+        asyncio.create_task(asyncio.to_thread(get_code_index().refresh))
+    # Agents, tool servers and the browser are built on first use; build the usual
+    # ones in the background so the first run doesn't pay for it.
+    prewarm = PREWARM + (["browser"] if os.environ.get("BROWSER_PREWARM", "0") == "1" else [])
+    app.state.prewarm_task = asyncio.create_task(components.warm_up(prewarm))
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await run_scheduler.shutdown()
+    browser = loaded_browser()
+    if browser is not None:
+        await browser.close()
+
+def loaded_browser():
+    """The browser pool, or None if no browser tool was ever imported (importing them pulls in Playwright)."""
+    if "agent_core.tools.browser" not in sys.modules:
+        return None
+    return components.get("browser")
+
+async def release_run_browser(run):
+    """Frees the finished run's browser contexts; the next run of the thread reopens its pages."""
+    browser = loaded_browser()
+    if browser is not None:
+        await browser.release(run.thread_id)
+
+run_scheduler.add_listener(release_run_browser)
+
 class ChatRequest(BaseModel):
     message: str
     mode: str = "autonomy"
-    thread_id: str = str(uuid.uuid4())
+    thread_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
 class FileSaveRequest(BaseModel):
     path: str
     content: str
+    base_version: Optional[str] = None
+
+class FileEdit(BaseModel):
+    offset: int
+    length: int
+    text: Optional[str] = None
+    data: Optional[str] = None  # base64, for binary replacements
+
+class FilePatchRequest(BaseModel):
+    path: str
+    edits: List[FileEdit]
+    base_version: Optional[str] = None
+
+KEEPALIVE_INTERVAL = 15.0
+MAX_INLINE_SIZE = 5 * 1024 * 1024
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def serialize_message(msg) -> dict:
+    """Serializes a single message into the compact SSE schema."""
+    content = msg.content if hasattr(msg, "content") else str(msg)
+    return {
+        "id": getattr(msg, "id", None),
+        "role": getattr(msg, "type", "ai"),
+        "content": content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+    }
 
 def extract_content_from_event(event_value):
-    """从事件值中提取消息内容"""
-    try:
-        value_str = str(event_value)
-        
-        # 尝试直接提取 AIMessage content
-        aimessage_match = re.search(r"AIMessage\(content='([^']*)'", value_str)
-        if aimessage_match:
-            content = aimessage_match.group(1)
-            # 解码转义字符
-            content = content.replace('\\n', '\n').replace('\\"', '"').replace("\\'", "'")
-            return content
-        
-        # 尝试从 messages 数组中提取
-        if 'messages' in event_value and isinstance(event_value['messages'], list):
-            for msg in event_value['messages']:
-                if hasattr(msg, 'content'):
-                    return msg.content
-        
-        return value_str
-    except Exception:
-        return str(event_value)
-
-async def generate_events(request, use_post=True):
-    """生成 SSE 事件流"""
+    """Serializes only the messages a node update appended (not the whole state)."""
+    if not isinstance(event_value, dict):
+        return []
+    return [
+        serialize_message(msg)
+        for msg in event_value.get("messages") or []
+        if getattr(msg, "type", None) != "remove"
+    ]
+
+def format_sse(data: dict, event_id: Optional[int] = None) -> str:
+    payload = f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+    return payload if event_id is None else f"id: {event_id}\n{payload}"
+
+async def with_keepalive(stream, interval: float = KEEPALIVE_INTERVAL):
+    """Yields items from stream, or None whenever it stays silent for `interval` seconds."""
+    iterator = stream.__aiter__()
+    pending = None
     try:
-        async for event in graph_app.astream(request["inputs"], config=request["config"]):
-            for key, value in event.items():
-                content = extract_content_from_event(value)
-                event_data = {
-                    "node": key,
-                    "content": content
-                }
-                yield f"data: {json.dumps(event_data)}\n\n"
-        yield f"data: {json.dumps({'type': 'end'})}\n\n"
-    except Exception as e:
-        error_data = {
-            "type": "error",
-            "message": str(e)
-        }
-        yield f"data: {json.dumps(error_data)}\n\n"
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            task, pending = pending, None
+            try:
+                item = task.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    """
-    Endpoint to interact with the Multi-Agent System.
-    """
+async def graph_events(inputs: dict, config: dict):
+    """Runs the graph and yields its events (agent text deltas, status, node messages)."""
+    thread_id = config["configurable"]["thread_id"]
+    yield {"type": "start", "thread_id": thread_id}
+    with span("run", inputs.get("mode") or "autonomy", thread_id=thread_id):
+        stream = graph_app.astream(inputs, config=config, stream_mode=["updates", "custom"])
+        async for mode, chunk in stream:
+            if mode == "custom":
+                yield chunk
+                continue
+            for node, update in chunk.items():
+                for message in extract_content_from_event(update):
+                    yield {"type": "message", "node": node, **message}
+    yield {"type": "end"}
+
+async def stream_run(run, after: int = 0):
+    """SSE view of a run's event log. Disconnecting only ends this subscription, not the run."""
+    async for item in with_keepalive(run.events.subscribe(after), KEEPALIVE_INTERVAL):
+        if item is None:
+            yield ": keep-alive\n\n"
+            continue
+        seq, event = item
+        data = format_sse(event, event_id=seq)
+        sse_events_total.inc()
+        sse_bytes_total.inc(len(data.encode("utf-8")))
+        yield data
+
+def submit_run(request: Request, message: str, mode: str, thread_id: str):
+    """Queues a graph run for the thread on the background scheduler."""
     config = {
-        "configurable": {"thread_id": request.thread_id},
+        "configurable": {"thread_id": thread_id},
         "recursion_limit": 100
     }
-    
+
     inputs = {
-        "messages": [HumanMessage(content=request.message)],
-        "mode": request.mode,
+        "messages": [HumanMessage(content=message)],
+        "mode": mode,
         "iteration_count": 0
     }
-    
-    request_data = {"inputs": inputs, "config": config}
-    
-    return StreamingResponse(
-        generate_events(request_data),
-        media_type="text/event-stream"
-    )
+
+    try:
+        return run_scheduler.submit(
+            thread_id,
+            lambda: graph_events(inputs, config),
+            tenant=request.headers.get("x-tenant-id", "default"),
+            meta={"mode": mode}
+        )
+    except ThreadBusy as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "run_id": e.run.id})
+    except SchedulerFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+@app.post("/chat")
+async def chat(body: ChatRequest, request: Request):
+    """
+    Endpoint to interact with the Multi-Agent System.
+
+    Starts a background run and streams its events. The run outlives this
+    connection; resume it with /runs/{run_id}/events.
+    """
+    run = submit_run(request, body.message, body.mode, body.thread_id)
+    return StreamingResponse(stream_run(run), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.get("/chat")
 async def chat_get(
+    request: Request,
     message: str = Query(..., description="The user message"),
     mode: str = Query("autonomy", description="The work mode"),
-    thread_id: str = Query(str(uuid.uuid4()), description="Thread ID")
+    thread_id: Optional[str] = Query(None, description="Thread ID (a new thread if omitted)")
 ):
     """
     Endpoint to interact with the Multi-Agent System (GET for SSE).
     """
-    config = {
-        "configurable": {"thread_id": thread_id},
-        "recursion_limit": 100
-    }
-    
-    inputs = {
-        "messages": [HumanMessage(content=message)],
-        "mode": mode,
-        "iteration_count": 0
-    }
-    
-    request_data = {"inputs": inputs, "config": config}
-    
-    return StreamingResponse(
-        generate_events(request_data),
-        media_type="text/event-stream"
-    )
+    run = submit_run(request, message, mode, thread_id or str(uuid.uuid4()))
+    return StreamingResponse(stream_run(run), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# --- Run APIs ---
+
+@app.post("/runs", status_code=202)
+async def create_run(body: ChatRequest, request: Request):
+    """
+    Queues a run without streaming it; follow it with /runs/{run_id}/events.
+    """
+    return submit_run(request, body.message, body.mode, body.thread_id).to_dict()
+
+@app.get("/runs")
+def list_runs(thread_id: Optional[str] = None):
+    """
+    Runs known to this worker (active ones and those finished recently), optionally for one thread.
+    """
+    return [run.to_dict() for run in run_scheduler.list(thread_id)]
+
+@app.get("/runs/stats")
+def run_stats():
+    """
+    Scheduler metrics: running and queued runs, rejections and queue wait time.
+    """
+    return run_scheduler.stats()
+
+def get_run_or_404(run_id: str):
+    run = run_scheduler.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str):
+    return get_run_or_404(run_id).to_dict()
+
+@app.get("/runs/{run_id}/events")
+async def run_events(
+    run_id: str,
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Streams a run's events from the start, or after Last-Event-ID when resuming.
+    Any number of clients can follow the same run.
+    """
+    run = get_run_or_404(run_id)
+    after = last_event_id
+    if after is None and last_event_id_header and last_event_id_header.isdigit():
+        after = int(last_event_id_header)
+    return StreamingResponse(stream_run(run, after or 0), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    """
+    Cancels a queued or running run. Finished runs are returned unchanged.
+    """
+    run = get_run_or_404(run_id)
+    run_scheduler.cancel(run_id)
+    if run.task is not None and not run.task.done():
+        # Let the graph unwind (agent processes are killed) before reporting.
+        await asyncio.wait({run.task}, timeout=10)
+    return run.to_dict()
+
+def route_metric_families():
+    """Per-route model stats as labeled gauges."""
+    names = ("calls", "latency_seconds", "tokens", "cost_usd")
+    families = {name: [] for name in names}
+    for row in route_metrics.snapshot():
+        labels = {"route": row["route"], "agent": row["agent"], "model": row["model"]}
+        for name in names:
+            families[name].append(("", labels, row[name]))
+    return [(f"agent_route_{name}", "gauge", f"Model routing totals: {name}", samples) for name, samples in families.items()]
+
+def loaded_browser_stats() -> dict:
+    browser = loaded_browser()
+    return browser.stats() if browser is not None else {}
+
+def session_pool_stats(name: str) -> dict:
+    """Session pool stats of an agent; empty until the agent is built."""
+    agent = components.peek(name)
+    if agent is None or agent.session_pool is None:
+        return {}
+    return agent.session_pool.stats
+
+metrics_registry.register_stats("browser", loaded_browser_stats)
+metrics_registry.register_stats("search", search_service.stats)
+metrics_registry.register_stats("response_cache", response_cache.stats)
+metrics_registry.register_stats("read_cache", read_cache.stats)
+metrics_registry.register_stats("runs", run_scheduler.stats)
+metrics_registry.register_stats("code_index", lambda: get_code_index().stats())
+metrics_registry.register_stats("snapshots", lambda: get_snapshot_store().stats())
+metrics_registry.register_stats("screenshots", screenshot_store.stats)
+metrics_registry.register_stats("affected_tests", impact_selector.stats)
+metrics_registry.register_stats("components", components.stats)
+for _name in AGENT_NAMES:
+    metrics_registry.register_stats("session_pool", lambda name=_name: session_pool_stats(name), {"agent": _name})
+metrics_registry.register_collector(route_metric_families)
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics: span durations per node/agent/tool, CLI spawn and first
+    token latency, tokens, SSE traffic, and browser/pool/cache/scheduler stats.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "version": "0.1.0"}
+    return {"status": "healthy", "version": "0.1.0", "worker": WORKER_ID, "workers": WORKER_COUNT}
+
+@app.get("/browser/stats")
+def browser_stats():
+    """
+    Browser pool metrics: launches, lease wait times and context reuse ratio.
+    """
+    return loaded_browser_stats()
+
+@app.get("/search/stats")
+def search_stats():
+    """
+    search_web metrics: cache hits (memory/disk/coalesced), misses, rate limiting and hit ratio.
+    """
+    return search_service.stats()
+
+@app.get("/responses/stats")
+def response_cache_stats():
+    """
+    Agent response cache metrics: lookups, memory/disk hits, stored and uncacheable turns.
+    """
+    return response_cache.stats()
+
+@app.get("/responses")
+def list_cached_responses(agent: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Recorded agent turns, newest first. Each is a list of steps that
+    benchmarks/fake_agent.py --fixtures can replay offline.
+    """
+    return response_cache.export(agent, limit)
+
+@app.delete("/responses")
+def clear_cached_responses():
+    return {"removed": response_cache.clear()}
+
+@app.get("/screenshots/stats")
+def screenshot_stats():
+    """
+    Screenshot store metrics: captures, exact/near duplicates, bytes saved, previews, diffs and evictions.
+    """
+    return screenshot_store.stats()
+
+@app.get("/screenshots/{shot_id}")
+def get_screenshot(shot_id: str, preview: bool = False):
+    """
+    A stored screenshot as PNG, or its downscaled preview.
+    """
+    if not re.fullmatch(r"[0-9a-f]{16}", shot_id) or screenshot_store.get(shot_id) is None:
+        raise HTTPException(status_code=404, detail=f"Screenshot not found: {shot_id}")
+    try:
+        path = screenshot_store.preview(shot_id) if preview else screenshot_store.path(shot_id)
+        with open(path, "rb") as f:
+            data = f.read()
+    except (OSError, ScreenshotError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return Response(data, media_type=media_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/routing/stats")
+def routing_stats():
+    """
+    Model routing metrics per (route, agent, model): calls, latency, tokens and cost.
+    """
+    return route_metrics.snapshot()
+
+# --- Checkpoint APIs ---
+
+class CheckpointRequest(BaseModel):
+    message: str = "checkpoint"
+
+@app.get("/threads/{thread_id}/checkpoints")
+async def list_checkpoints(thread_id: str):
+    """
+    Workspace checkpoints recorded for a thread (refs/agent/<thread>/<n>), oldest first.
+    """
+    try:
+        return await get_snapshot_store().list(thread_id)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/threads/{thread_id}/checkpoints")
+async def create_checkpoint(thread_id: str, request: CheckpointRequest):
+    """
+    Checkpoints the workspace now. Returns the latest checkpoint if nothing changed.
+    """
+    try:
+        return await get_snapshot_store().checkpoint(thread_id, message=request.message)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/threads/{thread_id}/checkpoints/{n}")
+async def get_checkpoint(thread_id: str, n: int):
+    """
+    Files changed by checkpoint n relative to the one before it.
+    """
+    try:
+        store = get_snapshot_store()
+        checkpoint = next((c for c in await store.list(thread_id) if c["n"] == n), None)
+        if checkpoint is None:
+            raise HTTPException(status_code=404, detail=f"Checkpoint {n} not found")
+        return {**checkpoint, "changes": await store.changes(thread_id, n)}
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/threads/{thread_id}/checkpoints/{n}/restore")
+async def restore_checkpoint(thread_id: str, n: int):
+    """
+    Restores the workspace to checkpoint n; the current state is checkpointed first.
+    """
+    try:
+        return await get_snapshot_store().restore(thread_id, n)
+    except SnapshotError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 400, detail=str(e))
+
+@app.get("/checkpoints/stats")
+def checkpoint_stats():
+    """
+    Snapshot metrics: checkpoints made (incremental vs full staging), restores and last checkpoint time.
+    """
+    return get_snapshot_store().stats()
 
 # --- File System APIs ---
 
 @app.get("/files/tree")
-def get_file_tree(path: str = "."):
+def get_file_tree(
+    request: Request,
+    path: str = ".",
+    depth: int = Query(1, ge=1, description="Directory levels to expand"),
+    cursor: Optional[str] = Query(None, description="Last name of the previous page"),
+    limit: Optional[int] = Query(1000, ge=1, description="Max direct children of path per page")
+):
     """
-    Recursively gets the file tree of the current directory.
+    Gets one page of the file tree, expanding `depth` levels below `path`.
     """
-    def build_tree(dir_path):
-        tree = []
-        try:
-            items = sorted(os.listdir(dir_path))
-            for item in items:
-                if item.startswith(".") and item != ".gitignore": continue # Skip hidden files except gitignore
-                if item == "__pycache__": continue
-                if item == "node_modules": continue
-                
-                full_path = os.path.join(dir_path, item)
-                is_dir = os.path.isdir(full_path)
-                
-                node = {
-                    "name": item,
-                    "path": full_path,
-                    "type": "directory" if is_dir else "file",
-                    "children": build_tree(full_path) if is_dir else None
-                }
-                tree.append(node)
-        except PermissionError:
-            pass
-        return tree
-
-    return build_tree(path)
+    try:
+        tree, etag = get_workspace_index().tree(path, depth=depth, cursor=cursor, limit=limit)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    etag = f'"{etag}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(tree, headers={"ETag": etag})
 
 @app.get("/files/content")
 def get_file_content(path: str):
     """
-    Reads the content of a file.
+    Reads the content of a text file, with the version token used for conditional saves.
+    """
+    try:
+        version = file_version(path)
+        if version is None:
+            raise HTTPException(status_code=404, detail=f"File not found: {path}")
+        if os.path.getsize(path) > MAX_INLINE_SIZE:
+            raise HTTPException(status_code=413, detail="File too large to inline; use /files/raw")
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=415, detail="Binary file; use /files/raw")
+        return {"content": content, "version": version, "size": len(data), "hash": content_hash(data)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/files/raw")
+def get_file_raw(path: str, request: Request):
+    """
+    Streams a file's bytes. Supports single-range Range requests and ETag revalidation.
+    """
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"File not found: {path}")
+    size = os.path.getsize(path)
+    etag = f'"{file_version(path)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+
+    return StreamingResponse(
+        iter_range(path, start, end),
+        status_code=status_code,
+        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        headers=headers
+    )
+
+@app.put("/files/raw")
+async def put_file_raw(path: str, request: Request):
+    """
+    Atomically replaces a file with the streamed request body. Honors If-Match.
     """
+    expected = request.headers.get("if-match")
     try:
-        with open(path, 'r') as f:
-            return {"content": f.read()}
+        version = await atomic_write_async(path, request.stream(), expected.strip('"') if expected else None)
+        return {"status": "success", "version": version}
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.actual})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/files/save")
 def save_file(request: FileSaveRequest):
     """
-    Saves content to a file.
+    Saves content to a file atomically. Unchanged content is not rewritten.
+    """
+    try:
+        data = request.content.encode("utf-8")
+        if same_content(request.path, data):
+            return {"status": "unchanged", "version": file_version(request.path)}
+        version = atomic_write(request.path, [data], request.base_version)
+        return {"status": "success", "version": version}
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.actual})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/files/patch")
+def patch_file(request: FilePatchRequest):
+    """
+    Applies byte-range edits to a file atomically, so clients only send what changed.
     """
     try:
-        with open(request.path, 'w') as f:
-            f.write(request.content)
-        return {"status": "success"}
+        edits = []
+        for edit in request.edits:
+            data = base64.b64decode(edit.data) if edit.data is not None else (edit.text or "").encode("utf-8")
+            edits.append((edit.offset, edit.length, data))
+        if not edits:
+            return {"status": "unchanged", "version": file_version(request.path)}
+        version = apply_byte_edits(request.path, edits, request.base_version)
+        return {"status": "success", "version": version}
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.actual})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,166 @@
+"""
+Front router for the multi-worker deployment (start.sh prod).
+
+Each API worker is a separate process (app.main on its own port). This app
+forwards every request to the worker that owns its thread, so a thread's CLI
+sessions, browser pages and file locks are always in the same process. The
+thread comes from the path (/threads/{id}/...), the thread_id query parameter
+or a thread_id field in a JSON body; /chat and /runs requests without one get
+a new id here. /runs/{id} requests go to the worker executing the run (its
+id starts with the worker number). Requests without a thread go round-robin.
+If the owner is unreachable the next worker in the thread's ranking takes
+over (thread state is in the shared checkpoint database, only warm sessions
+are lost).
+
+The router is stateless, so it can itself run with several uvicorn workers.
+"""
+import itertools
+import json
+import os
+import uuid
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from agent_core.core.cluster import WORKER_COUNT, ranked_workers, worker_url
+
+MAX_SNIFF_BYTES = 64 * 1024
+CONNECT_TIMEOUT = float(os.environ.get("AGENT_ROUTER_CONNECT_TIMEOUT", "5"))
+# Headers that describe one hop, not the message; httpx/uvicorn set their own.
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade", "te", "trailer", "host", "content-length"}
+# Requests that start a run; they get a thread id here if the client sent none.
+THREAD_PATHS = {"/chat": ("GET", "POST"), "/runs": ("POST",)}
+
+app = FastAPI(title="Claude Code Agent SDK Router")
+_round_robin = itertools.cycle(range(WORKER_COUNT))
+_client: Optional[httpx.AsyncClient] = None
+
+
+@app.on_event("startup")
+async def open_client():
+    global _client
+    _client = httpx.AsyncClient(
+        # SSE responses stay open for the whole run.
+        timeout=httpx.Timeout(connect=CONNECT_TIMEOUT, read=None, write=60.0, pool=None),
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    )
+
+
+@app.on_event("shutdown")
+async def close_client():
+    if _client is not None:
+        await _client.aclose()
+
+
+def thread_from_path(path: str) -> Optional[str]:
+    parts = path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "threads":
+        return parts[1]
+    return None
+
+
+def worker_from_path(path: str) -> Optional[int]:
+    """Run ids start with the id of the worker that executes them ("<worker>-<hex>")."""
+    parts = path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "runs":
+        worker = parts[1].split("-", 1)[0]
+        if worker.isdigit() and int(worker) < WORKER_COUNT:
+            return int(worker)
+    return None
+
+
+def thread_from_body(body: bytes, content_type: str) -> Optional[str]:
+    if not body or len(body) > MAX_SNIFF_BYTES or "json" not in content_type:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    thread_id = data.get("thread_id") if isinstance(data, dict) else None
+    return thread_id if isinstance(thread_id, str) and thread_id else None
+
+
+def assign_thread(request: Request, query: str, body: bytes):
+    """Gives a run request without a thread a new one, so it can be routed (and resumed)."""
+    thread_id = str(uuid.uuid4())
+    if request.method == "GET":
+        return thread_id, urlencode(parse_qsl(query) + [("thread_id", thread_id)]), body
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        return thread_id, query, body
+    if isinstance(data, dict):
+        data["thread_id"] = thread_id
+        body = json.dumps(data).encode("utf-8")
+    return thread_id, query, body
+
+
+def candidates(thread_id: Optional[str], pinned: Optional[str], path: str):
+    if pinned is not None and pinned.isdigit() and int(pinned) < WORKER_COUNT:
+        return [int(pinned)]
+    run_worker = worker_from_path(path)
+    if run_worker is not None:
+        # Runs live in the memory of the worker that started them.
+        return [run_worker]
+    if thread_id is None:
+        first = next(_round_robin)
+        return [(first + i) % WORKER_COUNT for i in range(WORKER_COUNT)]
+    return ranked_workers(thread_id, WORKER_COUNT)
+
+
+@app.get("/cluster")
+async def cluster_status():
+    """Workers behind this router and whether each answers its health check."""
+    workers = []
+    for worker in range(WORKER_COUNT):
+        try:
+            response = await _client.get(f"{worker_url(worker)}/health", timeout=CONNECT_TIMEOUT)
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        workers.append({"worker": worker, "url": worker_url(worker), "healthy": healthy})
+    return {"workers": workers}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"])
+async def forward(path: str, request: Request):
+    body = await request.body()
+    query = request.url.query
+    thread_id = (
+        thread_from_path(request.url.path)
+        or request.query_params.get("thread_id")
+        or thread_from_body(body, request.headers.get("content-type", ""))
+    )
+    if thread_id is None and request.method in THREAD_PATHS.get(request.url.path, ()):
+        thread_id, query, body = assign_thread(request, query, body)
+
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_HEADERS]
+    if thread_id is not None:
+        headers.append(("x-agent-thread", thread_id))
+
+    for worker in candidates(thread_id, request.headers.get("x-agent-worker"), request.url.path):
+        url = f"{worker_url(worker)}{request.url.path}" + (f"?{query}" if query else "")
+        upstream = _client.build_request(request.method, url, headers=headers, content=body)
+        try:
+            response = await _client.send(upstream, stream=True)
+        except httpx.ConnectError:
+            # Nothing was delivered; the next worker in the ranking can take it.
+            continue
+
+        async def relay(response=response):
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                # Closing upstream ends the worker's side of the stream when the client goes away.
+                await response.aclose()
+
+        response_headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        response_headers["x-agent-worker"] = str(worker)
+        if request.method == "HEAD":
+            await response.aclose()
+            return Response(status_code=response.status_code, headers=response_headers)
+        return StreamingResponse(relay(), status_code=response.status_code, headers=response_headers)
+
+    return JSONResponse({"detail": "No API worker is reachable"}, status_code=502)
@@ -0,0 +1,84 @@
+"""
+Memory and throughput benchmark: MemorySaver vs SqliteCheckpointer.
+
+Simulates many threads each taking several graph steps that append one message
+to ``messages``, the same shape of writes the agent workflow produces.
+
+Usage (from backend/):
+    python benchmarks/bench_checkpointer.py --threads 10000 --steps 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+from agent_core.core.checkpoint import SqliteCheckpointer
+
+
+def run_thread(saver, thread_id: str, steps: int):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    messages = [HumanMessage(content=f"build feature {thread_id}")]
+    for step in range(steps):
+        if step:
+            messages = messages + [AIMessage(content=f"step {step} output " + "x" * 400)]
+        version = saver.get_next_version(checkpoint["channel_versions"].get("messages"), None)
+        checkpoint = {
+            **checkpoint,
+            "id": str(uuid6(clock_seq=step)),
+            "channel_values": {"messages": messages, "mode": "autonomy", "iteration_count": step},
+            "channel_versions": {**checkpoint["channel_versions"], "messages": version},
+        }
+        config = saver.put(config, checkpoint, {"source": "loop", "step": step}, {"messages": version})
+    return config
+
+
+def bench(name: str, saver, threads: int, steps: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    last_config = None
+    for i in range(threads):
+        last_config = run_thread(saver, f"thread-{i}", steps)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    restored = saver.get_tuple(last_config)
+    read_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"{name:<8} puts={threads * steps} "
+        f"throughput={threads * steps / elapsed:,.0f} puts/s "
+        f"retained={current / 2**20:.1f}MiB peak={peak / 2**20:.1f}MiB "
+        f"get_tuple={read_ms:.2f}ms messages={len(restored.checkpoint['channel_values']['messages'])}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=10000)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--cache-size", type=int, default=256)
+    args = parser.parse_args()
+
+    bench("memory", MemorySaver(), args.threads, args.steps)
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = SqliteCheckpointer(os.path.join(tmp, "bench.sqlite"), cache_size=args.cache_size)
+        bench("sqlite", saver, args.threads, args.steps)
+        start = time.perf_counter()
+        stats = saver.compact(keep_last=2)
+        print(f"compact  {stats} in {(time.perf_counter() - start) * 1000:.0f}ms")
+        saver.close()
+
+
+if __name__ == "__main__":
+    main()
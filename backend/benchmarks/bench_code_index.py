@@ -0,0 +1,116 @@
+"""
+Benchmarks search_code / find_symbol query latency on a synthetic repository.
+
+Builds a workspace of generated Python and TypeScript modules, then reports the
+cold index build, warm query latency for literal, regex and symbol lookups, an
+incremental refresh after one file changes, and `grep -rn` for comparison.
+
+Usage (from backend/):
+    python benchmarks/bench_code_index.py --files 5000 --lines 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core.code_index import CodeIndex
+from agent_core.core.workspace import WorkspaceIndex
+
+PY_TEMPLATE = '''import os
+
+
+class Service{n}:
+    """Service number {n}."""
+
+    def handle_request_{n}(self, payload):
+        value = payload.get("key_{n}")
+        return compute_total(value, {n})
+
+
+def compute_total(value, factor):
+    return (value or 0) * factor
+'''
+
+TS_TEMPLATE = '''export interface Props{n} {{
+  id: string;
+}}
+
+export function renderWidget{n}(props: Props{n}) {{
+  const label = `widget-{n}-${{props.id}}`;
+  return label;
+}}
+'''
+
+
+def make_repo(root: str, files: int, lines: int):
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n")
+    filler = "".join(f"# filler line {i} lorem ipsum dolor sit amet\n" for i in range(max(0, lines - 15)))
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n // 100:03}")
+        os.makedirs(directory, exist_ok=True)
+        if n % 3 == 2:
+            with open(os.path.join(directory, f"widget{n}.ts"), "w") as f:
+                f.write(TS_TEMPLATE.format(n=n) + filler.replace("#", "//"))
+        else:
+            with open(os.path.join(directory, f"service{n}.py"), "w") as f:
+                f.write(PY_TEMPLATE.format(n=n) + filler)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench(label: str, fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    print(f"{label:<42} p50={percentile(samples, 50) * 1000:8.2f}ms  p99={percentile(samples, 99) * 1000:8.2f}ms")
+    return result
+
+
+def main(files: int, lines: int, repeat: int):
+    with tempfile.TemporaryDirectory() as root:
+        make_repo(root, files, lines)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs)
+        print(f"repo: {files} files, {size / 1e6:.1f} MB")
+
+        index = CodeIndex(WorkspaceIndex(root, watch=False))
+        start = time.perf_counter()
+        index.refresh()
+        print(f"{'cold build':<42} {(time.perf_counter() - start) * 1000:8.0f}ms  {index.stats()}")
+
+        target = files // 2 - (files // 2) % 3
+        bench("search_code rare literal", lambda: index.search(f"key_{target}\""), repeat)
+        bench("search_code mid-token literal", lambda: index.search(f"request_{target}"), repeat)
+        bench("search_code common literal (50 shown)", lambda: index.search("compute_total"), repeat)
+        bench("search_code regex", lambda: index.search(r"Service\d+7\b", regex=True), repeat)
+        bench("find_symbol exact", lambda: index.find_symbol(f"Service{target}", exact=True), repeat)
+        bench("find_symbol partial", lambda: index.find_symbol("renderWidget1"), repeat)
+
+        path = os.path.join(root, f"pkg{target // 100:03}", f"service{target}.py")
+        with open(path, "a") as f:
+            f.write("\ndef freshly_added():\n    pass\n")
+        index._last_scan = 0.0
+        bench("incremental refresh (mtime rescan)", lambda: index.refresh(), 1)
+        assert index.find_symbol("freshly_added", exact=True)
+
+        bench("grep -rn (subprocess) rare literal", lambda: subprocess.run(
+            ["grep", "-rn", f"key_{target}\"", root], capture_output=True), min(repeat, 5))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.files, args.lines, args.repeat)
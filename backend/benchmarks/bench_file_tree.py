@@ -0,0 +1,91 @@
+"""
+Benchmarks /files/tree strategies on a synthetic workspace.
+
+Compares the old recursive os.listdir + os.path.isdir walk with the
+WorkspaceIndex: cold and warm lazy (depth=1) pages, a full-depth build from the
+index, and the ETag check that lets an unchanged tree answer 304.
+
+Usage (from backend/):
+    python benchmarks/bench_file_tree.py --files 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core.workspace import WorkspaceIndex
+
+
+def legacy_tree(dir_path):
+    tree = []
+    try:
+        for item in sorted(os.listdir(dir_path)):
+            if item.startswith(".") and item != ".gitignore":
+                continue
+            if item in ("__pycache__", "node_modules"):
+                continue
+            full_path = os.path.join(dir_path, item)
+            is_dir = os.path.isdir(full_path)
+            tree.append({
+                "name": item,
+                "path": full_path,
+                "type": "directory" if is_dir else "file",
+                "children": legacy_tree(full_path) if is_dir else None,
+            })
+    except PermissionError:
+        pass
+    return tree
+
+
+def make_tree(root: str, files: int, per_dir: int = 50, fanout: int = 20):
+    """Creates `files` empty files spread over a two-level directory fan-out."""
+    created = 0
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n*.log\n")
+    os.makedirs(os.path.join(root, "build"))
+    d = 0
+    while created < files:
+        directory = os.path.join(root, f"pkg{d // fanout:04}", f"mod{d % fanout:03}")
+        os.makedirs(directory, exist_ok=True)
+        for i in range(min(per_dir, files - created)):
+            open(os.path.join(directory, f"file{i:03}.py"), "w").close()
+            created += 1
+        d += 1
+
+
+def timed(label: str, fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"{label:<28} {elapsed:10.2f}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        make_tree(root, args.files)
+        print(f"created {args.files} files in {time.perf_counter() - start:.1f}s")
+
+        timed("legacy full walk", lambda: legacy_tree(root))
+
+        index = WorkspaceIndex(root, watch=False)
+        timed("index depth=1 cold", lambda: index.tree(root, depth=1))
+        timed("index depth=1 warm", lambda: index.tree(root, depth=1), repeat=20)
+        timed("index full depth cold", lambda: index.tree(root, depth=64))
+        timed("index full depth warm", lambda: index.tree(root, depth=64), repeat=3)
+        timed("index page expand (warm)", lambda: index.tree(os.path.join(root, "pkg0000"), depth=1), repeat=100)
+        _, etag = index.tree(root, depth=1)
+        timed("etag revalidation", lambda: index.tree(root, depth=1)[1] == etag, repeat=100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures the per-call overhead of the tracing/metrics layer.
+
+Times an empty async function bare, wrapped with traced() and inside span(),
+with metrics enabled and disabled (AGENT_METRICS=0 takes the no-op path), and
+with trace export to a file.
+
+Usage (from backend/):
+    python benchmarks/bench_metrics.py --calls 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core import metrics
+
+
+async def noop():
+    return None
+
+
+async def timed_loop(label: str, fn, calls: int, baseline: float = 0.0) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        await fn()
+    per_call = (time.perf_counter() - start) / calls
+    extra = f"  (+{(per_call - baseline) * 1e9:7.0f}ns)" if baseline else ""
+    print(f"{label:<36} {per_call * 1e9:8.0f}ns/call{extra}")
+    return per_call
+
+
+async def main(calls: int):
+    baseline = await timed_loop("bare call", noop, calls)
+
+    for enabled in (False, True):
+        metrics.METRICS_ENABLED = enabled
+        state = "enabled" if enabled else "disabled"
+        wrapped = metrics.traced("tool", "noop")(noop)
+
+        async def with_span():
+            with metrics.span("tool", "noop"):
+                await noop()
+
+        await timed_loop(f"traced() {state}", wrapped, calls, baseline)
+        await timed_loop(f"span() {state}", with_span, calls, baseline)
+
+    with tempfile.TemporaryDirectory() as root:
+        metrics.trace_exporter = metrics.TraceExporter(os.path.join(root, "trace.jsonl"))
+        wrapped = metrics.traced("tool", "noop")(noop)
+        await timed_loop("traced() enabled + trace export", wrapped, calls // 10, baseline)
+        metrics.trace_exporter = None
+
+    start = time.perf_counter()
+    text = metrics.registry.render()
+    print(f"{'render /metrics':<36} {(time.perf_counter() - start) * 1e3:8.2f}ms ({len(text)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks of the hot request paths on a synthetic workspace.
+
+Times extract_content_from_event (run on every graph update), the
+/files/tree endpoint function (cold, warm and the 304 ETag path) and the
+filesystem tool handlers the agents call most. Reports p50/p99 per call
+and calls per second; --check compares with benchmarks/baseline.json.
+
+Usage (from backend/):
+    python benchmarks/bench_micro.py --files 5000
+    python benchmarks/bench_micro.py --save-baseline
+    python benchmarks/bench_micro.py --check --tolerance 0.3   # default 0.5 (single-run timings are noisy)
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import add_baseline_args, finish, percentile
+
+
+def make_workspace(root: str, files: int, lines: int = 60):
+    for i in range(files):
+        directory = os.path.join(root, "src", f"pkg{i // 100:03}", f"mod{(i // 20) % 5}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i:05}.py"), "w") as f:
+            f.write(f"class Handler{i}:\n")
+            for n in range(lines):
+                f.write(f"    def step_{n}(self, value):\n        return value * {n} + {i}  # marker{n % 7}\n")
+
+
+async def sample(fn, calls: int):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def measure(name: str, fn, calls: int, results: dict, repeat: int = 3):
+    """
+    Times `calls` calls of fn (sync or async) after a warm-up, `repeat` times,
+    and records p50/p99 and throughput of the fastest repetition (the one
+    least disturbed by the rest of the machine).
+    """
+    await sample(fn, max(1, calls // 10))
+    runs = [await sample(fn, calls) for _ in range(repeat)]
+    samples = min(runs, key=lambda run: percentile(run, 50))
+    total = sum(samples)
+    p50, p99 = percentile(samples, 50), percentile(samples, 99)
+    results[f"{name}_p50_us"] = p50 * 1e6
+    results[f"{name}_p99_us"] = p99 * 1e6
+    results[f"{name}_per_s"] = calls / total
+    print(f"{name:<28} p50={p50 * 1e6:10.1f}us p99={p99 * 1e6:10.1f}us {calls / total:12.0f}/s")
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as root:
+        make_workspace(root, args.files)
+        # The workspace and code indexes are rooted at the cwd.
+        os.chdir(root)
+
+        from starlette.requests import Request
+        from langchain_core.messages import AIMessage, HumanMessage
+        from app.main import extract_content_from_event, get_file_tree
+        from agent_core.core.code_index import get_code_index
+        from agent_core.core.workspace import get_workspace_index
+        from agent_core.tools.filesystem import find_symbol, list_directory, read_file, read_files, search_code, write_file
+
+        results = {}
+        calls = args.calls
+
+        update = {
+            "messages": [AIMessage(content="x" * 2000, id=f"m{i}", name="Editor") for i in range(3)]
+            + [HumanMessage(content="please fix the failing test", id="h")],
+            "tokens_used": 1200,
+        }
+        await measure("extract_content_from_event", lambda: extract_content_from_event(update), calls * 10, results)
+
+        def request(etag=None):
+            headers = [(b"if-none-match", etag.encode())] if etag else []
+            return Request({"type": "http", "method": "GET", "path": "/files/tree", "headers": headers, "query_string": b""})
+
+        start = time.perf_counter()
+        response = get_file_tree(request(), path=".", depth=1, cursor=None, limit=1000)
+        results["file_tree_cold_ms"] = (time.perf_counter() - start) * 1000
+        print(f"{'file_tree cold':<28} {results['file_tree_cold_ms']:10.1f}ms")
+        etag = response.headers["etag"]
+        await measure("file_tree_depth1", lambda: get_file_tree(request(), path=".", depth=1, cursor=None, limit=1000), calls, results)
+        await measure("file_tree_depth3", lambda: get_file_tree(request(), path="src", depth=3, cursor=None, limit=1000), calls, results)
+        await measure("file_tree_304", lambda: get_file_tree(request(etag), path=".", depth=1, cursor=None, limit=1000), calls, results)
+
+        paths = [os.path.join("src", "pkg000", "mod0", f"file{i:05}.py") for i in range(10)]
+        await measure("read_file", lambda: read_file.handler({"file_path": paths[0]}), calls, results)
+        await measure("read_files_10", lambda: read_files.handler({"files": [{"path": p} for p in paths]}), calls, results)
+        counter = iter(range(10 ** 9))
+        await measure(
+            "write_file",
+            lambda: write_file.handler({"file_path": "scratch/out.txt", "content": f"version {next(counter)}\n"}),
+            calls, results
+        )
+        await measure("list_directory", lambda: list_directory.handler({"path": "src/pkg000"}), calls, results)
+        await measure("list_directory_recursive", lambda: list_directory.handler({"path": "src", "recursive": True, "limit": 500}), calls, results)
+
+        start = time.perf_counter()
+        await asyncio.to_thread(get_code_index().refresh)
+        results["code_index_build_ms"] = (time.perf_counter() - start) * 1000
+        print(f"{'code index build':<28} {results['code_index_build_ms']:10.1f}ms")
+        await measure("search_code", lambda: search_code.handler({"query": "marker3", "max_results": 50}), calls, results)
+        await measure("find_symbol", lambda: find_symbol.handler({"name": "Handler12", "exact": True}), calls, results)
+
+        get_workspace_index().stop()
+    # Tail latencies of microsecond calls are reported but too noisy to gate on.
+    return finish("micro", results, args, gated=lambda name: "_p99_" not in name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200, help="Calls per measured operation")
+    add_baseline_args(parser)
+    sys.exit(asyncio.run(main(parser.parse_args())))
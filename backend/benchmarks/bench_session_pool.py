@@ -0,0 +1,106 @@
+"""
+Compares per-turn latency of BaseAgent-style turns with and without the SessionPool.
+
+A fake client stands in for ClaudeSDKClient: connect() simulates the CLI spawn and
+MCP handshake, query()/receive_response() simulate a short model turn.
+
+Usage (from backend/):
+    python benchmarks/bench_session_pool.py --threads 20 --turns 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core.session import SessionPool
+
+
+class FakeClient:
+    spawn_delay = 0.3
+    turn_delay = 0.02
+
+    def __init__(self, options=None):
+        self.options = options
+
+    async def connect(self):
+        await asyncio.sleep(self.spawn_delay)
+
+    async def disconnect(self):
+        pass
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    async def query(self, prompt):
+        self._prompt = prompt
+
+    async def receive_response(self):
+        await asyncio.sleep(self.turn_delay)
+        yield self._prompt
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_turn(session_cm) -> float:
+    start = time.perf_counter()
+    async with session_cm as client:
+        await client.query("ping")
+        async for _ in client.receive_response():
+            pass
+    return time.perf_counter() - start
+
+
+async def bench(pooled: bool, threads: int, turns: int):
+    pool = SessionPool(options=None, client_factory=FakeClient, max_size=threads, warm_size=2)
+    if pooled:
+        await pool.warm_up()
+
+    async def conversation(thread_id: str):
+        samples = []
+        for _ in range(turns):
+            cm = pool.lease(thread_id) if pooled else FakeClient()
+            samples.append(await run_turn(cm))
+        return samples
+
+    results = await asyncio.gather(*(conversation(f"thread-{i}") for i in range(threads)))
+    await pool.close()
+    return [s for thread in results for s in thread], pool.stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--spawn-ms", type=float, default=300)
+    parser.add_argument("--turn-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    FakeClient.spawn_delay = args.spawn_ms / 1000
+    FakeClient.turn_delay = args.turn_ms / 1000
+
+    for pooled in (False, True):
+        samples, stats = asyncio.run(bench(pooled, args.threads, args.turns))
+        label = "pooled  " if pooled else "unpooled"
+        print(
+            f"{label} turns={len(samples)} "
+            f"p50={percentile(samples, 50) * 1000:.1f}ms "
+            f"p99={percentile(samples, 99) * 1000:.1f}ms "
+            f"mean={statistics.mean(samples) * 1000:.1f}ms"
+            + (f" stats={stats}" if pooled else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
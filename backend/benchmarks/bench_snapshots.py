@@ -0,0 +1,106 @@
+"""
+Benchmarks workspace checkpoints on a large git repository.
+
+Builds and commits a repository of small files, then compares the old
+checkpoint (`git add . && git commit` on the real branch) with SnapshotStore:
+the first snapshot (full staging into the private index), an incremental
+snapshot after a few files change, a full-rescan snapshot, and a restore.
+
+Usage (from backend/):
+    python benchmarks/bench_snapshots.py --files 100000 --changed 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core.snapshots import SnapshotStore
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@localhost",
+}
+
+
+def sh(root: str, *args: str):
+    subprocess.run(args, cwd=root, env=GIT_ENV, check=True, capture_output=True)
+
+
+def make_repo(root: str, files: int):
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n // 1000:03}", f"mod{(n // 50) % 20:02}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{n}.py"), "w") as f:
+            f.write(f"VALUE_{n} = {n}\n\ndef get_{n}():\n    return VALUE_{n}\n")
+    sh(root, "git", "init", "-q")
+    sh(root, "git", "add", ".")
+    sh(root, "git", "commit", "-qm", "init")
+
+
+def edit(root: str, files: int, changed: int, round_: int):
+    paths = []
+    for i in range(changed):
+        n = (i * 7919 + round_) % files
+        rel = os.path.join(f"pkg{n // 1000:03}", f"mod{(n // 50) % 20:02}", f"file{n}.py")
+        with open(os.path.join(root, rel), "a") as f:
+            f.write(f"# edit {round_}\n")
+        paths.append(rel)
+    return paths
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<46} {(time.perf_counter() - start) * 1000:9.1f}ms")
+    return result
+
+
+async def main(files: int, changed: int, rounds: int):
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        make_repo(root, files)
+        print(f"repo: {files} files (built in {time.perf_counter() - start:.1f}s), {changed} files changed per round")
+
+        for r in range(rounds):
+            edit(root, files, changed, r)
+            timed(f"git add . && git commit (round {r + 1})", lambda: (
+                sh(root, "git", "add", "."), sh(root, "git", "commit", "-qm", f"round {r}")
+            ))
+
+        # watch=False: changes are reported through mark_dirty, as the watcher would.
+        store = SnapshotStore(root, watch=False)
+        start = time.perf_counter()
+        first = await store.checkpoint("bench", "first")
+        print(f"{'snapshot: first (full staging)':<46} {(time.perf_counter() - start) * 1000:9.1f}ms")
+
+        for r in range(rounds):
+            store.mark_dirty(edit(root, files, changed, rounds + r))
+            start = time.perf_counter()
+            await store.checkpoint("bench", f"round {r}")
+            print(f"{f'snapshot: incremental (round {r + 1})':<46} {(time.perf_counter() - start) * 1000:9.1f}ms")
+
+        edit(root, files, changed, 2 * rounds)
+        rescan = SnapshotStore(root, watch=False)
+        start = time.perf_counter()
+        await rescan.checkpoint("bench", "rescan")
+        print(f"{'snapshot: full rescan (no watcher events)':<46} {(time.perf_counter() - start) * 1000:9.1f}ms")
+
+        start = time.perf_counter()
+        result = await store.restore("bench", first["n"])
+        print(f"{'restore to first snapshot':<46} {(time.perf_counter() - start) * 1000:9.1f}ms  ({result['files_changed']} files)")
+        print(f"checkpoints: {len(await store.list('bench'))}  stats: {store.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.files, args.changed, args.rounds))
@@ -0,0 +1,153 @@
+"""
+Import-time and cold-start budget for the API.
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters and
+reports the import time of app.main and the packages that dominate it, then
+starts uvicorn and times how long until /health answers (cold start) and
+until the prewarmed agents are built. Fails (exit 1) when the import or cold
+start is over budget, or when importing the API pulls in a package that
+must stay lazy (the Claude SDK, Playwright, MCP, the search client, Pillow).
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --import-budget-ms 1500 --runs 10
+    python benchmarks/bench_startup.py --check     # also compare with benchmarks/baseline.json
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from report import add_baseline_args, finish, percentile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported on first use only; importing app.main must not load them.
+LAZY_PACKAGES = ("claude_agent_sdk", "playwright", "mcp", "duckduckgo_search", "PIL")
+AGENTS = ("Manager", "Editor", "Verifier")
+
+
+def parse_importtime(stderr: str):
+    """(module, self_us, cumulative_us) for every line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(cwd: str, env: dict):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_cold_start(cwd: str, env: dict, timeout: float = 60.0):
+    """Seconds until /health answers, and until the prewarmed agents are built (None if never)."""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", BACKEND, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env
+    )
+    healthy = prewarmed = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if healthy is None and client.get("/health").status_code == 200:
+                        healthy = time.perf_counter() - started
+                    if healthy is not None:
+                        text = client.get("/metrics").text
+                        # An agent's session pool gauges appear once the agent is built.
+                        if all(f'agent_session_pool_spawned{{agent="{name}"}}' in text for name in AGENTS):
+                            prewarmed = time.perf_counter() - started
+                            break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return healthy, prewarmed
+
+
+def main(args) -> int:
+    env = dict(os.environ, PYTHONPATH=BACKEND, AGENT_CHECKPOINTER="memory", CODE_INDEX_PREWARM="0")
+    failures = []
+    with tempfile.TemporaryDirectory() as cwd:
+        totals, self_by_package, imported = [], defaultdict(list), set()
+        for _ in range(args.runs):
+            rows = measure_import(cwd, env)
+            totals.append(next(cumulative for name, _, cumulative in rows if name == "app.main") / 1000)
+            per_package = defaultdict(int)
+            for name, self_us, _ in rows:
+                per_package[name.split(".")[0]] += self_us
+                imported.add(name.split(".")[0])
+            for package, self_us in per_package.items():
+                self_by_package[package].append(self_us / 1000)
+
+        import_ms = percentile(totals, 50)
+        print(f"import app.main      p50={import_ms:8.1f}ms min={min(totals):8.1f}ms ({args.runs} runs)")
+        print("heaviest packages (self time, p50):")
+        heaviest = sorted(self_by_package.items(), key=lambda item: -percentile(item[1], 50))[:args.top]
+        for package, samples in heaviest:
+            print(f"  {package:<28} {percentile(samples, 50):8.1f}ms")
+
+        eager = [package for package in LAZY_PACKAGES if package in imported]
+        if eager:
+            failures.append(f"importing app.main loads {', '.join(eager)}; they must be imported on first use")
+        if import_ms > args.import_budget_ms:
+            failures.append(f"import app.main takes {import_ms:.0f}ms (budget {args.import_budget_ms:.0f}ms)")
+
+        cold_starts, prewarms = [], []
+        for _ in range(args.starts):
+            healthy, prewarmed = measure_cold_start(cwd, env)
+            if healthy is None:
+                failures.append("the server did not answer /health")
+                break
+            cold_starts.append(healthy * 1000)
+            if prewarmed is not None:
+                prewarms.append(prewarmed * 1000)
+
+    metrics = {"import_ms": import_ms}
+    if cold_starts:
+        metrics["cold_start_ms"] = percentile(cold_starts, 50)
+        print(f"cold start to /health p50={metrics['cold_start_ms']:8.1f}ms ({len(cold_starts)} starts)")
+        if metrics["cold_start_ms"] > args.cold_start_budget_ms:
+            failures.append(f"cold start takes {metrics['cold_start_ms']:.0f}ms (budget {args.cold_start_budget_ms:.0f}ms)")
+    if prewarms:
+        metrics["prewarmed_ms"] = percentile(prewarms, 50)
+        print(f"agents prewarmed     p50={metrics['prewarmed_ms']:8.1f}ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    status = finish("startup", metrics, args)
+    return 1 if failures else status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--starts", type=int, default=3, help="Server cold starts to time")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list")
+    parser.add_argument("--import-budget-ms", type=float, default=2500)
+    parser.add_argument("--cold-start-budget-ms", type=float, default=5000)
+    add_baseline_args(parser)
+    sys.exit(main(parser.parse_args()))
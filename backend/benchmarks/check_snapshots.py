@@ -0,0 +1,131 @@
+"""
+Regression checks for workspace checkpoints that the benchmarks do not cover.
+
+Runs against a scratch git repository without a .gitignore, so nothing but
+SnapshotStore itself keeps the server's state directory (.agent/: SQLite
+databases with their -wal/-shm files, screenshots) out of the snapshots.
+Also checks that repeated default restores don't toggle between the target
+and the snapshot the previous restore took, and that they skip the
+workflow's automatic snapshots. Exits non-zero on the first
+failed check.
+
+Usage (from backend/):
+    python benchmarks/check_snapshots.py
+"""
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.core.snapshots import AUTO, EXPLICIT, STATE_DIR, SnapshotStore
+
+
+def check(label: str, ok: bool, detail: str = ""):
+    print(f"{'ok' if ok else 'FAIL':<5} {label}{f' ({detail})' if detail and not ok else ''}")
+    if not ok:
+        sys.exit(1)
+
+
+def write_state(root: str, value: int):
+    """Writes to a WAL-mode database under the state dir, as the checkpointer and caches do."""
+    os.makedirs(os.path.join(root, STATE_DIR, "screenshots"), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(root, STATE_DIR, "checkpoints.sqlite"))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS t (v INTEGER)")
+    conn.execute("INSERT INTO t VALUES (?)", (value,))
+    conn.commit()
+    with open(os.path.join(root, STATE_DIR, "screenshots", f"{value}.png"), "wb") as f:
+        f.write(os.urandom(64))
+    return conn
+
+
+async def tree_paths(store: SnapshotStore, commit: str):
+    return (await store._git("ls-tree", "-r", "--name-only", "-z", commit, index=False)).split("\0")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "app.py"), "w") as f:
+            f.write("VALUE = 1\n")
+        subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+        # watch=False: changes are reported through mark_dirty, as the watcher would.
+        store = SnapshotStore(root, watch=False)
+        conn = write_state(root, 1)
+        try:
+            first = await store.checkpoint("check", "first")
+            paths = [path for path in await tree_paths(store, first["commit"]) if path]
+            check("state dir is not snapshotted", paths == ["app.py"], f"tree: {paths}")
+
+            write_state(root, 2).close()
+            store.mark_dirty([os.path.join(STATE_DIR, "checkpoints.sqlite-wal")])
+            second = await store.checkpoint("check", "state only")
+            check("state writes alone create no checkpoint", not second["created"], f"checkpoint {second['n']}")
+
+            diff = await store.diff("check")
+            check("diff ignores the state dir", diff["changes"] == [], f"changes: {diff['changes']}")
+
+            # A user index that tracks the state dir must not leak it into the full rescan either.
+            subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+            rescan = SnapshotStore(root, watch=False)
+            with open(os.path.join(root, "app.py"), "a") as f:
+                f.write("VALUE = 2\n")
+            third = await rescan.checkpoint("check", "edit")
+            paths = [path for path in await tree_paths(rescan, third["commit"]) if path]
+            check("state tracked by the user's index is not snapshotted", paths == ["app.py"], f"tree: {paths}")
+
+            size = os.path.getsize(os.path.join(root, STATE_DIR, "checkpoints.sqlite"))
+            await rescan.restore("check", first["n"])
+            check(
+                "restore leaves the state dir alone",
+                os.path.getsize(os.path.join(root, STATE_DIR, "checkpoints.sqlite")) == size
+                and conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+            )
+        finally:
+            conn.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        app = os.path.join(root, "app.py")
+        subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+        store = SnapshotStore(root, watch=False)
+        with open(app, "w") as f:
+            f.write("VALUE = 1\n")
+        store.mark_dirty(["app.py"])
+        first = await store.checkpoint("check", "first")
+        with open(app, "w") as f:
+            f.write("VALUE = 2\n")
+        store.mark_dirty(["app.py"])
+        for attempt in (1, 2):
+            result = await store.restore("check")
+            with open(app) as f:
+                content = f.read()
+            check(
+                f"default restore #{attempt} returns to the latest checkpoint",
+                result["restored"]["n"] == first["n"] and content == "VALUE = 1\n",
+                f"restored {result['restored']['n']}, app.py: {content!r}"
+            )
+        undo = await store.restore("check", result["previous"]["n"])
+        check("a restore can be undone by number", undo["files_changed"] == 0)
+        await store.restore("check", (await store.list("check"))[1]["n"])
+        with open(app) as f:
+            check("the first pre-restore snapshot holds the edit", f.read() == "VALUE = 2\n")
+        again = await store.checkpoint("check", "after undo")
+        check("a checkpoint after an undo is recorded", again["created"] and again["kind"] == EXPLICIT)
+
+        # The workflow's automatic snapshots are not the default target either.
+        with open(app, "w") as f:
+            f.write("VALUE = 3\n")
+        store.mark_dirty(["app.py"])
+        auto = await store.checkpoint("check", "after editing round 1", kind=AUTO)
+        explicit = await store.checkpoint("check", "git_commit")
+        check("an explicit checkpoint isn't folded into an automatic one", explicit["created"] and explicit["n"] > auto["n"])
+        await store.checkpoint("check", "after editing round 2", kind=AUTO)
+        result = await store.restore("check")
+        check("default restore skips automatic snapshots", result["restored"]["n"] == explicit["n"], f"restored {result['restored']['n']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
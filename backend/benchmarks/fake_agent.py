@@ -0,0 +1,229 @@
+"""
+Scripted stand-in for ClaudeSDKClient, so the API and graph can be exercised
+offline without the Claude CLI.
+
+ScriptedClient replays a script per agent (picked from the system prompt,
+"You are the Editor Agent" -> "Editor"): text chunks and tool calls, with
+configurable spawn, first-token and per-chunk latency. Tool calls run the
+real in-process tool handlers with the session context bound at connect
+time, as the SDK's MCP transport does, so the graph sees real plans, status
+reports and file writes. install() swaps it in for every agent of the graph.
+
+Run as a script it serves app.main with the scripted agents in a scratch git
+workspace (load_chat.py starts it this way). Turns recorded by the response
+cache (GET /responses, AGENT_RESPONSE_CACHE_TRACES=1 for tool results) use the
+same step format and can be replayed with --fixtures.
+
+Usage (from backend/):
+    python benchmarks/fake_agent.py --port 8300 --spawn 0.3 --first-token 0.2
+    python benchmarks/fake_agent.py --script my_script.json
+    curl localhost:8000/responses > turns.json && python benchmarks/fake_agent.py --fixtures turns.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import uuid
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock, ToolResultBlock, ToolUseBlock, UserMessage
+from agent_core.core.session import _session_context, bind_session_context
+
+# One list of steps per agent. A step is {"text": str, "repeat": n} (n streamed
+# chunks) or {"tool": name, "input": {...}}. "{thread}" and "{nonce}" in tool
+# inputs become the session key and a fresh random id.
+DEFAULT_SCRIPT: Dict[str, List[Dict[str, Any]]] = {
+    "Manager": [
+        {"text": "The request is small; the Editor can implement it directly. ", "repeat": 4},
+    ],
+    "Editor": [
+        {"text": "Reading the workspace. ", "repeat": 2},
+        {"tool": "list_directory", "input": {"path": "."}},
+        {"tool": "write_file", "input": {"file_path": "out/{thread}.txt", "content": "change {nonce}\n"}},
+        {"text": "Wrote the change. ", "repeat": 8},
+    ],
+    "Verifier": [
+        {"tool": "read_file", "input": {"file_path": "out/{thread}.txt"}},
+        {"tool": "report_status", "input": {"status": "success", "details": "Output file present."}},
+        {"text": "Verified. ", "repeat": 2},
+    ],
+}
+
+ROLE_PATTERN = re.compile(r"You are the (\w+) Agent")
+
+
+def script_from_fixtures(turns: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """A script from recorded turns (GET /responses): the newest turn of each agent."""
+    script: Dict[str, List[Dict[str, Any]]] = {}
+    for turn in sorted(turns, key=lambda t: t["created_at"]):
+        script[turn["agent"]] = turn["steps"]
+    return script
+
+
+def fill(value: Any, variables: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for key, replacement in variables.items():
+            value = value.replace("{" + key + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {k: fill(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fill(v, variables) for v in value]
+    return value
+
+
+class ScriptedClient:
+    """Implements the part of ClaudeSDKClient that BaseAgent and SessionPool use."""
+
+    script: Dict[str, List[Dict[str, Any]]] = DEFAULT_SCRIPT
+    spawn_delay = 0.3
+    first_token_delay = 0.2
+    chunk_delay = 0.01
+    tool_delay = 0.0
+
+    def __init__(self, options=None, transport=None):
+        self.options = options
+        match = ROLE_PATTERN.search(getattr(options, "system_prompt", None) or "")
+        self.role = match.group(1) if match else "Editor"
+        self.model = getattr(options, "model", None) or "scripted"
+        self._context = None
+        self._prompt = ""
+
+    async def connect(self, prompt=None):
+        await asyncio.sleep(self.spawn_delay)
+        # Tool handlers see the context bound at connect time (see SessionContext).
+        self._context = _session_context.get()
+
+    async def disconnect(self):
+        self._context = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+        return False
+
+    async def set_model(self, model=None):
+        self.model = model or self.model
+
+    async def query(self, prompt, session_id: str = "default"):
+        self._prompt = prompt if isinstance(prompt, str) else ""
+
+    async def _call_tool(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        from agent_core.tools.server import find_tool
+        tool = find_tool(name)
+        if tool is None:
+            return {"content": [{"type": "text", "text": f"Unknown tool {name}"}]}
+        if self.tool_delay:
+            await asyncio.sleep(self.tool_delay)
+        if self._context is None:
+            return await tool.handler(args)
+        with bind_session_context(self._context):
+            return await tool.handler(args)
+
+    async def receive_response(self):
+        thread = self._context.thread_id if self._context is not None else "default"
+        delay = self.first_token_delay
+        output = ""
+        for step in self.script.get(self.role, []):
+            if "tool" in step:
+                args = fill(step.get("input", {}), {"thread": thread, "nonce": uuid.uuid4().hex})
+                block = ToolUseBlock(id=f"toolu_{uuid.uuid4().hex[:24]}", name=step["tool"], input=args)
+                yield AssistantMessage(content=[block], model=self.model)
+                result = await self._call_tool(step["tool"], args)
+                yield UserMessage(content=[ToolResultBlock(tool_use_id=block.id, content=result["content"])])
+                continue
+            for _ in range(step.get("repeat", 1)):
+                await asyncio.sleep(delay)
+                delay = self.chunk_delay
+                output += step["text"]
+                yield AssistantMessage(content=[TextBlock(text=step["text"])], model=self.model)
+        yield ResultMessage(
+            subtype="success",
+            duration_ms=0,
+            duration_api_ms=0,
+            is_error=False,
+            num_turns=1,
+            session_id="scripted",
+            total_cost_usd=0.0,
+            usage={"input_tokens": len(self._prompt) // 4, "output_tokens": len(output) // 4},
+            result=output,
+        )
+
+
+def install(script=None, spawn: float = 0.3, first_token: float = 0.2, chunk: float = 0.01, tool: float = 0.0):
+    """Makes every agent of the graph (pooled or not) use ScriptedClient."""
+    from agent_core.agents import base
+    from agent_core.core.registry import AGENT_NAMES, components
+    ScriptedClient.script = script or DEFAULT_SCRIPT
+    ScriptedClient.spawn_delay = spawn
+    ScriptedClient.first_token_delay = first_token
+    ScriptedClient.chunk_delay = chunk
+    ScriptedClient.tool_delay = tool
+    base.ClaudeSDKClient = ScriptedClient
+    for name in AGENT_NAMES:
+        agent = components.get(name)
+        if agent.session_pool is not None:
+            agent.session_pool.client_factory = ScriptedClient
+
+
+def make_workspace(root: str, files: int = 200):
+    """A small git repository for the agents to work in (snapshots need git)."""
+    for i in range(files):
+        directory = os.path.join(root, "src", f"pkg{i // 20:02}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"mod{i:03}.py"), "w") as f:
+            f.write(f"def handler_{i}(value):\n    return value + {i}\n")
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--workspace", help="Directory to serve (default: a scratch git repo)")
+    parser.add_argument("--script", help="JSON file with the per-agent script")
+    parser.add_argument("--fixtures", help="JSON list of recorded turns (GET /responses) to replay")
+    parser.add_argument("--spawn", type=float, default=0.3, help="Seconds to start a session")
+    parser.add_argument("--first-token", type=float, default=0.2, help="Seconds to the first text chunk")
+    parser.add_argument("--chunk", type=float, default=0.01, help="Seconds between text chunks")
+    parser.add_argument("--tool", type=float, default=0.0, help="Extra seconds per tool call")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    elif args.fixtures:
+        with open(args.fixtures) as f:
+            script = script_from_fixtures(json.load(f))
+
+    scratch = None
+    workspace = args.workspace
+    if workspace is None:
+        scratch = tempfile.TemporaryDirectory(prefix="agent-bench-")
+        workspace = scratch.name
+        make_workspace(workspace)
+    # The workspace index, snapshots and checkpoint database all live in the cwd.
+    os.chdir(workspace)
+
+    import uvicorn
+    from app.main import app
+    install(script, spawn=args.spawn, first_token=args.first_token, chunk=args.chunk, tool=args.tool)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
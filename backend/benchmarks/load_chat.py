@@ -0,0 +1,183 @@
+"""
+Load test: hundreds of concurrent threads chatting over /chat SSE against the
+scripted agents of fake_agent.py (no Claude CLI or network needed).
+
+Starts fake_agent.py as a separate server process (so client and server don't
+share an event loop), then every virtual user runs --turns GET /chat turns on
+its own thread, reading the SSE stream to the "end" event. Reports run
+throughput, p50/p99 time to first token (first "delta") and to the end of the
+run, errors, and the server's RSS before and after each round (growth across
+rounds points at leaks). --check compares with benchmarks/baseline.json.
+
+Usage (from backend/):
+    python benchmarks/load_chat.py --threads 200 --turns 2
+    python benchmarks/load_chat.py --threads 200 --save-baseline
+    python benchmarks/load_chat.py --threads 200 --check
+    python benchmarks/load_chat.py --url http://localhost:8000 --threads 50   # an already running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from report import add_baseline_args, finish, percentile, rss_mb
+
+FAKE_AGENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_agent.py")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    # Let the scheduler and pools take the whole load instead of queueing it.
+    env.setdefault("AGENT_MAX_RUNS", str(args.threads))
+    env.setdefault("AGENT_MAX_RUNS_PER_TENANT", str(args.threads))
+    env.setdefault("AGENT_RUN_QUEUE_SIZE", str(args.threads))
+    env.setdefault("AGENT_POOL_MAX_SIZE", str(args.threads * 2))
+    env.setdefault("AGENT_CHECKPOINTER", args.checkpointer)
+    command = [
+        sys.executable, FAKE_AGENT, "--port", str(port),
+        "--spawn", str(args.spawn), "--first-token", str(args.first_token), "--chunk", str(args.chunk)
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_healthy(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not become healthy")
+        await asyncio.sleep(0.2)
+
+
+async def chat_turn(client: httpx.AsyncClient, thread_id: str, turn: int, mode: str) -> dict:
+    """One /chat run; returns its timings and whether it reached the end event cleanly."""
+    result = {"ttft": None, "latency": None, "events": 0, "ok": False}
+    params = {"message": f"turn {turn}: update the output file", "mode": mode, "thread_id": thread_id}
+    start = time.perf_counter()
+    try:
+        async with client.stream("GET", "/chat", params=params) as response:
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                result["events"] += 1
+                if event["type"] == "delta" and result["ttft"] is None:
+                    result["ttft"] = time.perf_counter() - start
+                elif event["type"] == "error":
+                    result["error"] = event.get("message")
+                elif event["type"] == "end":
+                    result["ok"] = "error" not in result
+    except httpx.HTTPError as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+async def run_round(client: httpx.AsyncClient, threads: int, turns: int, mode: str):
+    async def user():
+        thread_id = f"load-{uuid.uuid4().hex[:12]}"
+        return [await chat_turn(client, thread_id, turn, mode) for turn in range(turns)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(user() for _ in range(threads)))
+    return [r for per_user in results for r in per_user], time.perf_counter() - start
+
+
+async def main(args) -> int:
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_server(args, port)
+        url = f"http://127.0.0.1:{port}"
+
+    # A fresh connection per run: reusing idle keep-alive connections races with
+    # the server closing them, which shows up as spurious errors.
+    limits = httpx.Limits(max_connections=args.threads + 10, max_keepalive_connections=0)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+            await wait_healthy(client)
+            rss_start = rss_mb(server.pid)["rss_mb"] if server else None
+            samples, walls, rss_after = [], [], []
+            for round_no in range(args.rounds):
+                results, wall = await run_round(client, args.threads, args.turns, args.mode)
+                samples.extend(results)
+                walls.append(wall)
+                ok = [r for r in results if r["ok"]]
+                line = f"round {round_no + 1}: runs={len(results)} ok={len(ok)} wall={wall:.2f}s runs/s={len(ok) / wall:.1f}"
+                if server:
+                    rss_after.append(rss_mb(server.pid)["rss_mb"])
+                    line += f" server_rss={rss_after[-1]:.1f}MB"
+                print(line)
+    finally:
+        if server is not None:
+            peak = rss_mb(server.pid)["peak_rss_mb"]
+            server.terminate()
+            server.wait(timeout=30)
+
+    ok = [r for r in samples if r["ok"]]
+    errors = [r.get("error", "no end event") for r in samples if not r["ok"]]
+    ttft = [r["ttft"] for r in ok if r["ttft"] is not None]
+    latency = [r["latency"] for r in ok]
+    metrics = {
+        "runs_per_s": len(ok) / sum(walls),
+        "events_per_s": sum(r["events"] for r in ok) / sum(walls),
+        "error_rate": len(errors) / len(samples),
+        "ttft_p50_ms": percentile(ttft, 50) * 1000,
+        "ttft_p99_ms": percentile(ttft, 99) * 1000,
+        "latency_p50_ms": percentile(latency, 50) * 1000,
+        "latency_p99_ms": percentile(latency, 99) * 1000,
+    }
+    if server is not None:
+        metrics["rss_start_mb"] = rss_start
+        metrics["rss_growth_mb"] = rss_after[-1] - rss_start
+        # Growth after the first round is what keeps accumulating under steady load.
+        metrics["rss_growth_after_warmup_mb"] = rss_after[-1] - rss_after[0]
+        metrics["peak_rss_mb"] = peak
+
+    print(
+        f"\nthreads={args.threads} turns={args.turns} rounds={args.rounds} runs={len(samples)} "
+        f"ok={len(ok)} errors={len(errors)}"
+    )
+    for name, value in metrics.items():
+        print(f"{name:<28} {value:10.2f}")
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error}")
+    return finish("load_chat", metrics, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=200, help="Concurrent conversations")
+    parser.add_argument("--turns", type=int, default=2, help="Runs per conversation and round")
+    parser.add_argument("--rounds", type=int, default=2, help="Rounds of --threads conversations")
+    parser.add_argument("--mode", default="autonomy")
+    parser.add_argument("--url", help="Drive this server instead of starting fake_agent.py")
+    parser.add_argument("--checkpointer", default="sqlite", choices=["sqlite", "memory"])
+    parser.add_argument("--spawn", type=float, default=0.3, help="Scripted session start time (s)")
+    parser.add_argument("--first-token", type=float, default=0.2, help="Scripted time to first token (s)")
+    parser.add_argument("--chunk", type=float, default=0.01, help="Scripted time between chunks (s)")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    add_baseline_args(parser)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,70 @@
+"""
+Load test: many threads run long shell commands while /health must stay responsive.
+
+Runs N concurrent run_shell_command tool calls (each a `sleep`) and, in
+parallel, probes GET /health on the ASGI app. Reports /health latency, which
+stays in the low milliseconds because the commands no longer block the loop.
+
+Usage (from backend/):
+    AGENT_MAX_PROCS_PER_WORKSPACE=50 python benchmarks/load_shell_commands.py --threads 50 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from app.main import app
+from agent_core.tools.filesystem import run_shell_command
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def main(threads: int, seconds: float):
+    command = f"for i in $(seq {int(seconds * 10)}); do echo tick $i; sleep 0.1; done"
+    latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            while not done.is_set():
+                start = time.perf_counter()
+                r = await client.get("/health")
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+    async def worker():
+        result = await run_shell_command.handler({"command": command})
+        return result["content"][0]["text"]
+
+    start = time.perf_counter()
+    prober = asyncio.create_task(probe())
+    outputs = await asyncio.gather(*(worker() for _ in range(threads)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+
+    ok = sum("EXIT CODE: 0" in out for out in outputs)
+    print(f"commands={threads} ok={ok} wall={elapsed:.2f}s")
+    print(
+        f"/health probes={len(latencies)} "
+        f"p50={percentile(latencies, 50) * 1000:.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.2f}ms "
+        f"max={max(latencies) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.threads, args.seconds))
@@ -0,0 +1,115 @@
+"""
+Shared helpers of the benchmark suite: percentiles, RSS readings and the
+stored baseline that bench_micro.py and load_chat.py compare against.
+
+Metrics are flat {name: number}. Names ending in "_per_s" are better when
+higher, everything else (latencies, RSS growth) when lower. Baselines are
+per machine: record one with --save-baseline on the box that runs the checks.
+"""
+import json
+import os
+from typing import Callable, Dict, Optional
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Changes smaller than this (by unit suffix) are noise, whatever the percentage.
+NOISE_FLOOR = {"_us": 2.0, "_ms": 2.0, "_mb": 8.0}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb(pid: Optional[int] = None) -> Dict[str, float]:
+    """Current (VmRSS) and peak (VmHWM) resident set size of a process, in MB (Linux /proc)."""
+    values = {}
+    with open(f"/proc/{pid or 'self'}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) / 1024
+    return {"rss_mb": values.get("VmRSS", 0.0), "peak_rss_mb": values.get("VmHWM", 0.0)}
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s")
+
+
+def load_baseline(path: str = BASELINE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(suite: str, metrics: Dict[str, float], path: str = BASELINE_FILE):
+    """Stores metrics as the baseline of `suite`, keeping the other suites' entries."""
+    baseline = load_baseline(path)
+    baseline[suite] = {name: round(value, 6) for name, value in sorted(metrics.items())}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"saved {len(metrics)} {suite} metrics to {path}")
+
+
+def noise_floor(name: str) -> float:
+    return next((floor for suffix, floor in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+
+
+def check_baseline(
+    suite: str,
+    metrics: Dict[str, float],
+    tolerance: float,
+    path: str = BASELINE_FILE,
+    gated: Optional[Callable[[str], bool]] = None
+) -> bool:
+    """
+    Compares metrics with the stored baseline of `suite` and prints a table.
+    Returns False if a gated metric (all of them unless `gated` says
+    otherwise) is worse than the baseline by more than `tolerance` (a
+    fraction, 0.25 = 25%) and by more than its noise floor.
+    """
+    baseline = load_baseline(path).get(suite)
+    if not baseline:
+        print(f"no {suite} baseline in {path}; record one with --save-baseline")
+        return True
+    ok = True
+    print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base in sorted(baseline.items()):
+        if name not in metrics:
+            continue
+        current = metrics[name]
+        change = (current - base) / base if base else (1.0 if current else 0.0)
+        worse = -change if higher_is_better(name) else change
+        regressed = worse > tolerance and abs(current - base) > noise_floor(name)
+        if gated is not None and not gated(name):
+            flag = ""
+        else:
+            ok = ok and not regressed
+            flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<40} {base:>12.4f} {current:>12.4f} {change * 100:>7.1f}%{flag}")
+    return ok
+
+
+def finish(suite: str, metrics: Dict[str, float], args, gated: Optional[Callable[[str], bool]] = None) -> int:
+    """Handles the --json/--save-baseline/--check flags every suite script takes; returns the exit code."""
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baseline(suite, metrics, args.baseline)
+        return 0
+    if args.check and not check_baseline(suite, metrics, args.tolerance, args.baseline, gated):
+        print(f"\n{suite}: performance regressed by more than {args.tolerance * 100:.0f}%")
+        return 1
+    return 0
+
+
+def add_baseline_args(parser):
+    parser.add_argument("--json", help="Also write the metrics to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a metric regressed beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed regression as a fraction (default 0.5)")
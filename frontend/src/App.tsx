@@ -66,18 +66,26 @@ function App() {
           setLoading(false);
           setStreaming(false);
           eventSource.close();
-        } else {
-          // Regular event
-          const agentMsg = {
-            role: 'assistant',
-            agent: data.node,
-            content: data.content
-          };
-          console.log(agentMsg)
-          buffer.push(agentMsg);
-          // Update UI immediately for real-time effect
-          setMessages(prev => [...prev, agentMsg]);
-          buffer = [];
+        } else if (data.type === 'delta' || data.type === 'message') {
+          // Partial text is appended to the message with the same id;
+          // the final message replaces it with the complete content.
+          setMessages(prev => {
+            const index = prev.findIndex(m => m.id === data.id);
+            if (index === -1) {
+              return [...prev, {
+                id: data.id,
+                role: 'assistant',
+                agent: data.node,
+                content: data.type === 'delta' ? data.text : data.content
+              }];
+            }
+            const next = [...prev];
+            next[index] = {
+              ...next[index],
+              content: data.type === 'delta' ? next[index].content + data.text : data.content
+            };
+            return next;
+          });
         }
       } catch (error) {
         console.error('Error parsing SSE event:', error);
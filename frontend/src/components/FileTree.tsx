@@ -1,11 +1,17 @@
 import React, { useState } from 'react';
 import { ChevronRight, ChevronDown, File, Folder } from 'lucide-react';
 
-interface FileNode {
+export interface FileNode {
   name: string;
   path: string;
   type: 'file' | 'directory';
-  children?: FileNode[];
+  children?: FileNode[] | null;
+}
+
+export interface FileTreePage {
+  path: string;
+  children: FileNode[];
+  next_cursor: string | null;
 }
 
 interface FileTreeProps {
@@ -13,11 +19,32 @@ interface FileTreeProps {
   onSelect: (file: FileNode) => void;
 }
 
+export const fetchTreePage = async (path: string, cursor?: string | null): Promise<FileTreePage> => {
+  const params = new URLSearchParams({ path, depth: '1' });
+  if (cursor) params.set('cursor', cursor);
+  const res = await fetch(`/api/files/tree?${params.toString()}`);
+  return res.json();
+};
+
 const FileTreeNode: React.FC<{ node: FileNode; onSelect: (file: FileNode) => void; depth: number }> = ({ node, onSelect, depth }) => {
   const [isOpen, setIsOpen] = useState(false);
+  const [children, setChildren] = useState<FileNode[] | null>(node.children ?? null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+
+  // Directories are expanded on demand, one page at a time.
+  const loadChildren = async (cursor?: string | null) => {
+    try {
+      const page = await fetchTreePage(node.path, cursor);
+      setChildren(prev => (cursor && prev ? [...prev, ...page.children] : page.children));
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error("Failed to fetch directory", err);
+    }
+  };
 
   const handleClick = () => {
     if (node.type === 'directory') {
+      if (!isOpen && children === null) loadChildren();
       setIsOpen(!isOpen);
     } else {
       onSelect(node);
@@ -26,7 +53,7 @@ const FileTreeNode: React.FC<{ node: FileNode; onSelect: (file: FileNode) => voi
 
   return (
     <div>
-      <div 
+      <div
         className="flex items-center gap-1 py-1 px-2 hover:bg-gray-700 cursor-pointer text-sm text-gray-300"
         style={{ paddingLeft: `${depth * 12 + 8}px` }}
         onClick={handleClick}
@@ -41,11 +68,20 @@ const FileTreeNode: React.FC<{ node: FileNode; onSelect: (file: FileNode) => voi
         )}
         <span className="truncate">{node.name}</span>
       </div>
-      {isOpen && node.children && (
+      {isOpen && children && (
         <div>
-          {node.children.map((child) => (
+          {children.map((child) => (
             <FileTreeNode key={child.path} node={child} onSelect={onSelect} depth={depth + 1} />
           ))}
+          {nextCursor && (
+            <div
+              className="py-1 px-2 hover:bg-gray-700 cursor-pointer text-xs text-gray-500"
+              style={{ paddingLeft: `${(depth + 1) * 12 + 8}px` }}
+              onClick={() => loadChildren(nextCursor)}
+            >
+              Load more…
+            </div>
+          )}
         </div>
       )}
     </div>
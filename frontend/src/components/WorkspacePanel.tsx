@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { FileTree } from './FileTree';
+import { FileTree, fetchTreePage } from './FileTree';
 import { CodeEditor } from './CodeEditor';
 import { Save, RefreshCw } from 'lucide-react';
 
@@ -11,13 +11,14 @@ export const WorkspacePanel: React.FC<WorkspacePanelProps> = ({ className }) =>
   const [fileTree, setFileTree] = useState<any[]>([]);
   const [selectedFile, setSelectedFile] = useState<any>(null);
   const [fileContent, setFileContent] = useState('');
+  const [savedContent, setSavedContent] = useState('');
+  const [fileVersion, setFileVersion] = useState<string | null>(null);
   const [isDirty, setIsDirty] = useState(false);
 
   const fetchFileTree = async () => {
     try {
-      const res = await fetch('/api/files/tree');
-      const data = await res.json();
-      setFileTree(data);
+      const page = await fetchTreePage('.');
+      setFileTree(page.children);
     } catch (err) {
       console.error("Failed to fetch file tree", err);
     }
@@ -36,22 +37,66 @@ export const WorkspacePanel: React.FC<WorkspacePanelProps> = ({ className }) =>
     try {
       const res = await fetch(`/api/files/content?path=${encodeURIComponent(file.path)}`);
       const data = await res.json();
+      if (!res.ok) throw new Error(data.detail);
       setFileContent(data.content);
+      setSavedContent(data.content);
+      setFileVersion(data.version);
       setIsDirty(false);
     } catch (err) {
       console.error("Failed to fetch file content", err);
     }
   };
 
+  // Single byte-range edit covering what changed between the saved and current buffer.
+  const diffEdit = (before: string, after: string) => {
+    let prefix = 0;
+    const maxPrefix = Math.min(before.length, after.length);
+    while (prefix < maxPrefix && before[prefix] === after[prefix]) prefix++;
+    // Strings compare by UTF-16 unit: don't split a surrogate pair, or the byte offsets come out wrong.
+    const isHigh = (code: number) => code >= 0xd800 && code <= 0xdbff;
+    const isLow = (code: number) => code >= 0xdc00 && code <= 0xdfff;
+    if (prefix > 0 && isHigh(before.charCodeAt(prefix - 1))) prefix--;
+    let suffix = 0;
+    const maxSuffix = maxPrefix - prefix;
+    while (suffix < maxSuffix && before[before.length - 1 - suffix] === after[after.length - 1 - suffix]) suffix++;
+    if (suffix > 0 && isLow(before.charCodeAt(before.length - suffix))) suffix--;
+    const encoder = new TextEncoder();
+    return {
+      offset: encoder.encode(before.slice(0, prefix)).length,
+      length: encoder.encode(before.slice(prefix, before.length - suffix)).length,
+      text: after.slice(prefix, after.length - suffix)
+    };
+  };
+
   const handleSave = async () => {
     if (!selectedFile) return;
-    
+    if (fileContent === savedContent) {
+      setIsDirty(false);
+      return;
+    }
+
     try {
-      await fetch('/api/files/save', {
+      let res = await fetch('/api/files/patch', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ path: selectedFile.path, content: fileContent })
+        body: JSON.stringify({
+          path: selectedFile.path,
+          base_version: fileVersion,
+          edits: [diffEdit(savedContent, fileContent)]
+        })
       });
+      if (res.status === 409) {
+        if (!confirm("The file changed on disk. Overwrite it?")) return;
+        res = await fetch('/api/files/save', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ path: selectedFile.path, content: fileContent })
+        });
+      }
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.detail);
+      setSavedContent(fileContent);
+      setFileVersion(data.version);
       setIsDirty(false);
       alert("File saved!");
     } catch (err) {
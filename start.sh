@@ -1,4 +1,13 @@
 #!/bin/bash
+# Usage:
+#   ./start.sh          development: one backend with --reload, plus the frontend dev server
+#   ./start.sh prod     production: one API worker per core behind a sticky thread router
+#
+# Production settings (environment):
+#   AGENT_WORKERS           API worker processes (default: number of cores)
+#   AGENT_WORKER_BASE_PORT  worker i listens on base+i (default 8100)
+#   AGENT_ROUTER_WORKERS    router processes (default 2; the router is stateless)
+#   PORT                    public port (default 8000)
 
 # Function to kill background processes on exit
 cleanup() {
@@ -7,8 +16,32 @@ cleanup() {
 }
 trap cleanup EXIT
 
-echo "Starting Backend..."
 source backend/.venv/bin/activate
+
+if [ "$1" = "prod" ]; then
+    export AGENT_WORKERS=${AGENT_WORKERS:-$(nproc)}
+    export AGENT_WORKER_BASE_PORT=${AGENT_WORKER_BASE_PORT:-8100}
+    # Workers share thread state through the SQLite checkpointer.
+    export AGENT_CHECKPOINTER=sqlite
+    PORT=${PORT:-8000}
+
+    echo "Starting $AGENT_WORKERS API workers..."
+    for ((i = 0; i < AGENT_WORKERS; i++)); do
+        AGENT_WORKER_ID=$i uvicorn app.main:app --app-dir backend \
+            --host 127.0.0.1 --port $((AGENT_WORKER_BASE_PORT + i)) --no-access-log &
+    done
+
+    echo "Starting router..."
+    uvicorn app.router:app --app-dir backend --host 0.0.0.0 --port "$PORT" \
+        --workers "${AGENT_ROUTER_WORKERS:-2}" --no-access-log &
+
+    echo "Backend at http://localhost:$PORT ($AGENT_WORKERS workers). Serve frontend/dist with any static server."
+    echo "Press Ctrl+C to stop."
+    wait
+    exit
+fi
+
+echo "Starting Backend..."
 # Run uvicorn from root, pointing to backend.app.main:app
 uvicorn backend.app.main:app --reload --port 8000 &
 